@@ -0,0 +1,178 @@
+"""
+Oracles that answer queries asynchronously, and a validator that keeps several queries to one in flight while the
+solver works on the examples that have already arrived.
+"""
+import abc
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple, Union
+
+from . import intermediate_representation as ir
+from .instrumentation import Metrics
+from .query_log import QueryLog
+from .validator import Oracle, OracleInput, Validator, get_new_inputs
+
+
+class AsyncOracle(abc.ABC):
+    @abc.abstractmethod
+    async def run(self, input: OracleInput) -> Union[bool, float]:
+        pass
+
+    async def run_batch(self, inputs: Sequence[OracleInput]) -> List[Union[bool, float]]:
+        return list(await asyncio.gather(*(self.run(input) for input in inputs)))
+
+
+class SyncToAsyncOracle(AsyncOracle):
+    """
+    Runs the queries to `oracle` on a pool of `workers` threads, so that up to that many can be in flight at once.
+    """
+
+    def __init__(self, oracle: Oracle, workers: int = 4):
+        if workers < 1:
+            raise ValueError(f"workers={workers} must be at least 1")
+        self.oracle = oracle
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def run(self, input: OracleInput) -> Union[bool, float]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.oracle.run, input)
+
+
+class AsyncToSyncOracle(Oracle):
+    """
+    Runs the queries to `oracle` in an event loop of their own, with up to `concurrency` of a batch in flight at once.
+    This can't be used from code that is already running in an event loop.
+    """
+
+    def __init__(self, oracle: AsyncOracle, concurrency: int = 16):
+        if concurrency < 1:
+            raise ValueError(f"concurrency={concurrency} must be at least 1")
+        self.oracle = oracle
+        self.concurrency = concurrency
+
+    def run(self, input: OracleInput) -> Union[bool, float]:
+        return asyncio.run(self.oracle.run(input))
+
+    def run_batch(self, inputs: Sequence[OracleInput]) -> List[Union[bool, float]]:
+        async def run_all() -> List[Union[bool, float]]:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run_one(input: OracleInput) -> Union[bool, float]:
+                async with semaphore:
+                    return await self.oracle.run(input)
+
+            return list(await asyncio.gather(*(run_one(input) for input in inputs)))
+
+        return asyncio.run(run_all())
+
+
+class AsyncValidator(Validator):
+    """
+    A validator whose oracle is asynchronous. Up to `concurrency` queries are kept in flight at all times, including
+    while the solver is checking a program (which happens on a thread of its own, so that the event loop is free to
+    handle the answers). Queries that are still in flight when a program is rejected carry on, and their answers are
+    used for the next program.
+
+    This must only be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        oracle: AsyncOracle,
+        input_numbers: List[str] = [],
+        input_booleans: List[str] = [],
+        successes_to_pass: int = 20,
+        concurrency: int = 4,
+        metrics: Optional[Metrics] = None,
+        solver_timeout: Optional[int] = None,
+        deadline: Optional[float] = None,
+        solver_strategy: str = "default",
+        query_log: Optional[QueryLog] = None,
+    ):
+        """
+        If `metrics` is given, the queries sent are counted in it, but not timed, since they overlap. `solver_timeout`,
+        `deadline`, `solver_strategy` and `query_log` are as for `Validator`.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency={concurrency} must be at least 1")
+        # The synchronous methods still work (outside of an event loop), one query at a time.
+        super().__init__(
+            AsyncToSyncOracle(oracle),
+            input_numbers,
+            input_booleans,
+            successes_to_pass,
+            metrics=metrics,
+            solver_timeout=solver_timeout,
+            deadline=deadline,
+            solver_strategy=solver_strategy,
+            query_log=query_log,
+        )
+        self.async_oracle = oracle
+        self.concurrency = concurrency
+        self._queries: Set["asyncio.Future[Tuple[int, OracleInput, Union[bool, float]]]"] = set()
+        self._queries_sent = 0
+        # Z3 isn't thread-safe, so every check happens on this one thread.
+        self._solver_thread = ThreadPoolExecutor(max_workers=1)
+
+    def close(self) -> None:
+        super().close()
+        self._solver_thread.shutdown()
+
+    async def aclose(self) -> None:
+        """
+        Cancels the queries that are still in flight, and then closes the validator.
+        """
+        for query in self._queries:
+            query.cancel()
+        await asyncio.gather(*self._queries, return_exceptions=True)
+        self._queries = set()
+        self.close()
+
+    async def _query(self, index: int, input: OracleInput) -> Tuple[int, OracleInput, Union[bool, float]]:
+        return index, input, await self.async_oracle.run(input)
+
+    def _send_queries(self) -> None:
+        while len(self._queries) < self.concurrency:
+            input = get_new_inputs(self.input_booleans, self.input_numbers)
+            self._queries.add(asyncio.ensure_future(self._query(self._queries_sent, input)))
+            self._queries_sent += 1
+            self.oracle_calls += 1
+            if self.metrics is not None:
+                self.metrics.count("oracle_queries")
+
+    async def fetch_examples_async(self) -> int:
+        """
+        Waits for at least one query to be answered, adds every answer that has arrived to the bank, and returns how
+        many there were.
+        """
+        self._send_queries()
+        done, self._queries = await asyncio.wait(self._queries, return_when=asyncio.FIRST_COMPLETED)
+        # Order the answers by when the queries were sent, so that the bank doesn't depend on timing more than it has
+        # to.
+        for _, input, output in sorted(query.result() for query in done):
+            self.example_bank.append((input, output))
+        self._send_queries()
+        return len(done)
+
+    async def satisfies_examples_async(self, program: ir.Expression) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(self._solver_thread, self.satisfies_examples, program)
+
+    async def validate_program_async(self, program: ir.Expression) -> bool:
+        # This follows `Validator.validate_program`, except that new examples arrive while the solver is working.
+        self._send_queries()
+        if not await self.satisfies_examples_async(program):
+            return False
+        checked = 0
+        while checked < self.successes_to_pass:
+            fetched = await self.fetch_examples_async()
+            if not await self.satisfies_examples_async(program):
+                return False
+            checked += fetched
+        return True
@@ -0,0 +1,49 @@
+"""
+Measures how long it takes to build the Z3 constraint for one example, comparing re-translating the program with the
+inputs filled in (the original approach) with substituting the inputs into a term translated once per candidate.
+
+Run with `python -m program_translation.benchmarks.constraints`.
+"""
+import argparse
+import timeit
+
+from .. import intermediate_representation as ir
+from ..validator import Oracle, OracleInput, Validator, fill_holes, get_new_inputs, to_z3
+
+
+class NullOracle(Oracle):
+    def run(self, input: OracleInput) -> float:
+        return 0.0
+
+
+def sample_program() -> ir.Expression:
+    x, y, c = ir.NumberHole("x"), ir.NumberHole("y"), ir.NumberHole("c")
+    return ir.Ite(
+        ir.Lt(ir.Add(x, c), ir.Mul(y, y)),
+        ir.Sub(ir.Mul(x, ir.Add(y, c)), ir.Sub(c, x)),
+        ir.Add(ir.Mul(c, ir.Sub(x, y)), ir.Add(x, ir.Mul(y, c))),
+    )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--examples", help="number of examples to build constraints for", type=int, default=200)
+    args = parser.parse_args()
+
+    program = sample_program()
+    examples = [(get_new_inputs([], ["x", "y"]), 0.0) for _ in range(args.examples)]
+    validator = Validator(NullOracle(), input_numbers=["x", "y"])
+
+    def retranslate():
+        for inputs, output in examples:
+            to_z3(fill_holes(program, inputs)) == output
+
+    def substitute():
+        validator.start_candidate(program)
+        for inputs, output in examples:
+            validator.example_constraint(inputs, output)
+
+    print("microseconds per example constraint:")
+    before = min(timeit.repeat(retranslate, number=1, repeat=5)) / args.examples * 1e6
+    after = min(timeit.repeat(substitute, number=1, repeat=5)) / args.examples * 1e6
+    print(f"re-translate {before:8.1f}\tsubstitute {after:8.1f}\tspeedup {before / after:.2f}x")
@@ -0,0 +1,227 @@
+"""
+Measures the performance of the main pieces of the synthesizer: how fast programs are enumerated at each depth, how long
+the validator takes to check a candidate as the example bank grows, how long end-to-end synthesis takes for the
+example oracles, and how fast programs are translated. Every timing is the best of `--repeat` runs.
+
+The results can be saved as JSON with `--output`, and compared with results saved earlier (e.g. before a change, or
+`baseline.json` next to this file) with `--baseline`. Measurements that got worse by more than `--tolerance` are
+reported as regressions, and make the exit status 1.
+
+Run with `python -m program_translation.benchmarks.suite`.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Sequence, Tuple
+
+import z3
+
+from .. import intermediate_representation as ir
+from ..enumerator import enumerate_programs
+from ..oracles.BuggyAbs import BuggyAbsOracle
+from ..oracles.SqrtAbs import SqrtAbsOracle
+from ..oracles.XPlusYMinus2 import XPlusYMinus2Oracle
+from ..synthesizer import synthesize
+from ..translation import to_c, to_python, to_scheme
+from ..validator import Validator, get_new_inputs
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class Measurement(NamedTuple):
+    value: float
+    unit: str
+    higher_is_better: bool
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def enumeration(depths: Sequence[int], repeat: int) -> Dict[str, Measurement]:
+    measurements = {}
+    for depth in depths:
+        for compact in (False, True):
+            count = 0
+
+            def run() -> None:
+                nonlocal count
+                count = sum(1 for _ in enumerate_programs(ir.NumberExpression, depth, ["x", "y", "c"], compact=compact))
+
+            seconds = best_time(run, repeat)
+            name = f"enumeration/{'compact' if compact else 'tree'}/depth_{depth}"
+            measurements[name] = Measurement(count / seconds, "programs/s", True)
+    return measurements
+
+
+def validation(bank_sizes: Sequence[int], candidates: int, repeat: int) -> Dict[str, Measurement]:
+    """
+    Checks the same `candidates` programs (none of which are right) against example banks of each size.
+    """
+    oracle = XPlusYMinus2Oracle()
+    programs = []
+    for program in enumerate_programs(ir.NumberExpression, 7, ["x", "y", "c"]):
+        programs.append(program)
+        if len(programs) == candidates:
+            break
+    random.seed(0)
+    inputs = [get_new_inputs([], ["x", "y"]) for _ in range(max(bank_sizes))]
+    examples = list(zip(inputs, oracle.run_batch(inputs)))
+
+    measurements = {}
+    for size in bank_sizes:
+
+        def run() -> None:
+            validator = Validator(oracle, input_numbers=["x", "y"])
+            validator.example_bank.extend(examples[:size])
+            for program in programs:
+                validator.satisfies_examples(program)
+
+        seconds = best_time(run, repeat)
+        measurements[f"validation/bank_{size}"] = Measurement(seconds / len(programs) * 1e6, "us/candidate", False)
+    return measurements
+
+
+# The oracles to synthesize programs for, with the grammars and search settings that find them.
+SYNTHESIS_PROBLEMS: Mapping[str, Tuple[Callable[[], Any], Dict[str, Any]]] = {
+    "XPlusYMinus2": (XPlusYMinus2Oracle, dict(input_numbers=["x", "y"], constant_numbers=["c"], maximum_depth=5)),
+    "SqrtAbs": (SqrtAbsOracle, dict(input_numbers=["x"], constant_numbers=["c"], maximum_depth=8)),
+    "BuggyAbs": (BuggyAbsOracle, dict(input_numbers=["x"], constant_numbers=["c"], maximum_depth=8, bottom_up=True)),
+}
+
+
+def synthesis(problems: Sequence[str], repeat: int) -> Dict[str, Measurement]:
+    measurements = {}
+    for name in problems:
+        make_oracle, arguments = SYNTHESIS_PROBLEMS[name]
+
+        def run() -> None:
+            random.seed(0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                if synthesize(make_oracle(), **arguments) is None:
+                    raise RuntimeError(f"no program was found for {name}")
+
+        measurements[f"synthesis/{name}"] = Measurement(best_time(run, repeat), "s", False)
+    return measurements
+
+
+def translation(depth: int, repeat: int) -> Dict[str, Measurement]:
+    programs = list(enumerate_programs(ir.NumberExpression, depth, ["x", "y"]))
+    measurements = {}
+    for name, translate in (("C", to_c), ("Python", to_python), ("Scheme", to_scheme)):
+
+        def run() -> None:
+            for program in programs:
+                translate(program, number_inputs=["x", "y"])
+
+        measurements[f"translation/{name}"] = Measurement(len(programs) / best_time(run, repeat), "programs/s", True)
+    return measurements
+
+
+def run_suite(groups: Sequence[str], quick: bool = False, repeat: int = 3) -> Dict[str, Measurement]:
+    """
+    Runs the measurements in `groups` (any of "enumeration", "validation", "synthesis" and "translation"). If `quick`
+    is True, smaller versions of them are run, which is enough to check that they work but not to compare.
+    """
+    measurements: Dict[str, Measurement] = {}
+    if "enumeration" in groups:
+        measurements.update(enumeration((3, 5) if quick else (3, 5, 7), repeat))
+    if "validation" in groups:
+        measurements.update(validation((1, 10) if quick else (1, 10, 50, 200), 20 if quick else 200, repeat))
+    if "synthesis" in groups:
+        measurements.update(synthesis(["XPlusYMinus2"] if quick else list(SYNTHESIS_PROBLEMS), repeat))
+    if "translation" in groups:
+        measurements.update(translation(5 if quick else 7, repeat))
+    return measurements
+
+
+def to_json(measurements: Mapping[str, Measurement]) -> Dict[str, Any]:
+    return {
+        "metadata": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "z3": z3.get_version_string(),
+        },
+        "measurements": {name: measurement._asdict() for name, measurement in measurements.items()},
+    }
+
+
+def compare(
+    measurements: Mapping[str, Measurement], baseline: Mapping[str, Any], tolerance: float = 0.2
+) -> Tuple[List[str], List[str]]:
+    """
+    Compares `measurements` with `baseline` (as loaded from the JSON written by `to_json`), and returns a report with
+    a line per measurement, and the names of those that got worse by more than `tolerance` (a fraction).
+    """
+    report = []
+    regressions = []
+    old_measurements = baseline["measurements"]
+    for name, measurement in measurements.items():
+        if name not in old_measurements:
+            report.append(f"{name:40}{measurement.value:14.4g} {measurement.unit:14}(not in baseline)")
+            continue
+        old = old_measurements[name]["value"]
+        # How many times better the new value is, whichever way is better.
+        speedup = measurement.value / old if measurement.higher_is_better else old / measurement.value
+        status = ""
+        if speedup < 1 - tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif speedup > 1 + tolerance:
+            status = "improvement"
+        line = f"{name:40}{measurement.value:14.4g} {measurement.unit:14}baseline {old:12.4g}  {speedup:6.2f}x"
+        report.append(f"{line}  {status}" if status else line)
+    return report, regressions
+
+
+if __name__ == "__main__":  # pragma: no cover
+    groups = ["enumeration", "validation", "synthesis", "translation"]
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-g", "--group", help="a group of measurements to run (all by default)", action="append", choices=groups
+    )
+    parser.add_argument("-o", "--output", help="file to write the results to, as JSON", type=str, default=None)
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        help=f"file with earlier results to compare with (e.g. {os.path.relpath(BASELINE)})",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--tolerance",
+        help="how much worse (as a fraction) a measurement can get before it's a regression",
+        type=float,
+        default=0.2,
+    )
+    parser.add_argument("-r", "--repeat", help="number of runs to take the best time of", type=int, default=3)
+    parser.add_argument("--quick", help="run smaller versions of the measurements", action="store_true")
+    args = parser.parse_args()
+
+    measurements = run_suite(args.group or groups, quick=args.quick, repeat=args.repeat)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(to_json(measurements), f, indent=2)
+            f.write("\n")
+    if args.baseline is None:
+        for name, measurement in measurements.items():
+            print(f"{name:40}{measurement.value:14.4g} {measurement.unit}")
+    else:
+        with open(args.baseline) as f:
+            report, regressions = compare(measurements, json.load(f), args.tolerance)
+        print("\n".join(report))
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
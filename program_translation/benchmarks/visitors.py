@@ -0,0 +1,95 @@
+"""
+Measures the per-node overhead of visiting an IR expression, comparing the current cached `make_visitor` dispatch with
+the original implementation (a new class per call that dispatches through try/except on KeyError).
+
+Run with `python -m program_translation.benchmarks.visitors`.
+"""
+import argparse
+import timeit
+from typing import Any, Callable, Dict, Mapping, Optional, Type
+
+from .. import intermediate_representation as ir
+from .. import ir_utilities as iru
+
+
+def legacy_make_visitor(
+    name: str,
+    visit_handlers: Mapping[Type[ir.Expression], Callable[[ir.Visitor, ir.Expression], Any]],
+    attributes: Dict[str, Any] = {},
+    default_action: Optional[Callable[[ir.Visitor, ir.Expression], Any]] = None,
+) -> Type[ir.Visitor]:
+    def visit(self, expression):
+        expression_type = type(expression)
+        try:
+            return visit_handlers[expression_type](self, expression)
+        except KeyError:
+            if default_action:
+                return default_action(self, expression)
+            raise NotImplementedError(f"{type(self)} does not support visiting {expression_type}")
+
+    return type(name, (ir.Visitor,), {**attributes, "visit": visit})
+
+
+def legacy_count_elements(expression: ir.Expression) -> int:
+    count = 0
+
+    def inc_count(self, expr):
+        nonlocal count
+        count += 1
+        iru.visit_all_below(self, expr)
+
+    legacy_make_visitor("Diver", {}, default_action=inc_count)().visit(expression)
+    return count
+
+
+def legacy_evaluate(expression: ir.Expression) -> Any:
+    rules = {
+        ir.NumberLiteral: lambda _, expr: expr._value,
+        ir.Add: lambda self, expr: self.visit(expr._0) + self.visit(expr._1),
+        ir.Sub: lambda self, expr: self.visit(expr._0) - self.visit(expr._1),
+        ir.Mul: lambda self, expr: self.visit(expr._0) * self.visit(expr._1),
+    }
+    return legacy_make_visitor("Evaluate", rules)().visit(expression)
+
+
+def sample_expression(depth: int) -> ir.Expression:
+    """
+    A complete binary tree of arithmetic with distinct literals at the leaves, so it has 2^depth - 1 nodes.
+    """
+    leaves = [ir.NumberLiteral(i) for i in range(2 ** (depth - 1))]
+    operations = [ir.Add, ir.Sub, ir.Mul]
+    level = 0
+    while len(leaves) > 1:
+        operation = operations[level % len(operations)]
+        leaves = [operation(leaves[i], leaves[i + 1]) for i in range(0, len(leaves), 2)]
+        level += 1
+    return leaves[0]
+
+
+def per_node_ns(function: Callable[[ir.Expression], Any], expression: ir.Expression, repeat: int) -> float:
+    nodes = iru.count_elements(expression)
+    seconds = min(timeit.repeat(lambda: function(expression), number=repeat, repeat=5))
+    return seconds / (repeat * nodes) * 1e9
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--depth", help="depth of the benchmark expression", type=int, default=10)
+    parser.add_argument("-r", "--repeat", help="number of visits per timing", type=int, default=50)
+    args = parser.parse_args()
+
+    expression = sample_expression(args.depth)
+    print(f"{iru.count_elements(expression)} nodes, nanoseconds per node visited:")
+    for label, before, after in (
+        ("count_elements", legacy_count_elements, iru.count_elements),
+        ("evaluate", legacy_evaluate, iru.evaluate),
+    ):
+        old = per_node_ns(before, expression, args.repeat)
+        new = per_node_ns(after, expression, args.repeat)
+        print(f"{label:16}before {old:8.1f}\tafter {new:8.1f}\tspeedup {old / new:.2f}x")
+
+    # Small expressions are where the cost of building a visitor class on every call dominates.
+    small = sample_expression(3)
+    old = per_node_ns(legacy_count_elements, small, args.repeat * 100)
+    new = per_node_ns(iru.count_elements, small, args.repeat * 100)
+    print(f"{'small tree':16}before {old:8.1f}\tafter {new:8.1f}\tspeedup {old / new:.2f}x")
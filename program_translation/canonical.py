@@ -0,0 +1,143 @@
+"""
+A canonical form for programs, so that the enumerator can skip programs that are just rearrangements of others.
+
+A program is canonical if none of these rules apply to any of its nodes:
+
+ - the children of a commutative operation (`+`, `*`, `and`, `or` and `xor`) are out of order. Programs are ordered by
+   their nodes in prefix order; see `key`.
+ - a negation is negated, as in `(not (not P))`, which is `P`.
+ - both branches of an `ite` are the same, as in `(ite P e e)`, which is `e`.
+ - something other than a leaf is subtracted from itself, as in `(- e e)`, which is the same as `(- x x)` for any leaf
+   `x` of `e`.
+
+Every program has a canonical program that is equivalent to it and no bigger (see `canonicalize`), so skipping the
+rest doesn't lose anything. For partial programs (with non-terminals in them), the rules are only applied where the
+result doesn't depend on how the non-terminals are replaced, so that a partial program is only rejected if every
+program derived from it would be.
+"""
+from functools import lru_cache
+from typing import Any, Optional, Sequence, Tuple
+
+from . import encoding
+from . import intermediate_representation as ir
+
+_COMMUTATIVE = (ir.Add, ir.Mul, ir.And, ir.Or, ir.Xor)
+_NONTERMINALS = (ir.Expression, ir.BooleanExpression, ir.NumberExpression)
+_RANKS = {
+    **encoding.OPERATION_OPCODES,
+    **{
+        leaf_type: encoding.FIRST_LEAF_OPCODE + i
+        for i, leaf_type in enumerate((ir.BooleanHole, ir.BooleanLiteral, ir.NumberHole, ir.NumberLiteral))
+    },
+}
+
+Token = Tuple[int, Tuple[Any, ...]]
+
+
+def _token(node: ir.Expression) -> Token:
+    return (_RANKS[type(node)], () if node._children else node._fields())
+
+
+@lru_cache(maxsize=1 << 16)
+def prefix(expression: ir.Expression) -> Tuple[Tuple[Token, ...], bool]:
+    """
+    The tokens of the nodes of `expression` in prefix order, up to (and not including) its leftmost non-terminal, and
+    whether it's complete (has no non-terminals). Those tokens are the same for every program derived from it.
+    """
+    if type(expression) in _NONTERMINALS:
+        return (), False
+    tokens = (_token(expression),)
+    for child in expression._children:
+        child_tokens, complete = prefix(child)
+        tokens += child_tokens
+        if not complete:
+            return tokens, False
+    return tokens, True
+
+
+def key(expression: ir.Expression) -> Tuple[Token, ...]:
+    """
+    The key that complete programs are ordered by.
+    """
+    return prefix(expression)[0]
+
+
+def _ordered(a: ir.Expression, b: ir.Expression) -> bool:
+    """
+    Whether `a` comes before (or is) `b`, or might once the non-terminals in them are replaced.
+    """
+    a_tokens, a_complete = prefix(a)
+    if not a_complete:
+        return True
+    b_tokens, b_complete = prefix(b)
+    if b_complete:
+        return a_tokens <= b_tokens
+    # `a` can only come after `b` if they differ somewhere in the part of `b` that's already fixed.
+    shared = min(len(a_tokens), len(b_tokens))
+    return a_tokens[:shared] <= b_tokens[:shared]
+
+
+def locally_canonical(node: ir.Expression) -> bool:
+    """
+    Whether none of the rules apply to `node` itself (as opposed to its descendants).
+    """
+    node_type = type(node)
+    if node_type in _COMMUTATIVE:
+        return _ordered(node._children[0], node._children[1])
+    elif node_type is ir.Not:
+        return type(node._children[0]) is not ir.Not
+    elif node_type is ir.Ite:
+        _, a, b = node._children
+        return a is not b or not prefix(a)[1]
+    elif node_type is ir.Sub:
+        a, b = node._children
+        return a is not b or not a._children or not prefix(a)[1]
+    return True
+
+
+def is_canonical(expression: ir.Expression) -> bool:
+    return locally_canonical(expression) and all(is_canonical(child) for child in expression._children)
+
+
+def path_is_canonical(expression: ir.Expression, path: Sequence[int]) -> bool:
+    """
+    Whether the rules don't apply to any of the nodes from the root of `expression` down along `path`, including the
+    node at its end. After the node at the end of `path` is replaced in a program that was canonical, those are the
+    only nodes that need checking.
+    """
+    node = expression
+    if not locally_canonical(node):
+        return False
+    for child_index in path:
+        node = node._children[child_index]
+        if not locally_canonical(node):
+            return False
+    return True
+
+
+def _first_number_leaf(expression: ir.Expression) -> Optional[ir.Expression]:
+    if not expression._children:
+        return expression if isinstance(expression, ir.NumberExpression) else None
+    leaves = [_first_number_leaf(child) for child in expression._children]
+    leaves = [leaf for leaf in leaves if leaf is not None]
+    return min(leaves, key=key) if leaves else None
+
+
+def canonicalize(expression: ir.Expression) -> ir.Expression:
+    """
+    Rewrites `expression` (which must be complete) into the canonical program it's equivalent to.
+    """
+    if not expression._children:
+        return expression
+    children = [canonicalize(child) for child in expression._children]
+    expression_type = type(expression)
+    if expression_type in _COMMUTATIVE and key(children[1]) < key(children[0]):
+        children.reverse()
+    elif expression_type is ir.Not and type(children[0]) is ir.Not:
+        return children[0]._children[0]
+    elif expression_type is ir.Ite and children[1] is children[2]:
+        return children[1]
+    elif expression_type is ir.Sub and children[0] is children[1] and children[0]._children:
+        leaf = _first_number_leaf(children[0])
+        return ir.Sub(leaf, leaf)
+    return expression_type(*children)
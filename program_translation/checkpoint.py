@@ -0,0 +1,145 @@
+"""
+Checkpoints for long synthesis runs, so that a run that was stopped can carry on where it left off.
+
+Rather than saving the enumerator's frontier, a checkpoint records enough to replay the run: the examples the oracle
+gave, each with the index of the candidate program whose validation asked for it, and (every so often) how many
+candidates have been rejected so far, along with the state of the random number generator at that point. Resuming
+enumerates the candidates again without validating the ones that were already rejected, adding their examples to the
+bank at the same points they were added originally, so that even enumerators that depend on the examples (e.g. the
+bottom-up one) pick up exactly where they stopped. New inputs are drawn from the restored random state, so they're the
+same ones the stopped run would have drawn next.
+
+A checkpoint is a directory with two files:
+
+ - `examples.jsonl`, which examples are appended to as they arrive, one JSON object per line.
+ - `progress.json`, which is replaced (atomically) at most once per `interval` seconds, and when the checkpoint is
+   closed.
+
+So checkpointing costs time proportional to the number of new examples, not to the size of the search.
+
+Examples that arrived after the last progress was saved are dropped when resuming; the restored random state means that
+they'll be asked for again.
+
+Candidates that the solver couldn't decide about in time count as rejected for the progress, but their indices are
+saved too, so that a resumed run puts them aside again to be retried at the end.
+"""
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple, Union
+
+from .validator import OracleInput
+
+Example = Tuple[OracleInput, Union[bool, float]]
+
+_EXAMPLES = "examples.jsonl"
+_PROGRESS = "progress.json"
+
+
+class Checkpoint:
+    def __init__(self, directory: str, parameters: Mapping[str, Any], resume: bool = False, interval: float = 10.0):
+        """
+        `parameters` describes the run (e.g. the grammar and the validator's settings). A run can only be resumed with
+        the same parameters. If `resume` is False, any checkpoint already in `directory` is replaced.
+        """
+        self.directory = directory
+        self.parameters = dict(parameters)
+        self.interval = interval
+        # The number of candidates rejected before the checkpoint was made, and the examples their validation added.
+        self.candidates = 0
+        self.examples: Dict[int, List[Example]] = {}
+        # The indices of the candidates that were put aside undecided.
+        self.undecided: Set[int] = set()
+
+        os.makedirs(directory, exist_ok=True)
+        examples_path = os.path.join(directory, _EXAMPLES)
+        progress_path = os.path.join(directory, _PROGRESS)
+        if resume and os.path.exists(progress_path):
+            with open(progress_path) as f:
+                progress = json.load(f)
+            if progress["parameters"] != json.loads(json.dumps(self.parameters)):
+                raise ValueError(
+                    f"the checkpoint in {directory} is for a run with {progress['parameters']}, not {self.parameters}"
+                )
+            self.candidates = progress["candidates"]
+            self.undecided = {index for index in progress.get("undecided", []) if index < self.candidates}
+            version, state, gauss = progress["random_state"]
+            random.setstate((version, tuple(state), gauss))
+            kept = []
+            with open(examples_path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["candidate"] < self.candidates:
+                        self.examples.setdefault(record["candidate"], []).append((record["inputs"], record["output"]))
+                        kept.append(line)
+            # Rewrite the examples without the ones that were asked for after the progress was saved.
+            with open(examples_path + ".tmp", "w") as f:
+                f.writelines(kept)
+            os.replace(examples_path + ".tmp", examples_path)
+        else:
+            open(examples_path, "w").close()
+            self.save(0)
+
+        self._examples_file = open(examples_path, "a")
+        self._last_saved = time.monotonic()
+        self._unsaved: Optional[int] = None
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def replay(self, index: int) -> Optional[List[Example]]:
+        """
+        If the candidate with `index` was rejected before the checkpoint, returns the examples its validation added.
+        Otherwise, returns None.
+        """
+        if index >= self.candidates:
+            return None
+        return self.examples.get(index, [])
+
+    def was_undecided(self, index: int) -> bool:
+        """
+        Whether the candidate with `index` was put aside undecided before the checkpoint.
+        """
+        return index in self.undecided and index < self.candidates
+
+    def record(self, index: int, examples: List[Example], rejected: bool, undecided: bool = False) -> None:
+        """
+        Records the examples that validating the candidate with `index` added, and whether it was rejected or put
+        aside undecided.
+        """
+        if undecided:
+            self.undecided.add(index)
+            rejected = True
+        for inputs, output in examples:
+            self._examples_file.write(json.dumps({"candidate": index, "inputs": dict(inputs), "output": output}) + "\n")
+        self._examples_file.flush()
+        if rejected:
+            self._unsaved = index + 1
+            if time.monotonic() - self._last_saved >= self.interval:
+                self.save(index + 1)
+
+    def save(self, candidates: int) -> None:
+        """
+        Saves the progress made: that `candidates` candidates have been rejected, and the current random state.
+        """
+        progress_path = os.path.join(self.directory, _PROGRESS)
+        with open(progress_path + ".tmp", "w") as f:
+            progress = {
+                "parameters": self.parameters,
+                "candidates": candidates,
+                "undecided": sorted(index for index in self.undecided if index < candidates),
+                "random_state": random.getstate(),
+            }
+            json.dump(progress, f)
+        os.replace(progress_path + ".tmp", progress_path)
+        self._last_saved = time.monotonic()
+        self._unsaved = None
+
+    def close(self) -> None:
+        if self._unsaved is not None:
+            self.save(self._unsaved)
+        self._examples_file.close()
@@ -0,0 +1,62 @@
+"""
+Compiles IR programs into Python functions, so that a program that's going to be run on many inputs only has to be
+walked once. The compiled functions are cached (see `compile_program`), and since IR nodes are hash-consed, looking a
+program up in the cache is cheap.
+"""
+import math
+from functools import lru_cache
+from typing import Callable, Sequence, Tuple, Union
+
+from . import intermediate_representation as ir
+from . import ir_utilities as iru
+
+CompiledProgram = Callable[..., Union[bool, float]]
+
+
+def _number_literal_source(_, expr: ir.NumberLiteral) -> str:
+    if math.isfinite(expr._value):
+        return repr(expr._value)
+    return f"float('{expr._value}')"
+
+
+# This is like the Python translator, except that holes become positional parameters (so that they can have any name).
+_SOURCE_GENERATOR = ir.make_visitor(
+    "CompiledSource",
+    {
+        ir.BooleanLiteral: lambda _, expr: "True" if expr._value else "False",
+        ir.BooleanHole: lambda self, expr: self.parameters[expr._name],
+        ir.NumberLiteral: _number_literal_source,
+        ir.NumberHole: lambda self, expr: self.parameters[expr._name],
+        ir.Not: lambda self, expr: f"(not {self.visit(expr._0)})",
+        ir.And: lambda self, expr: f"({self.visit(expr._0)} and {self.visit(expr._1)})",
+        ir.Or: lambda self, expr: f"({self.visit(expr._0)} or {self.visit(expr._1)})",
+        ir.Xor: lambda self, expr: f"({self.visit(expr._0)} != {self.visit(expr._1)})",
+        ir.Impl: lambda self, expr: f"(not {self.visit(expr._0)} or {self.visit(expr._1)})",
+        ir.Add: lambda self, expr: f"({self.visit(expr._0)} + {self.visit(expr._1)})",
+        ir.Sub: lambda self, expr: f"({self.visit(expr._0)} - {self.visit(expr._1)})",
+        ir.Mul: lambda self, expr: f"({self.visit(expr._0)} * {self.visit(expr._1)})",
+        ir.Div: lambda self, expr: f"({self.visit(expr._0)} / {self.visit(expr._1)})",
+        ir.Ite: lambda self, expr: f"({self.visit(expr._1)} if {self.visit(expr._0)} else {self.visit(expr._2)})",
+        ir.Lt: lambda self, expr: f"({self.visit(expr._0)} < {self.visit(expr._1)})",
+    },
+)
+
+
+def compile_program(program: ir.Expression, arguments: Sequence[str]) -> CompiledProgram:
+    """
+    Compiles `program` into a function that takes the values of the holes named in `arguments`, in that order, as
+    positional arguments. Every hole in `program` has to be in `arguments`.
+    """
+    return _compile(program, tuple(arguments))
+
+
+@lru_cache(maxsize=4096)
+def _compile(program: ir.Expression, arguments: Tuple[str, ...]) -> CompiledProgram:
+    missing = {hole._name for hole in iru.holes(program)}.difference(arguments)
+    if missing:
+        raise ValueError(f"{program} has holes that aren't arguments: {missing}")
+    parameters = {name: f"_{i}" for i, name in enumerate(arguments)}
+    generator = _SOURCE_GENERATOR()
+    generator.parameters = parameters  # type: ignore
+    source = f"lambda {', '.join(parameters.values())}: {generator.visit(program)}"
+    return eval(compile(source, f"<{program}>", "eval"), {"float": float})
@@ -0,0 +1,104 @@
+"""
+A compact encoding of IR expressions as byte strings, for when there are too many expressions around to keep each one
+as a tree of objects (e.g. the enumerator's frontier).
+
+An expression is encoded as the opcodes of its nodes in prefix order, one byte per node. Operations and non-terminals
+have fixed opcodes, and leaves (holes and literals) get opcodes from a per-codec table, so a program over the holes
+`x`, `y` and `P` only needs those three entries on top of the fixed ones. Because the encoding is prefix order, the
+first non-terminal in the byte string is also the leftmost one in the tree, and replacing it is just splicing in the
+encoding of its replacement.
+"""
+import re
+from typing import Dict, Iterable, List, Type
+
+from . import intermediate_representation as ir
+
+# The non-terminals get the lowest opcodes so that they can be searched for and counted with byte string operations.
+NONTERMINAL_OPCODES = bytes([0, 1, 2])
+OPERATIONS: List[Type[ir.Expression]] = [
+    ir.Expression,
+    ir.BooleanExpression,
+    ir.NumberExpression,
+    ir.Not,
+    ir.And,
+    ir.Or,
+    ir.Xor,
+    ir.Impl,
+    ir.Add,
+    ir.Sub,
+    ir.Mul,
+    ir.Div,
+    ir.Ite,
+    ir.Lt,
+]
+OPERATION_OPCODES: Dict[Type[ir.Expression], int] = {operation: i for i, operation in enumerate(OPERATIONS)}
+FIRST_LEAF_OPCODE = len(OPERATIONS)
+
+_NONTERMINAL_PATTERN = re.compile(b"[" + re.escape(NONTERMINAL_OPCODES) + b"]")
+
+
+def find_nonterminal(code: bytes) -> int:
+    """
+    Returns the index of the leftmost non-terminal in an encoded expression, or -1 if it has none.
+    """
+    match = _NONTERMINAL_PATTERN.search(code)
+    return -1 if match is None else match.start()
+
+
+def count_nonterminals(code: bytes) -> int:
+    return len(code) - len(code.translate(None, NONTERMINAL_OPCODES))
+
+
+class ProgramCodec:
+    """
+    Converts between IR expressions and their compact encodings. Leaves that the codec hasn't seen before are added to
+    its table as they're encoded, so decoding needs the same codec that did the encoding.
+    """
+
+    def __init__(self, leaves: Iterable[ir.Expression] = ()):
+        self.leaves: List[ir.Expression] = []
+        self.leaf_opcodes: Dict[ir.Expression, int] = {}
+        for leaf in leaves:
+            self.add_leaf(leaf)
+
+    def add_leaf(self, leaf: ir.Expression) -> int:
+        if leaf in self.leaf_opcodes:
+            return self.leaf_opcodes[leaf]
+        if type(leaf) in OPERATION_OPCODES or leaf._children:
+            raise TypeError(f"{leaf} is not a leaf")
+        opcode = FIRST_LEAF_OPCODE + len(self.leaves)
+        if opcode > 255:
+            raise ValueError(f"cannot add {leaf}: the codec already has {len(self.leaves)} leaves")
+        self.leaves.append(leaf)
+        self.leaf_opcodes[leaf] = opcode
+        return opcode
+
+    def encode(self, expression: ir.Expression) -> bytes:
+        opcodes = bytearray()
+        stack = [expression]
+        while stack:
+            node = stack.pop()
+            opcode = OPERATION_OPCODES.get(type(node))
+            opcodes.append(self.add_leaf(node) if opcode is None else opcode)
+            stack.extend(reversed(node._children))
+        return bytes(opcodes)
+
+    def decode(self, code: bytes) -> ir.Expression:
+        # Going through the prefix order backwards, every node's children have already been decoded and are on top of
+        # the stack, leftmost child first.
+        stack: List[ir.Expression] = []
+        for opcode in reversed(code):
+            if opcode >= FIRST_LEAF_OPCODE:
+                stack.append(self.leaves[opcode - FIRST_LEAF_OPCODE])
+                continue
+            operation = OPERATIONS[opcode]
+            arity = operation._arity
+            if arity == 0:
+                stack.append(operation())
+            else:
+                children = stack[-1 : -arity - 1 : -1]
+                del stack[-arity:]
+                stack.append(operation(*children))
+        if len(stack) != 1:
+            raise ValueError(f"{code!r} does not encode a single expression")
+        return stack[0]
@@ -1,16 +1,46 @@
 import argparse
 import heapq as hq
-from itertools import count
-from typing import Hashable, Iterator, List, MutableSet, Tuple, Type, TypeVar, Union
+import operator
+import sys
+import time
+from collections import defaultdict
+from itertools import count, product
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    DefaultDict,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    MutableSet,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from . import encoding
+from .canonical import is_canonical, locally_canonical, path_is_canonical
 from . import intermediate_representation as ir
-from .ir_utilities import count_elements, count_nonterminals, deep_copy
+from .frontier import Frontier
+from .instrumentation import Metrics
+from .ir_utilities import count_elements, count_nonterminals
+from .validator import OracleInput
 
 
-def replace_one_nonterminal(
-    expression: ir.Expression, numbers: List[str] = [], booleans: List[str] = []
-) -> List[ir.Expression]:
+_NONTERMINALS = (ir.Expression, ir.BooleanExpression, ir.NumberExpression)
 
+
+def productions(numbers: List[str] = [], booleans: List[str] = []) -> Dict[Type[ir.Expression], List[ir.Expression]]:
+    """
+    The right-hand sides of the production rules for each non-terminal.
+    """
     # Check to make sure that none of the number and Boolean variables share the same name.
     shared_names = set(numbers).intersection(booleans)
     if shared_names:
@@ -19,88 +49,128 @@ def replace_one_nonterminal(
         )
     number_holes = [ir.NumberHole(name) for name in numbers]
     boolean_holes = [ir.BooleanHole(name) for name in booleans]
+    return {
+        ir.Expression: [ir.BooleanExpression(), ir.NumberExpression()],
+        ir.BooleanExpression: [
+            ir.Not(ir.BooleanExpression()),
+            ir.And(ir.BooleanExpression(), ir.BooleanExpression()),
+            ir.Or(ir.BooleanExpression(), ir.BooleanExpression()),
+            ir.Xor(ir.BooleanExpression(), ir.BooleanExpression()),
+            ir.Impl(ir.BooleanExpression(), ir.BooleanExpression()),
+            ir.Lt(ir.NumberExpression(), ir.NumberExpression()),
+        ]
+        + boolean_holes,
+        ir.NumberExpression: [
+            ir.Add(ir.NumberExpression(), ir.NumberExpression()),
+            ir.Sub(ir.NumberExpression(), ir.NumberExpression()),
+            ir.Mul(ir.NumberExpression(), ir.NumberExpression()),
+            # ir.Div(ir.NumberExpression(), ir.NumberExpression()),
+            ir.Ite(
+                ir.BooleanExpression(), ir.NumberExpression(), ir.NumberExpression()
+            ),
+        ]
+        + number_holes,
+    }
 
-    # Make sure that there is at least one non-terminal to replace before proceeding.
-    if count_nonterminals(expression) == 0:
+
+def first_nonterminal_path(expression: ir.Expression) -> Optional[Tuple[int, ...]]:
+    """
+    The child indices (e.g. 0 for "_0") leading from `expression` down to its leftmost non-terminal, or None if it has
+    no non-terminals.
+    """
+    if type(expression) in _NONTERMINALS:
+        return ()
+    for child_index, child in enumerate(expression._children):
+        path = first_nonterminal_path(child)
+        if path is not None:
+            return (child_index,) + path
+    return None
+
+
+def replace_one_nonterminal(
+    expression: ir.Expression, numbers: List[str] = [], booleans: List[str] = []
+) -> List[ir.Expression]:
+    rules = productions(numbers, booleans)
+    path = first_nonterminal_path(expression)
+    if path is None:
         raise TypeError(f"expression {str(expression)} has no non-terminals")
+    nonterminal = expression
+    for child_index in path:
+        nonterminal = nonterminal._children[child_index]
+    # IR nodes are immutable, so rather than swapping the non-terminal out in place, rebuild the nodes along the path to
+    # it. Everything off of the path is shared with the original expression.
+    return [replace_at_path(expression, path, replacement) for replacement in rules[type(nonterminal)]]
 
-    # Whether we have seen a non-terminal or not. If False, keep searching. If True, do nothing.
-    seen_nonterminal = False
-
-    # Once the first non-terminal is identified, this list will hold all of the things that can be derived from it using
-    # the production rules. For example, if the nonterminal is an Expression, this will hold a NumberExpression and a
-    # BooleanExpression.
-    replacements = []
-
-    # Holds a reference to the parent of the node with the first non-terminal as its child.
-    parent_ref = None
-
-    # The number of the attribute (e.g. 0 for "_0") that the non-terminal child is located at.
-    child_index = None
-
-    def maybe_do_replacement(self, expr) -> None:
-        nonlocal seen_nonterminal, replacements, parent_ref, child_index
-
-        # If we've already found a non-terminal, do nothing and don't go any deeper.
-        if seen_nonterminal:
-            return
-
-        if type(expr) is ir.Expression:
-            replacements = [ir.BooleanExpression(), ir.NumberExpression()]
-            seen_nonterminal = True
-        elif type(expr) is ir.BooleanExpression:
-            replacements = [
-                ir.Not(ir.BooleanExpression()),
-                ir.And(ir.BooleanExpression(), ir.BooleanExpression()),
-                ir.Or(ir.BooleanExpression(), ir.BooleanExpression()),
-                ir.Xor(ir.BooleanExpression(), ir.BooleanExpression()),
-                ir.Impl(ir.BooleanExpression(), ir.BooleanExpression()),
-                ir.Lt(ir.NumberExpression(), ir.NumberExpression()),
-            ] + boolean_holes
-            seen_nonterminal = True
-        elif type(expr) is ir.NumberExpression:
-            replacements = [
-                ir.Add(ir.NumberExpression(), ir.NumberExpression()),
-                ir.Sub(ir.NumberExpression(), ir.NumberExpression()),
-                ir.Mul(ir.NumberExpression(), ir.NumberExpression()),
-                # ir.Div(ir.NumberExpression(), ir.NumberExpression()),
-                ir.Ite(
-                    ir.BooleanExpression(), ir.NumberExpression(), ir.NumberExpression()
-                ),
-            ] + number_holes
-            seen_nonterminal = True
-        elif type(expr) is ir.BooleanHole or type(expr) is ir.NumberHole:
-            # This terminal case needs explicit handling because the hole types don't have "_<number>" attributes like
-            # the rest of the terminals.
-            return
-        else:
-            old_parent_ref, old_child_index = parent_ref, child_index
-            parent_ref = expr
-            for child_index in count(start=0):
-                try:
-                    self.visit(expr.__dict__[f"_{child_index}"])
-                except (AttributeError, KeyError):
-                    break
-                if seen_nonterminal:
-                    break
-            if not seen_nonterminal:
-                parent_ref, child_index = old_parent_ref, old_child_index
 
-    replacer = ir.make_visitor("Replacer", {}, default_action=maybe_do_replacement)()
-    replacer.visit(expression)
+def replace_at_path(expression: ir.Expression, path: Sequence[int], replacement: ir.Expression) -> ir.Expression:
+    if not path:
+        return replacement
+    children = list(expression._children)
+    children[path[0]] = replace_at_path(children[path[0]], path[1:], replacement)
+    return type(expression)(*children)
+
+
+class PartialProgram:
+    """
+    A program that may still have non-terminals in it, along with its number of elements, its number of non-terminals
+    and the path to its leftmost non-terminal, so that none of those have to be worked out by walking the whole tree.
+    """
+
+    __slots__ = ("expression", "size", "nonterminals", "path")
+
+    def __init__(self, expression: ir.Expression, size: int, nonterminals: int, path: Optional[Tuple[int, ...]]):
+        self.expression = expression
+        self.size = size
+        self.nonterminals = nonterminals
+        self.path = path
+
+    @classmethod
+    def of(cls, expression: ir.Expression) -> "PartialProgram":
+        return cls(
+            expression, count_elements(expression), count_nonterminals(expression), first_nonterminal_path(expression)
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PartialProgram) and self.expression is other.expression
 
-    # If the root node is a non-terminal, just return the replacement directly rather than trying to do substitutions in
-    # the tree.
-    if parent_ref is None:
-        return replacements
+    def __hash__(self) -> int:
+        return hash(self.expression)
 
-    ret = []
-    for replacement in replacements:
-        parent_ref.__dict__[f"_{child_index}"] = replacement
-        copy = deep_copy(expression)
-        ret.append(copy)
+    def expand(self, rules: Mapping[Type[ir.Expression], Sequence["PartialProgram"]]) -> Iterator["PartialProgram"]:
+        """
+        Derives the programs that replace the leftmost non-terminal with each of its `rules` (see `productions`, and
+        `PartialProgram.of` for turning them into `PartialProgram`s). Only the nodes from the root down to the
+        non-terminal are rebuilt, so this takes time proportional to the depth of the non-terminal.
+        """
+        path: Tuple[int, ...] = self.path  # type: ignore
+        spine = [self.expression]
+        for child_index in path:
+            spine.append(spine[-1]._children[child_index])
+        # Where the leftmost non-terminal will be if it's replaced by something without any: the first non-terminal in
+        # a subtree to the right of the path, going up from the bottom.
+        following: Optional[Tuple[int, ...]] = None
+        for level in range(len(path) - 1, -1, -1):
+            siblings = spine[level]._children
+            for sibling_index in range(path[level] + 1, len(siblings)):
+                sibling_path = first_nonterminal_path(siblings[sibling_index])
+                if sibling_path is not None:
+                    following = path[:level] + (sibling_index,) + sibling_path
+                    break
+            if following is not None:
+                break
 
-    return ret
+        for rule in rules[type(spine[-1])]:
+            expression = rule.expression
+            for level in range(len(path) - 1, -1, -1):
+                children = list(spine[level]._children)
+                children[path[level]] = expression
+                expression = type(spine[level])(*children)
+            yield PartialProgram(
+                expression,
+                self.size - 1 + rule.size,
+                self.nonterminals - 1 + rule.nonterminals,
+                following if rule.path is None else path + rule.path,
+            )
 
 
 HPQData = TypeVar("HPQData", bound=Hashable)
@@ -108,22 +178,39 @@ HPQData = TypeVar("HPQData", bound=Hashable)
 
 class HashFilteredPQ:
     """
-    A priority queue that uses a hash filter to prevent elements that have already been on the queue from re-entering
-    it.
+    A priority queue that prevents elements that have already been on the queue from re-entering it.
+
+    An element always has the same priority, and the queue is expected to be monotone: nothing is put on it with a
+    lower priority than the last element taken off it (as in the enumerator, where a derivative is never smaller than
+    the program it was derived from). So once an element with some priority has been taken off, the elements seen with
+    lower priorities are forgotten, and only the priorities still on the queue take up memory. An element put on the
+    queue out of order could come out twice, but never gets lost.
     """
 
     def __init__(self):
-        self.seen_hashes: MutableSet[int] = set()
+        # The elements seen with each priority. The elements themselves are kept, rather than their hashes, so that two
+        # different elements with the same hash can't be mistaken for each other.
+        self.seen: Dict[int, MutableSet[HPQData]] = {}
         self.queue: List[Tuple[int, int, HPQData]] = []
+        # Ties between elements with the same priority are broken by the order they were put on the queue in, so that
+        # the order elements come out in is the same every time.
+        self.counter = count()
+        self.duplicates = 0
 
     def put(self, priority: int, data: HPQData) -> None:
-        h = hash(data)
-        if h not in self.seen_hashes:
-            self.seen_hashes.add(h)
-            hq.heappush(self.queue, (priority, id(data), data))
+        seen = self.seen.get(priority)
+        if seen is None:
+            seen = self.seen[priority] = set()
+        if data not in seen:
+            seen.add(data)
+            hq.heappush(self.queue, (priority, next(self.counter), data))
+        else:
+            self.duplicates += 1
 
     def get(self) -> HPQData:
-        _, _, top_element = hq.heappop(self.queue)
+        priority, _, top_element = hq.heappop(self.queue)
+        for lower in [lower for lower in self.seen if lower < priority]:
+            del self.seen[lower]
         return top_element
 
     def empty(self) -> bool:
@@ -135,21 +222,400 @@ def enumerate_programs(
     maximum_depth: int = 3,
     numbers: List[str] = [],
     booleans: List[str] = [],
+    compact: bool = False,
+    bottom_up: bool = False,
+    inputs: Collection[str] = (),
+    examples: Sequence[Tuple[OracleInput, Any]] = (),
+    frontier: Optional[Frontier] = None,
+    canonical: bool = False,
+    pruned: Optional[MutableMapping[int, int]] = None,
+    metrics: Optional[Metrics] = None,
 ) -> Iterator[ir.Expression]:
+    """
+    Enumerates the programs of type `target_type` with at most `maximum_depth` nodes, smallest first. If `compact` is
+    True, the programs waiting to be expanded are stored as byte strings (see `encoding`) rather than trees of objects,
+    which takes much less memory, in `frontier` if it's given (see `Frontier` for keeping some of them on disk). If
+    `bottom_up` is True, programs are built bottom-up instead, and only one of each set of programs that behave the same
+    on `examples` is enumerated (see `BottomUpEnumerator`).
+
+    If `canonical` is True, only canonical programs are enumerated (see `canonical`), and partial programs are dropped
+    as soon as it's clear that nothing derived from them can be canonical. The number dropped of each size is added to
+    `pruned`, if it's given.
+
+    If `metrics` is given, the time spent expanding and queueing partial programs is added to it (see
+    `instrumentation`), and so are the number of duplicates dropped and the size of the queue.
+    """
+    if compact and bottom_up:
+        raise ValueError("the bottom-up enumerator does not support the compact encoding")
+    if frontier is not None and not compact:
+        raise ValueError("a frontier can only be used with the compact encoding")
+    if bottom_up:
+        enumerator = BottomUpEnumerator(
+            target_type,
+            maximum_depth=maximum_depth,
+            numbers=numbers,
+            booleans=booleans,
+            inputs=inputs,
+            examples=examples,
+            canonical=canonical,
+            pruned=pruned,
+        )
+        for program in enumerator:
+            if metrics is not None:
+                metrics.set_count("deduplicated", enumerator.duplicates)
+                metrics.gauge("programs_built", len(enumerator.built))
+            yield program
+        return
+    if compact:
+        yield from enumerate_compact_programs(
+            target_type,
+            maximum_depth=maximum_depth,
+            numbers=numbers,
+            booleans=booleans,
+            frontier=frontier,
+            canonical=canonical,
+            pruned=pruned,
+            metrics=metrics,
+        )
+        return
+    rules = {
+        nonterminal: [PartialProgram.of(rule) for rule in right_hand_sides]
+        for nonterminal, right_hand_sides in productions(numbers, booleans).items()
+    }
     queue = HashFilteredPQ()
-    queue.put(1, target_type())
+    queue.put(1, PartialProgram.of(target_type()))
     while not queue.empty():
-        current_element: ir.Expression = queue.get()
-        if count_nonterminals(current_element) == 0:
-            yield current_element
-        else:
-            derivatives = replace_one_nonterminal(
-                current_element, numbers=numbers, booleans=booleans
-            )
-            for derivative in derivatives:
-                d = count_elements(derivative)  # depth(derivative)
-                if d <= maximum_depth:
-                    queue.put(d, derivative)
+        current: PartialProgram = queue.get()
+        if current.nonterminals == 0:
+            if metrics is not None:
+                metrics.set_count("deduplicated", queue.duplicates)
+                metrics.gauge("frontier_size", len(queue.queue))
+            yield current.expression
+            continue
+        if metrics is not None:
+            start = time.perf_counter()
+        derivatives = []
+        for derivative in current.expand(rules):
+            if derivative.size > maximum_depth:
+                continue
+            # Only the nodes that were just rebuilt can have stopped being canonical.
+            if canonical and not path_is_canonical(derivative.expression, current.path):  # type: ignore
+                if pruned is not None:
+                    pruned[derivative.size] = pruned.get(derivative.size, 0) + 1
+                continue
+            derivatives.append(derivative)
+        if metrics is not None:
+            expanded = time.perf_counter()
+            metrics.add_time("expansion", expanded - start)
+            metrics.count("derivatives", len(derivatives))
+        for derivative in derivatives:
+            queue.put(derivative.size, derivative)
+        if metrics is not None:
+            metrics.add_time("hashing", time.perf_counter() - expanded)
+
+
+def enumerate_compact_programs(
+    target_type: Union[Type[ir.BooleanExpression], Type[ir.NumberExpression]],
+    maximum_depth: int = 3,
+    numbers: List[str] = [],
+    booleans: List[str] = [],
+    frontier: Optional[Frontier] = None,
+    canonical: bool = False,
+    pruned: Optional[MutableMapping[int, int]] = None,
+    metrics: Optional[Metrics] = None,
+) -> Iterator[ir.Expression]:
+    codec = encoding.ProgramCodec()
+    # The encoded right-hand sides of the production rules for each non-terminal.
+    encoded_rules = {
+        encoding.OPERATION_OPCODES[nonterminal]: [codec.encode(rule) for rule in right_hand_sides]
+        for nonterminal, right_hand_sides in productions(numbers, booleans).items()
+    }
+
+    # Programs come off of the frontier shortest first, and in order of their encodings within each length.
+    queue = Frontier() if frontier is None else frontier
+    queue.put(1, codec.encode(target_type()))
+    while not queue.empty():
+        code: bytes = queue.get()
+        index = encoding.find_nonterminal(code)
+        if index == -1:
+            if metrics is not None:
+                metrics.set_count("deduplicated", queue.duplicates)
+                metrics.gauge("frontier_size", len(queue))
+            # Only complete programs (and partial ones that need checking for canonicity) get turned back into objects.
+            yield codec.decode(code)
+            continue
+        if metrics is not None:
+            start = time.perf_counter()
+        prefix, suffix = code[:index], code[index + 1 :]
+        derivatives = []
+        for replacement in encoded_rules[code[index]]:
+            derivative = prefix + replacement + suffix
+            # Every node is one byte, so the length is the number of elements.
+            if len(derivative) > maximum_depth:
+                continue
+            if canonical and not is_canonical(codec.decode(derivative)):
+                if pruned is not None:
+                    pruned[len(derivative)] = pruned.get(len(derivative), 0) + 1
+                continue
+            derivatives.append(derivative)
+        if metrics is not None:
+            expanded = time.perf_counter()
+            metrics.add_time("expansion", expanded - start)
+            metrics.count("derivatives", len(derivatives))
+        for derivative in derivatives:
+            queue.put(len(derivative), derivative)
+        if metrics is not None:
+            metrics.add_time("hashing", time.perf_counter() - expanded)
+
+
+# How to compute each operation on concrete values, for finding programs that behave the same on the examples.
+_SEMANTICS: Dict[Type[ir.Expression], Callable[..., Any]] = {
+    ir.Not: operator.not_,
+    ir.And: lambda a, b: a and b,
+    ir.Or: lambda a, b: a or b,
+    ir.Xor: operator.ne,
+    ir.Impl: lambda a, b: not a or b,
+    ir.Add: operator.add,
+    ir.Sub: operator.sub,
+    ir.Mul: operator.mul,
+    ir.Div: operator.truediv,
+    ir.Ite: lambda condition, a, b: a if condition else b,
+    ir.Lt: operator.lt,
+}
+
+# The outputs of a program on each example, or None if the program can't be evaluated (because it has holes for
+# constants in it, or it divides by zero).
+Signature = Optional[Tuple[Union[bool, float], ...]]
+Category = Union[Type[ir.BooleanExpression], Type[ir.NumberExpression]]
+
+
+class BottomUpEnumerator:
+    """
+    Enumerates programs bottom-up, smallest first, by combining smaller programs with the operations of the grammar.
+
+    Programs that only contain input holes are evaluated on the inputs in `examples`, and out of every set of programs
+    that give the same outputs on all of them (i.e. are observationally equivalent) only the first, the representative,
+    is enumerated and used to build bigger programs. The rest are kept in its equivalence class. `examples` may grow
+    while the enumeration runs (it's normally the example bank of a `Validator`): when it does, equivalence classes are
+    split on the new examples, and the programs that stop being equivalent to their representative are enumerated, along
+    with every program already within the size reached that can now be built from them.
+
+    If `canonical` is True, programs that aren't canonical are never built on (see `enumerate_programs`).
+    """
+
+    def __init__(
+        self,
+        target_type: Category,
+        maximum_depth: int = 3,
+        numbers: List[str] = [],
+        booleans: List[str] = [],
+        inputs: Collection[str] = (),
+        examples: Sequence[Tuple[OracleInput, Any]] = (),
+        canonical: bool = False,
+        pruned: Optional[MutableMapping[int, int]] = None,
+    ):
+        self.target_type = target_type
+        self.canonical = canonical
+        self.pruned = pruned
+        self.maximum_depth = maximum_depth
+        self.inputs = set(inputs)
+        self.examples = examples
+        self.seen_examples = 0
+
+        # The grammar is taken from the top-down enumerator's production rules so that both enumerate the same space.
+        self.leaves: Dict[Category, List[ir.Expression]] = {}
+        self.operations: Dict[Category, List[Tuple[Type[ir.Expression], Tuple[Category, ...]]]] = {}
+        rules = productions(numbers, booleans)
+        for category in (ir.BooleanExpression, ir.NumberExpression):
+            derivatives = rules[category]
+            self.leaves[category] = [d for d in derivatives if not d._children]
+            self.operations[category] = [
+                (type(d), tuple(type(child) for child in d._children)) for d in derivatives if d._children
+            ]
+
+        # Every program that has been built, in the order it was built in (so children always come before parents).
+        self.built: List[ir.Expression] = []
+        self.sizes: Dict[ir.Expression, int] = {}
+        self.signatures: Dict[ir.Expression, Signature] = {}
+        # The representatives of each category and size, which are what bigger programs are built from.
+        self.representatives: DefaultDict[Tuple[Category, int], List[ir.Expression]] = defaultdict(list)
+        # The equivalence classes, keyed by category and signature. The representative is always the first member.
+        self.classes: Dict[Tuple[Category, Signature], List[ir.Expression]] = {}
+        self.current_size = 0
+        # The number of programs that were dropped because they were built before or are equivalent to a
+        # representative.
+        self.duplicates = 0
+
+    def __iter__(self) -> Iterator[ir.Expression]:
+        self.seen_examples = len(self.examples)
+        for size in range(1, self.maximum_depth + 1):
+            self.current_size = size
+            if size == 1:
+                candidates: Iterator[Tuple[ir.Expression, Category]] = (
+                    (leaf, category) for category, leaves in self.leaves.items() for leaf in leaves
+                )
+            else:
+                candidates = self.build(size)
+            yield from self.add_all(candidates, size, None)
+
+    def add_all(
+        self,
+        candidates: Iterator[Tuple[ir.Expression, Category]],
+        size: int,
+        new: Optional[DefaultDict[Tuple[Category, int], List[ir.Expression]]],
+    ) -> Iterator[ir.Expression]:
+        for program, category in candidates:
+            # The children are all canonical (they're representatives), so only the new node needs checking.
+            if self.canonical and not locally_canonical(program):
+                if self.pruned is not None:
+                    self.pruned[size] = self.pruned.get(size, 0) + 1
+                continue
+            if not self.add(program, category, size):
+                continue
+            if new is not None:
+                new[(category, size)].append(program)
+            if category is self.target_type:
+                yield program
+            if len(self.examples) > self.seen_examples:
+                yield from self.split_classes()
+
+    def build(
+        self, size: int, new: Optional[Dict[Tuple[Category, int], List[ir.Expression]]] = None
+    ) -> Iterator[Tuple[ir.Expression, Category]]:
+        """
+        Builds the programs with `size` nodes out of representatives. If `new` is given, only builds the ones that have
+        at least one of the representatives in it as a child.
+        """
+        for category, operations in self.operations.items():
+            for operation, child_categories in operations:
+                for child_sizes in _compositions(size - 1, len(child_categories)):
+                    options = [
+                        self.representatives[(child_category, child_size)]
+                        for child_category, child_size in zip(child_categories, child_sizes)
+                    ]
+                    if new is None:
+                        for children in product(*options):
+                            yield operation(*children), category
+                        continue
+                    for i, (child_category, child_size) in enumerate(zip(child_categories, child_sizes)):
+                        new_children = new.get((child_category, child_size))
+                        if new_children:
+                            for children in product(*options[:i], list(new_children), *options[i + 1 :]):
+                                yield operation(*children), category
+
+    def add(self, program: ir.Expression, category: Category, size: int) -> bool:
+        """
+        Records a newly built program. Returns True if it's a new representative, and False if it was built before or
+        is equivalent to an existing representative.
+        """
+        if program in self.sizes:
+            self.duplicates += 1
+            return False
+        self.built.append(program)
+        self.sizes[program] = size
+        signature = self.signature(program, 0)
+        self.signatures[program] = signature
+        if signature is not None:
+            members = self.classes.setdefault((category, signature), [])
+            members.append(program)
+            if len(members) > 1:
+                self.duplicates += 1
+                return False
+        self.representatives[(category, size)].append(program)
+        return True
+
+    def signature(self, program: ir.Expression, start: int) -> Signature:
+        """
+        Computes the outputs of `program` on the examples from `start` up to `seen_examples`, using the signatures that
+        have already been computed for its children.
+        """
+        if type(program) in (ir.BooleanHole, ir.NumberHole):
+            if program._name not in self.inputs:
+                return None
+            return tuple(inputs[program._name] for inputs, _ in self.examples[start : self.seen_examples])
+        elif type(program) in (ir.BooleanLiteral, ir.NumberLiteral):
+            return (program._value,) * (self.seen_examples - start)
+        semantics = _SEMANTICS.get(type(program))
+        child_signatures = [self.signatures[child] for child in program._children]
+        if semantics is None or None in child_signatures:
+            return None
+        try:
+            return tuple(map(semantics, *(signature[start:] for signature in child_signatures)))  # type: ignore
+        except ZeroDivisionError:
+            return None
+
+    def split_classes(self) -> Iterator[ir.Expression]:
+        start, self.seen_examples = self.seen_examples, len(self.examples)
+        for program in self.built:
+            signature = self.signatures[program]
+            if signature is not None:
+                extension = self.signature(program, start)
+                self.signatures[program] = None if extension is None else signature + extension
+
+        new: DefaultDict[Tuple[Category, int], List[ir.Expression]] = defaultdict(list)
+        old_classes, self.classes = self.classes, {}
+        for (category, _), members in old_classes.items():
+            representative = members[0]
+            groups: Dict[Hashable, List[ir.Expression]] = {}
+            for member in members:
+                # Programs that can no longer be evaluated each go in a group of their own.
+                signature = self.signatures[member]
+                groups.setdefault(member if signature is None else signature, []).append(member)
+            for group in groups.values():
+                if group[0] is not representative:
+                    promoted = min(group, key=self.sizes.__getitem__)
+                    group.remove(promoted)
+                    group.insert(0, promoted)
+                    size = self.sizes[promoted]
+                    self.representatives[(category, size)].append(promoted)
+                    new[(category, size)].append(promoted)
+                    if category is self.target_type:
+                        yield promoted
+                if self.signatures[group[0]] is not None:
+                    self.classes[(category, self.signatures[group[0]])] = group
+
+        # Build everything up to the current size that has one of the new representatives as a descendant. The programs
+        # built here that turn out to be new representatives are added to `new` as they're found, so the sizes after
+        # them get built out of them too.
+        if new:
+            for size in range(min(size for _, size in new) + 1, self.current_size + 1):
+                yield from self.add_all(self.build(size, new), size, new)
+
+
+def canonicalization_report(
+    target_type: Union[Type[ir.BooleanExpression], Type[ir.NumberExpression]],
+    maximum_depth: int = 3,
+    numbers: List[str] = [],
+    booleans: List[str] = [],
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Enumerates the programs with and without canonicalization, and returns how many programs of each size there are in
+    total and in canonical form, and how many partial programs of that size were dropped, as tuples of `(size, total,
+    canonical, pruned)`.
+    """
+    totals: DefaultDict[int, int] = defaultdict(int)
+    canonicals: DefaultDict[int, int] = defaultdict(int)
+    pruned: Dict[int, int] = {}
+    for program in enumerate_programs(target_type, maximum_depth=maximum_depth, numbers=numbers, booleans=booleans):
+        totals[count_elements(program)] += 1
+    for program in enumerate_programs(
+        target_type, maximum_depth=maximum_depth, numbers=numbers, booleans=booleans, canonical=True, pruned=pruned
+    ):
+        canonicals[count_elements(program)] += 1
+    return [(size, totals[size], canonicals[size], pruned.get(size, 0)) for size in range(1, maximum_depth + 1)]
+
+
+def _compositions(total: int, parts: int) -> Iterator[Tuple[int, ...]]:
+    """
+    All of the ways of writing `total` as an ordered sum of `parts` positive integers.
+    """
+    if parts == 1:
+        if total >= 1:
+            yield (total,)
+        return
+    for first in range(1, total - parts + 2):
+        for rest in _compositions(total - first, parts - 1):
+            yield (first,) + rest
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -185,12 +651,62 @@ if __name__ == "__main__":  # pragma: no cover
         type=str,
         default=[],
     )
+    parser.add_argument(
+        "-c",
+        "--compact",
+        help="store partial programs as compact byte strings to save memory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--canonical",
+        help="only enumerate programs in canonical form (e.g. (+ x y) but not (+ y x))",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--canonical-report",
+        help="instead of printing the programs, print how many of each size canonicalization removes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--frontier-size",
+        help="number of partial programs to keep in memory with --compact before spilling the rest to disk",
+        type=int,
+        default=1_000_000,
+    )
+    parser.add_argument(
+        "--spill-dir",
+        help="directory to spill partial programs to with --compact",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--frontier-stats",
+        help="print statistics about the frontier to stderr when done (with --compact)",
+        action="store_true",
+    )
     args = parser.parse_args()
 
     target_type = (
         ir.BooleanExpression if args.type == "boolean" else ir.NumberExpression
     )
+    if args.canonical_report:
+        print("size\ttotal\tcanonical\tremoved\tpartial programs pruned")
+        for size, total, canonical, pruned in canonicalization_report(
+            target_type, maximum_depth=args.max_depth, numbers=args.numbers, booleans=args.booleans  # type: ignore
+        ):
+            removed = f"{100 * (total - canonical) / total:.1f}%" if total else "-"
+            print(f"{size}\t{total}\t{canonical}\t{removed}\t{pruned}")
+        sys.exit()
+    frontier = Frontier(args.frontier_size, args.spill_dir) if args.compact else None
     for program in enumerate_programs(
-        target_type, maximum_depth=args.max_depth, booleans=args.booleans, numbers=args.numbers  # type: ignore
+        target_type,  # type: ignore
+        maximum_depth=args.max_depth,
+        booleans=args.booleans,
+        numbers=args.numbers,
+        compact=args.compact,
+        frontier=frontier,
+        canonical=args.canonical,
     ):
         print(str(program))
+    if frontier is not None and args.frontier_stats:
+        print(frontier.stats(), file=sys.stderr)
@@ -0,0 +1,170 @@
+"""
+A priority queue of byte strings for the enumerator's frontier, which can grow much bigger than fits in memory.
+
+Up to `max_in_memory` entries are kept in a heap. When it overflows, the larger half of the heap is sorted and written
+to a run file on disk, and entries come back out of the run files, merged in order, when they're the smallest around.
+Entries are ordered by priority and then by the bytes themselves, so the same entry always comes out next to its
+duplicates, wherever they were stored, and duplicates are dropped exactly (without a set of everything ever seen) by
+comparing each entry with the one that came out before it.
+
+For that to work, the queue has to be monotone: nothing may be put on it that is smaller than the last entry taken off
+it. The compact enumerator satisfies this, since a derivative is never smaller than the program it was derived from:
+it's either longer, or it's the same length with a non-terminal (the lowest opcodes) replaced by a leaf.
+"""
+import heapq as hq
+import os
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+_HEADER = struct.Struct(">IH")
+
+Entry = Tuple[int, bytes]
+
+
+class Frontier:
+    def __init__(self, max_in_memory: int = 1_000_000, directory: Optional[str] = None):
+        """
+        Run files are put in a new temporary directory inside `directory` (or the system's temporary directory), which
+        is removed when the frontier is closed or emptied.
+        """
+        if max_in_memory < 2:
+            raise ValueError(f"max_in_memory={max_in_memory} must be at least 2")
+        self.max_in_memory = max_in_memory
+        self.directory = directory
+        self.heap: List[Entry] = []
+        self.last: Optional[Entry] = None
+
+        self._run_directory: Optional[str] = None
+        self._runs: List[Iterator[Entry]] = []
+        self._files: List[BinaryIO] = []
+        # The next entry from each run, along with the run's index.
+        self._run_heads: List[Tuple[Entry, int]] = []
+        self._on_disk = 0
+
+        # Statistics.
+        self.pushed = 0
+        self.popped = 0
+        self.duplicates = 0
+        self.runs = 0
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.peak_in_memory = 0
+
+    def __len__(self) -> int:
+        """
+        The number of entries on the frontier, including duplicates that haven't been dropped yet.
+        """
+        return len(self.heap) + self._on_disk
+
+    def __enter__(self) -> "Frontier":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pushed": self.pushed,
+            "popped": self.popped,
+            "duplicates": self.duplicates,
+            "in_memory": len(self.heap),
+            "on_disk": self._on_disk,
+            "peak_in_memory": self.peak_in_memory,
+            "runs": self.runs,
+            "spilled": self.spilled,
+            "spilled_bytes": self.spilled_bytes,
+        }
+
+    def close(self) -> None:
+        for f in self._files:
+            f.close()
+        self._files = []
+        self._runs = []
+        self._run_heads = []
+        self._on_disk = 0
+        if self._run_directory is not None:
+            shutil.rmtree(self._run_directory, ignore_errors=True)
+            self._run_directory = None
+
+    def put(self, priority: int, data: bytes) -> None:
+        entry = (priority, data)
+        if self.last is not None and entry < self.last:
+            raise ValueError(f"{entry} is smaller than {self.last}, which has already been taken off the frontier")
+        hq.heappush(self.heap, entry)
+        self.pushed += 1
+        if len(self.heap) > self.max_in_memory:
+            self._spill()
+        self.peak_in_memory = max(self.peak_in_memory, len(self.heap))
+
+    def get(self) -> bytes:
+        while True:
+            entry = self._pop()
+            if entry != self.last:
+                self.last = entry
+                self.popped += 1
+                return entry[1]
+            self.duplicates += 1
+
+    def empty(self) -> bool:
+        # Duplicates of the last entry are dropped here, so that a frontier with nothing but those left is empty.
+        while len(self) and self._peek() == self.last:
+            self._pop()
+            self.duplicates += 1
+        if not len(self):
+            self.close()
+            return True
+        return False
+
+    def _peek(self) -> Entry:
+        if self._run_heads and (not self.heap or self._run_heads[0][0] < self.heap[0]):
+            return self._run_heads[0][0]
+        return self.heap[0]
+
+    def _pop(self) -> Entry:
+        if self._run_heads and (not self.heap or self._run_heads[0][0] < self.heap[0]):
+            entry, run = self._run_heads[0]
+            following = next(self._runs[run], None)
+            if following is None:
+                hq.heappop(self._run_heads)
+            else:
+                hq.heapreplace(self._run_heads, (following, run))
+            self._on_disk -= 1
+            return entry
+        return hq.heappop(self.heap)
+
+    def _spill(self) -> None:
+        """
+        Writes the larger half of the heap to a new run file, keeping the smaller half (which will be needed first).
+        """
+        self.heap.sort()
+        keep = len(self.heap) // 2
+        spilled = self.heap[keep:]
+        # A sorted list is a heap already.
+        del self.heap[keep:]
+        if self._run_directory is None:
+            self._run_directory = tempfile.mkdtemp(prefix="frontier-", dir=self.directory)
+        path = os.path.join(self._run_directory, f"run-{self.runs}")
+        with open(path, "wb") as f:
+            for priority, data in spilled:
+                f.write(_HEADER.pack(priority, len(data)))
+                f.write(data)
+            self.spilled_bytes += f.tell()
+        self.runs += 1
+        self.spilled += len(spilled)
+        self._on_disk += len(spilled)
+        run_file = open(path, "rb")
+        self._files.append(run_file)
+        run = _read_run(run_file)
+        self._runs.append(run)
+        hq.heappush(self._run_heads, (next(run), len(self._runs) - 1))
+
+
+def _read_run(f: BinaryIO) -> Iterator[Entry]:
+    while True:
+        header = f.read(_HEADER.size)
+        if not header:
+            return
+        priority, length = _HEADER.unpack(header)
+        yield priority, f.read(length)
@@ -0,0 +1,149 @@
+"""
+Timers, counters and gauges for watching where a synthesis run spends its time.
+
+The pieces of the synthesizer take an optional `Metrics` and only measure anything if they're given one, so runs that
+don't ask for metrics don't pay for them. The phases that are timed are:
+
+ - `enumeration`: waiting for the enumerator to produce the next candidate, which includes `expansion` and `hashing`.
+ - `expansion`: deriving new partial programs from the one taken off the queue (top-down enumeration only).
+ - `hashing`: putting derivatives on the queue, which is where the tree enumerator drops duplicates (top-down
+   enumeration only).
+ - `concrete_check`: evaluating candidates on the examples directly.
+ - `z3_translation`: building the Z3 constraints for the examples.
+ - `solver`: the solver's checks.
+ - `oracle`: waiting for the oracle's answers.
+
+A summary can be written as JSON, or in the text format that Prometheus (e.g. its node exporter's textfile collector)
+reads.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_PREFIX = "synthesis"
+
+
+class _Timer:
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics: "Metrics", phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_) -> None:
+        self.metrics.add_time(self.phase, time.perf_counter() - self.start)
+
+
+class Metrics:
+    def __init__(self):
+        # The total time spent in each phase, and how many times it was entered.
+        self.times: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        # The last and largest value of each gauge.
+        self.gauges: Dict[str, float] = {}
+        self.peaks: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def timer(self, phase: str) -> _Timer:
+        """
+        A context manager that adds the time spent in it to `phase`.
+        """
+        return _Timer(self, phase)
+
+    def add_time(self, phase: str, seconds: float, calls: int = 1) -> None:
+        self.times[phase] = self.times.get(phase, 0.0) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + calls
+
+    def timed(self, iterable: Iterable[T], phase: str) -> Iterator[T]:
+        """
+        Yields the items of `iterable`, adding the time spent waiting for each of them to `phase`.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(phase, time.perf_counter() - start)
+                return
+            self.add_time(phase, time.perf_counter() - start)
+            yield item
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_count(self, name: str, value: int) -> None:
+        """
+        Sets a counter that's kept track of elsewhere (e.g. by a queue) to its current total.
+        """
+        self.counters[name] = value
+
+    def gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+        if name not in self.peaks or value > self.peaks[name]:
+            self.peaks[name] = value
+
+    def merge(self, other: "Metrics") -> None:
+        """
+        Adds the times and counts in `other` (e.g. from another process) to these.
+        """
+        for phase, seconds in other.times.items():
+            self.add_time(phase, seconds, other.calls[phase])
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+        for name, value in other.gauges.items():
+            self.gauges[name] = value
+            self.peaks[name] = max(self.peaks.get(name, value), other.peaks[name])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "elapsed_seconds": time.perf_counter() - self.started,
+            "phases": {
+                phase: {"seconds": self.times[phase], "calls": self.calls[phase]} for phase in sorted(self.times)
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {name: {"last": self.gauges[name], "peak": self.peaks[name]} for name in sorted(self.gauges)},
+        }
+
+    def prometheus(self) -> str:
+        lines = [
+            f"# HELP {_PREFIX}_elapsed_seconds Time since the run started.",
+            f"# TYPE {_PREFIX}_elapsed_seconds gauge",
+            f"{_PREFIX}_elapsed_seconds {time.perf_counter() - self.started}",
+            f"# HELP {_PREFIX}_phase_seconds_total Time spent in each phase of the run.",
+            f"# TYPE {_PREFIX}_phase_seconds_total counter",
+            *(f'{_PREFIX}_phase_seconds_total{{phase="{phase}"}} {self.times[phase]}' for phase in sorted(self.times)),
+            f"# HELP {_PREFIX}_phase_calls_total Number of times each phase of the run was entered.",
+            f"# TYPE {_PREFIX}_phase_calls_total counter",
+            *(f'{_PREFIX}_phase_calls_total{{phase="{phase}"}} {self.calls[phase]}' for phase in sorted(self.calls)),
+        ]
+        for name in sorted(self.counters):
+            lines += [f"# TYPE {_PREFIX}_{name}_total counter", f"{_PREFIX}_{name}_total {self.counters[name]}"]
+        for name in sorted(self.gauges):
+            lines += [
+                f"# TYPE {_PREFIX}_{name} gauge",
+                f"{_PREFIX}_{name} {self.gauges[name]}",
+                f"# TYPE {_PREFIX}_{name}_peak gauge",
+                f"{_PREFIX}_{name}_peak {self.peaks[name]}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        _write_atomically(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path: str) -> None:
+        _write_atomically(path, self.prometheus())
+
+
+def _write_atomically(path: str, text: str) -> None:
+    # Scrapers may read the file at any time, so it's replaced rather than rewritten in place.
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
@@ -1,31 +1,97 @@
 import abc
-from typing import Any, Callable, Collection, Dict, Mapping, Optional, Type, Union
+import math
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, Hashable, Mapping, Optional, Tuple, Type, Union
 
 
-class Expression:
+class HashConsed(type):
+    """
+    Metaclass for IR nodes that hash-conses them: constructing an expression that is structurally equal to one that is
+    still alive returns the existing object instead of a new one. Because of this, equality between expressions is just
+    identity, and the structural hash can be computed once (from the cached hashes of the children) and stored on the
+    node.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._interned: "weakref.WeakValueDictionary[Tuple[Hashable, ...], Expression]" = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args):
+        # Fast path: an identical construction has already been validated and interned.
+        existing = cls._interned.get(cls._intern_key(args))
+        if existing is not None:
+            return existing
+        expression = super().__call__(*args)
+        key = cls._intern_key(expression._fields())
+        existing = cls._interned.get(key)
+        if existing is not None:
+            return existing
+        object.__setattr__(expression, "_hash", hash(key))
+        cls._interned[key] = expression
+        return expression
+
+
+class Expression(metaclass=HashConsed):
+    """
+    Base class for IR nodes. Nodes are immutable and hash-consed (see `HashConsed`), so they can be freely shared
+    between programs.
+    """
+
+    __slots__ = ("_children", "_hash", "__weakref__")
+
     # These may not be actually present. They're just here to make MyPy happy.
     _0: "Expression"
     _1: "Expression"
     _2: "Expression"
     _name: str
     _value: Union[bool, float]
+    _children: Tuple["Expression", ...]
+    _hash: int
+
+    # The number of children that nodes of this type have.
+    _arity: int = 0
+
+    def __init__(self):
+        object.__setattr__(self, "_children", ())
+
+    @classmethod
+    def _intern_key(cls, fields: Tuple[Any, ...]) -> Tuple[Hashable, ...]:
+        return (cls,) + fields
+
+    def _fields(self) -> Tuple[Any, ...]:
+        """
+        The arguments that the constructor of this node would need to build it again.
+        """
+        return self._children
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Rebuild through the constructor so that unpickled expressions are interned too.
+        return type(self), self._fields()
 
     def __str__(self):
         return to_smtlib2(self, strict=False)
 
     def __hash__(self):
-        return hash(str(self))
+        return self._hash
 
 
 class BooleanExpression(Expression):
-    pass
+    __slots__ = ()
 
 
 class NumberExpression(Expression):
-    pass
+    __slots__ = ()
 
 
 class BooleanLiteral(BooleanExpression):
+    __slots__ = ("_value",)
     _value: bool
 
     def __init__(self, value: bool):
@@ -34,15 +100,30 @@ class BooleanLiteral(BooleanExpression):
             raise TypeError(
                 f"cannot instantiate BooleanLiteral with non-Boolean {value} of type {type(value)}"
             )
-        self._value = value
+        object.__setattr__(self, "_value", value)
+
+    @classmethod
+    def _intern_key(cls, fields: Tuple[Any, ...]) -> Tuple[Hashable, ...]:
+        # Include the type of the value so that e.g. BooleanLiteral(1) isn't mistaken for BooleanLiteral(True).
+        return (cls,) + tuple((type(value), value) for value in fields)
+
+    def _fields(self) -> Tuple[Any, ...]:
+        return (self._value,)
 
 
 class BooleanHole(BooleanExpression):
+    __slots__ = ("_name",)
+
     def __init__(self, name: str):
-        self._name = name
+        super().__init__()
+        object.__setattr__(self, "_name", name)
+
+    def _fields(self) -> Tuple[Any, ...]:
+        return (self._name,)
 
 
 class NumberLiteral(NumberExpression):
+    __slots__ = ("_value",)
     _value: float
 
     def __init__(self, value: float):
@@ -53,12 +134,28 @@ class NumberLiteral(NumberExpression):
             raise TypeError(
                 f"cannot instantiate NumberLiteral with non-number {value} of type {type(value)}"
             )
-        self._value = value
+        object.__setattr__(self, "_value", value)
+
+    @classmethod
+    def _intern_key(cls, fields: Tuple[Any, ...]) -> Tuple[Hashable, ...]:
+        # 0.0 == -0.0, but they behave differently under division, so the sign has to be part of the key.
+        return (cls,) + tuple(
+            (type(value), value, math.copysign(1.0, value) if type(value) is float else None) for value in fields
+        )
+
+    def _fields(self) -> Tuple[Any, ...]:
+        return (self._value,)
 
 
 class NumberHole(NumberExpression):
+    __slots__ = ("_name",)
+
     def __init__(self, name: str):
-        self._name = name
+        super().__init__()
+        object.__setattr__(self, "_name", name)
+
+    def _fields(self) -> Tuple[Any, ...]:
+        return (self._name,)
 
 
 def check_operand_type(operand: Any, target_type: Type[Expression]) -> None:
@@ -81,9 +178,11 @@ def make_operation(
             )
         for i, (input, input_type) in enumerate(zip(inputs, input_types)):
             check_operand_type(input, input_type)
-            self.__dict__[f"_{i}"] = input
+            object.__setattr__(self, f"_{i}", input)
+        object.__setattr__(self, "_children", inputs)
 
-    return type(name, (output_type,), {"__init__": __init__})
+    slots = tuple(f"_{i}" for i in range(arity))
+    return type(name, (output_type,), {"__init__": __init__, "__slots__": slots, "_arity": arity})
 
 
 Not = make_operation("Not", (BooleanExpression,), BooleanExpression)
@@ -107,6 +206,12 @@ class Visitor(abc.ABC):
         pass
 
 
+# Visitor classes built by `make_visitor`, keyed by everything that went into building them. This is bounded because
+# callers that pass freshly created closures as handlers will never hit the cache.
+_VISITOR_CACHE: "OrderedDict[Hashable, Type[Visitor]]" = OrderedDict()
+_VISITOR_CACHE_SIZE = 256
+
+
 def make_visitor(
     name: str,
     visit_handlers: Mapping[Type[Expression], Callable[[Visitor, Expression], Any]],
@@ -122,21 +227,77 @@ def make_visitor(
        if you name an attribute `visit` it will be overwritten.
      - `default_action` is a function that is called when types that don't have handlers explicitly set for them in
        `visit_handlers` are encountered. If `None`, the visitor will fail with an error upon encountering such a type.
+
+    Calling this again with the same arguments returns the same class rather than building a new one.
     """
+    try:
+        key: Optional[Hashable] = (
+            name,
+            frozenset(visit_handlers.items()),
+            frozenset(attributes.items()),
+            default_action,
+        )
+    except TypeError:
+        # Some attribute isn't hashable, so this visitor can't be cached.
+        key = None
+    if key is not None and key in _VISITOR_CACHE:
+        _VISITOR_CACHE.move_to_end(key)
+        return _VISITOR_CACHE[key]
+
+    # Maps each concrete expression type to the function that handles it. Types without an explicit handler are resolved
+    # (to `default_action` or to an error) the first time they're seen, so every later visit is a single lookup.
+    dispatch: Dict[type, Callable[[Visitor, Expression], Any]] = dict(visit_handlers)
+    lookup = dispatch.get
+
+    def unsupported(self, expression):
+        raise NotImplementedError(f"{type(self)} does not support visiting {type(expression)}")
+
+    def resolve(expression_type: type) -> Callable[[Visitor, Expression], Any]:
+        handler = default_action if default_action else unsupported
+        dispatch[expression_type] = handler
+        return handler
 
     def visit(self, expression):
-        expression_type = type(expression)
-        try:
-            return visit_handlers[expression_type](self, expression)
-        except KeyError:
-            if default_action:
-                return default_action(self, expression)
-            raise NotImplementedError(
-                f"{type(self)} does not support visiting {expression_type}"
-            )
-
-    attributes["visit"] = visit
-    return type(name, (Visitor,), attributes)
+        handler = lookup(type(expression))
+        if handler is None:
+            handler = resolve(type(expression))
+        return handler(self, expression)
+
+    visitor = type(name, (Visitor,), {**attributes, "visit": visit})
+    if key is not None:
+        _VISITOR_CACHE[key] = visitor
+        if len(_VISITOR_CACHE) > _VISITOR_CACHE_SIZE:
+            _VISITOR_CACHE.popitem(last=False)
+    return visitor
+
+
+_SMTLIB2_RULES: Dict[Type[Expression], Callable[[Visitor, Expression], str]] = {
+    BooleanLiteral: lambda _, expr: "true" if expr._value else "false",
+    BooleanHole: lambda _, expr: expr._name,
+    NumberLiteral: lambda _, expr: str(expr._value),
+    NumberHole: lambda _, expr: expr._name,
+    Not: lambda self, expr: f"(not {self.visit(expr._0)})",
+    And: lambda self, expr: f"(and {self.visit(expr._0)} {self.visit(expr._1)})",
+    Or: lambda self, expr: f"(or {self.visit(expr._0)} {self.visit(expr._1)})",
+    Xor: lambda self, expr: f"(xor {self.visit(expr._0)} {self.visit(expr._1)})",
+    Impl: lambda self, expr: f"(=> {self.visit(expr._0)} {self.visit(expr._1)})",
+    Add: lambda self, expr: f"(+ {self.visit(expr._0)} {self.visit(expr._1)})",
+    Sub: lambda self, expr: f"(- {self.visit(expr._0)} {self.visit(expr._1)})",
+    Mul: lambda self, expr: f"(* {self.visit(expr._0)} {self.visit(expr._1)})",
+    Div: lambda self, expr: f"(/ {self.visit(expr._0)} {self.visit(expr._1)})",
+    Ite: lambda self, expr: f"(if {self.visit(expr._0)} {self.visit(expr._1)} {self.visit(expr._2)})",
+    Lt: lambda self, expr: f"(< {self.visit(expr._0)} {self.visit(expr._1)})",
+}
+_STRICT_SMTLIB2 = make_visitor("ToSMTLIB2", _SMTLIB2_RULES)()
+_LOOSE_SMTLIB2 = make_visitor(
+    "ToSMTLIB2",
+    {
+        **_SMTLIB2_RULES,
+        BooleanExpression: lambda self, expr: "[BOOLEAN EXPRESSION]",
+        Expression: lambda self, expr: "[UNTYPED EXPRESSION]",
+        NumberExpression: lambda self, expr: "[NUMBER EXPRESSION]",
+    },
+)()
 
 
 def to_smtlib2(expression: Expression, strict: bool = False) -> str:
@@ -149,25 +310,4 @@ def to_smtlib2(expression: Expression, strict: bool = False) -> str:
     If strict is True, then function will only generate valid SMT-LIB code, and will fail if that is impossible. If
     strict is False, it will include some other things like [BOOLEAN EXPRESSION].
     """
-    rules: Dict[Type[Expression], Callable[[Visitor, Expression], str]] = {
-        BooleanLiteral: lambda _, expr: "true" if expr._value else "false",
-        BooleanHole: lambda _, expr: expr._name,
-        NumberLiteral: lambda _, expr: str(expr._value),
-        NumberHole: lambda _, expr: expr._name,
-        Not: lambda self, expr: f"(not {self.visit(expr._0)})",
-        And: lambda self, expr: f"(and {self.visit(expr._0)} {self.visit(expr._1)})",
-        Or: lambda self, expr: f"(or {self.visit(expr._0)} {self.visit(expr._1)})",
-        Xor: lambda self, expr: f"(xor {self.visit(expr._0)} {self.visit(expr._1)})",
-        Impl: lambda self, expr: f"(=> {self.visit(expr._0)} {self.visit(expr._1)})",
-        Add: lambda self, expr: f"(+ {self.visit(expr._0)} {self.visit(expr._1)})",
-        Sub: lambda self, expr: f"(- {self.visit(expr._0)} {self.visit(expr._1)})",
-        Mul: lambda self, expr: f"(* {self.visit(expr._0)} {self.visit(expr._1)})",
-        Div: lambda self, expr: f"(/ {self.visit(expr._0)} {self.visit(expr._1)})",
-        Ite: lambda self, expr: f"(if {self.visit(expr._0)} {self.visit(expr._1)} {self.visit(expr._2)})",
-        Lt: lambda self, expr: f"(< {self.visit(expr._0)} {self.visit(expr._1)})",
-    }
-    if not strict:
-        rules[BooleanExpression] = lambda self, expr: "[BOOLEAN EXPRESSION]"
-        rules[Expression] = lambda self, expr: "[UNTYPED EXPRESSION]"
-        rules[NumberExpression] = lambda self, expr: "[NUMBER EXPRESSION]"
-    return make_visitor("ToSMTLIB2", rules)().visit(expression)
+    return (_STRICT_SMTLIB2 if strict else _LOOSE_SMTLIB2).visit(expression)
@@ -1,5 +1,4 @@
-from itertools import count
-from typing import Callable, Literal, Union
+from typing import Callable, FrozenSet, Literal, Mapping, Optional, Union
 
 from . import intermediate_representation as ir
 
@@ -8,23 +7,18 @@ def visit_all_below(self: ir.Visitor, expr: ir.Expression) -> None:
     """
     A sensible default action for visitors that just goes visits the children of the current node.
     """
-    for i in count(start=0):
-        try:
-            self.visit(expr.__dict__[f"_{i}"])
-        except (AttributeError, KeyError):
-            return
+    for child in expr._children:
+        self.visit(child)
 
 
-def evaluate(expression: ir.Expression) -> Union[float, bool]:
-    handle_boolean_literal: Callable[
-        [ir.Visitor, ir.BooleanLiteral], bool
-    ] = lambda _, expr: expr._value
-    handle_number_literal: Callable[
-        [ir.Visitor, ir.NumberLiteral], float
-    ] = lambda _, expr: expr._value
-    rules = {
-        ir.BooleanLiteral: handle_boolean_literal,
-        ir.NumberLiteral: handle_number_literal,
+_handle_boolean_literal: Callable[[ir.Visitor, ir.BooleanLiteral], bool] = lambda _, expr: expr._value
+_handle_number_literal: Callable[[ir.Visitor, ir.NumberLiteral], float] = lambda _, expr: expr._value
+
+_EVALUATOR = ir.make_visitor(
+    "Evaluate",
+    {
+        ir.BooleanLiteral: _handle_boolean_literal,
+        ir.NumberLiteral: _handle_number_literal,
         ir.Not: lambda self, expr: not self.visit(expr._0),
         ir.And: lambda self, expr: self.visit(expr._0) and self.visit(expr._1),
         ir.Or: lambda self, expr: self.visit(expr._0) or self.visit(expr._1),
@@ -34,97 +28,181 @@ def evaluate(expression: ir.Expression) -> Union[float, bool]:
         ir.Sub: lambda self, expr: self.visit(expr._0) - self.visit(expr._1),
         ir.Mul: lambda self, expr: self.visit(expr._0) * self.visit(expr._1),
         ir.Div: lambda self, expr: self.visit(expr._0) / self.visit(expr._1),
-        ir.Ite: lambda self, expr: self.visit(expr._1)
-        if self.visit(expr._0)
-        else self.visit(expr._2),
+        ir.Ite: lambda self, expr: self.visit(expr._1) if self.visit(expr._0) else self.visit(expr._2),
         ir.Lt: lambda self, expr: self.visit(expr._0) < self.visit(expr._1),
-    }
-    return ir.make_visitor("Evaluate", rules)().visit(expression)  # type: ignore
+    },
+)()
 
 
-def count_nonterminals(expression: ir.Expression) -> int:
-    count = 0
+def evaluate(expression: ir.Expression) -> Union[float, bool]:
+    return _EVALUATOR.visit(expression)
+
+
+def _known(
+    function: Callable[..., Optional[Union[float, bool]]]
+) -> Callable[[ir.Visitor, ir.Expression], Optional[Union[float, bool]]]:
+    """
+    Makes a handler for partial evaluation that applies `function` to the values of the children if they're all known.
+    """
+
+    def handle(self, expr):
+        values = [self.visit(child) for child in expr._children]
+        if None in values:
+            return None
+        return function(*values)
+
+    return handle
+
+
+def _partially_evaluate_and(self, expr):
+    a = self.visit(expr._0)
+    if a is False:
+        return False
+    b = self.visit(expr._1)
+    if b is False:
+        return False
+    return None if a is None or b is None else True
+
+
+def _partially_evaluate_or(self, expr):
+    a = self.visit(expr._0)
+    if a is True:
+        return True
+    b = self.visit(expr._1)
+    if b is True:
+        return True
+    return None if a is None or b is None else False
+
+
+def _partially_evaluate_impl(self, expr):
+    a = self.visit(expr._0)
+    if a is False:
+        return True
+    b = self.visit(expr._1)
+    if b is True:
+        return True
+    return None if a is None or b is None else False
+
+
+def _partially_evaluate_mul(self, expr):
+    a = self.visit(expr._0)
+    if a == 0.0:
+        return 0.0
+    b = self.visit(expr._1)
+    if b == 0.0:
+        return 0.0
+    return None if a is None or b is None else a * b
+
+
+def _partially_evaluate_ite(self, expr):
+    condition = self.visit(expr._0)
+    if condition is not None:
+        return self.visit(expr._1) if condition else self.visit(expr._2)
+    a, b = self.visit(expr._1), self.visit(expr._2)
+    return a if a is not None and a == b else None
+
+
+_PARTIAL_EVALUATOR = ir.make_visitor(
+    "PartiallyEvaluate",
+    {
+        ir.BooleanLiteral: _handle_boolean_literal,
+        ir.NumberLiteral: _handle_number_literal,
+        ir.BooleanHole: lambda self, expr: self.environment.get(expr._name),
+        ir.NumberHole: lambda self, expr: self.environment.get(expr._name),
+        ir.Not: _known(lambda a: not a),
+        ir.And: _partially_evaluate_and,
+        ir.Or: _partially_evaluate_or,
+        ir.Xor: _known(lambda a, b: a != b),
+        ir.Impl: _partially_evaluate_impl,
+        ir.Add: _known(lambda a, b: a + b),
+        ir.Sub: _known(lambda a, b: a - b),
+        ir.Mul: _partially_evaluate_mul,
+        ir.Div: _known(lambda a, b: None if b == 0 else a / b),
+        ir.Ite: _partially_evaluate_ite,
+        ir.Lt: _known(lambda a, b: a < b),
+    },
+)
+
+
+def partially_evaluate(
+    expression: ir.Expression, environment: Mapping[str, Union[float, bool]]
+) -> Optional[Union[float, bool]]:
+    """
+    Evaluates `expression` with its holes filled in from `environment`. Holes that aren't in `environment` have unknown
+    values, and so does everything that depends on them, unless the value doesn't matter (e.g. `(and false P)` is false
+    no matter what `P` is). Returns None if the value of the whole expression is unknown.
+    """
+    evaluator = _PARTIAL_EVALUATOR()
+    evaluator.environment = environment  # type: ignore
+    return evaluator.visit(expression)
+
 
-    def inc_count(*_):
-        nonlocal count
-        count += 1
+def _one(*_) -> Literal[1]:
+    return 1
 
-    counter = ir.make_visitor(
-        "CountNonterminals",
-        {
-            ir.BooleanExpression: inc_count,
-            ir.Expression: inc_count,
-            ir.NumberExpression: inc_count,
-        },
-        default_action=visit_all_below,
-    )()
-    counter.visit(expression)
-    return count
+
+_NONTERMINAL_COUNTER = ir.make_visitor(
+    "CountNonterminals",
+    {
+        ir.BooleanExpression: _one,
+        ir.Expression: _one,
+        ir.NumberExpression: _one,
+    },
+    default_action=lambda self, expr: sum(map(self.visit, expr._children)),
+)()
+
+
+def count_nonterminals(expression: ir.Expression) -> int:
+    return _NONTERMINAL_COUNTER.visit(expression)
 
 
 def deep_copy(expression: ir.Expression) -> ir.Expression:
-    def copy_expression_and_children(
-        self: ir.Visitor, expr: ir.Expression
-    ) -> ir.Expression:
-        attributes = []
-        for i in count(start=0):
-            try:
-                attribute = expr.__dict__[f"_{i}"]
-                if issubclass(type(attribute), ir.Expression):
-                    attribute = self.visit(expr.__dict__[f"_{i}"])
-                attributes.append(attribute)
-            except (AttributeError, KeyError):
-                break
-        expr_type = type(expr)
-        if expr_type in (ir.BooleanHole, ir.NumberHole):
-            return expr_type(expr._name)  # type: ignore
-        elif expr_type in (ir.BooleanLiteral, ir.NumberLiteral):
-            return expr_type(expr._value)  # type: ignore
-        else:
-            return expr_type(*attributes)
-
-    copier = ir.make_visitor(
-        "DeepCopy", {}, default_action=copy_expression_and_children
-    )()
-    return copier.visit(expression)
+    """
+    IR nodes are immutable and hash-consed, so every structurally equal copy of an expression would be the expression
+    itself. This is kept around so that callers don't need to know that.
+    """
+    return expression
+
+
+_DIVER = ir.make_visitor(
+    "Diver",
+    {
+        ir.Expression: _one,
+        ir.BooleanExpression: _one,
+        ir.BooleanLiteral: _one,
+        ir.BooleanHole: _one,
+        ir.NumberExpression: _one,
+        ir.NumberLiteral: _one,
+        ir.NumberHole: _one,
+    },
+    default_action=lambda self, expr: max(map(self.visit, expr._children)) + 1,
+)()
 
 
 def depth(expression: ir.Expression) -> int:
-    def inductive_case(self: ir.Visitor, expr: ir.Expression):
-        depths = []
-        for i in count(start=0):
-            try:
-                depths.append(self.visit(expr.__dict__[f"_{i}"]))
-            except (AttributeError, KeyError):
-                break
-        return max(depths) + 1
-
-    def one(*_) -> Literal[1]:
-        return 1
-
-    return ir.make_visitor(
-        "Diver",
-        {
-            ir.Expression: one,
-            ir.BooleanExpression: one,
-            ir.BooleanLiteral: one,
-            ir.BooleanHole: one,
-            ir.NumberExpression: one,
-            ir.NumberLiteral: one,
-            ir.NumberHole: one,
-        },
-        default_action=inductive_case,
-    )().visit(expression)
+    return _DIVER.visit(expression)
+
+
+_ELEMENT_COUNTER = ir.make_visitor(
+    "CountElements",
+    {},
+    default_action=lambda self, expr: 1 + sum(map(self.visit, expr._children)),
+)()
 
 
 def count_elements(expression: ir.Expression) -> int:
-    count = 0
+    return _ELEMENT_COUNTER.visit(expression)
+
+
+_HOLE_FINDER = ir.make_visitor(
+    "FindHoles",
+    {
+        ir.BooleanHole: lambda _, expr: frozenset((expr,)),
+        ir.NumberHole: lambda _, expr: frozenset((expr,)),
+    },
+    default_action=lambda self, expr: frozenset().union(*map(self.visit, expr._children)),
+)()
 
-    def inc_count(self, expr):
-        nonlocal count
-        count += 1
-        visit_all_below(self, expr)
 
-    d = ir.make_visitor("Diver", {}, default_action=inc_count)()
-    d.visit(expression)
-    return count
+def holes(expression: ir.Expression) -> FrozenSet[Union[ir.BooleanHole, ir.NumberHole]]:
+    return _HOLE_FINDER.visit(expression)
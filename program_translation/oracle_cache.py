@@ -0,0 +1,194 @@
+"""
+Memoization for oracles. Oracles are assumed to be deterministic, so every answer can be remembered: the most recent
+ones in memory, and optionally all of them in an SQLite database so that later runs can reuse them. Answers in the
+database are stored under a fingerprint of the oracle (see `fingerprint`), so one database can be shared between
+oracles, and changing an oracle's code makes its old answers unreachable rather than wrong.
+"""
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .asynchronous import AsyncOracle, AsyncToSyncOracle, SyncToAsyncOracle
+from .process_oracle import ProcessOracle, format_value, parse_value
+from .validator import Oracle, OracleInput
+
+_MAX_PARAMETERS = 500
+
+
+def canonical_input(input: OracleInput) -> str:
+    """
+    A key for `input` that doesn't depend on the order of its names, and treats numbers that are equal as floats (e.g.
+    `1` and `1.0`) the same.
+    """
+    return " ".join(f"{name}={format_value(input[name])}" for name in sorted(input))
+
+
+def _files_named_by(part: str, cwd: Optional[str]) -> List[str]:
+    """
+    The files that a part of a command line refers to, relative to `cwd`: the file itself, every file in a directory
+    (e.g. a classpath entry, which is split on `os.pathsep`), or the compiled class or source file of a class name that
+    a JVM would look up in the working directory.
+    """
+    base = cwd or "."
+    files = []
+    for entry in part.split(os.pathsep):
+        if not entry:
+            continue
+        path = os.path.join(base, entry)
+        if os.path.isfile(path):
+            files.append(path)
+        elif os.path.isdir(path):
+            for root, directories, names in os.walk(path):
+                # Skip what Python and version control write there, which changes without the program changing.
+                directories[:] = sorted(name for name in directories if name != "__pycache__" and name[0] != ".")
+                files.extend(os.path.join(root, name) for name in sorted(names) if not name.endswith(".pyc"))
+        else:
+            stem = os.path.join(base, entry.replace(".", os.sep))
+            files.extend(stem + extension for extension in (".class", ".java") if os.path.isfile(stem + extension))
+    return files
+
+
+def fingerprint(oracle: Union[Oracle, AsyncOracle]) -> str:
+    """
+    Identifies what `oracle` computes. For an oracle that runs another program, that's the command line and working
+    directory, plus the contents of every file the command line refers to (see `_files_named_by`); otherwise, it's the
+    oracle's class and the source code of the classes it inherits from (including itself). Wrappers (caches and
+    adapters) are looked through.
+
+    Code that the class calls but doesn't define (e.g. a helper function in its module), and the arguments it was made
+    with, aren't part of the fingerprint, so oracles that depend on those need a `CachedOracle` with an explicit `key`.
+    """
+    if isinstance(oracle, CachedOracle):
+        return oracle.key
+    elif isinstance(oracle, (AsyncToSyncOracle, SyncToAsyncOracle)):
+        return fingerprint(oracle.oracle)
+    elif isinstance(oracle, ProcessOracle):
+        digest = hashlib.sha256()
+        digest.update((oracle.cwd or "").encode() + b"\0")
+        for part in oracle.command + oracle.arguments:
+            digest.update(part.encode() + b"\0")
+            for path in _files_named_by(part, oracle.cwd):
+                digest.update(path.encode() + b"\0")
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        return f"{type(oracle).__module__}.{type(oracle).__qualname__}:{digest.hexdigest()}"
+    digest = hashlib.sha256()
+    for cls in type(oracle).__mro__:
+        try:
+            digest.update(inspect.getsource(cls).encode() + b"\0")
+        except (OSError, TypeError):
+            # Built in, or defined somewhere its source can't be found (e.g. an interactive session).
+            pass
+    return f"{type(oracle).__module__}.{type(oracle).__qualname__}:{digest.hexdigest()}"
+
+
+class CachedOracle(Oracle):
+    """
+    Remembers the answers of `oracle`. Up to `maxsize` of the most recently used answers are kept in memory, and if
+    `path` is given, every answer is also written to the SQLite database there. The oracle is identified in the database
+    by `key`, which defaults to its `fingerprint`.
+
+    `hits` counts queries answered from memory or the database (`disk_hits` counts just the latter), and `misses`
+    counts queries passed on to `oracle`.
+    """
+
+    def __init__(self, oracle: Oracle, maxsize: int = 65536, path: Optional[str] = None, key: Optional[str] = None):
+        if maxsize < 0:
+            raise ValueError(f"maxsize={maxsize} must not be negative")
+        self.oracle = oracle
+        self.maxsize = maxsize
+        self.path = path
+        self.key = fingerprint(oracle) if key is None else key
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Union[bool, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections and locks can't be sent to another process, so a copy of the oracle opens its own.
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_connection"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _database(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Validators may query the oracle from a background thread (see `Validator.prefetch`); `_lock` serializes
+            # those queries.
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)  # type: ignore
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers "
+                "(oracle TEXT NOT NULL, input TEXT NOT NULL, output TEXT NOT NULL, PRIMARY KEY (oracle, input))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def _remember(self, key: str, output: Union[bool, float]) -> None:
+        if self.maxsize == 0:
+            return
+        self._memory[key] = output
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        queries = self.hits + self.misses
+        return self.hits / queries if queries else 0.0
+
+    def run(self, input: OracleInput) -> Union[bool, float]:
+        return self.run_batch([input])[0]
+
+    def run_batch(self, inputs: Sequence[OracleInput]) -> List[Union[bool, float]]:
+        with self._lock:
+            keys = [canonical_input(input) for input in inputs]
+            outputs: Dict[str, Union[bool, float]] = {}
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    outputs[key] = self._memory[key]
+            if self.path is not None:
+                unknown = [key for key in dict.fromkeys(keys) if key not in outputs]
+                # SQLite limits how many parameters a statement can have.
+                for start in range(0, len(unknown), _MAX_PARAMETERS):
+                    chunk = unknown[start : start + _MAX_PARAMETERS]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows = self._database().execute(
+                        f"SELECT input, output FROM answers WHERE oracle = ? AND input IN ({placeholders})",
+                        [self.key, *chunk],
+                    )
+                    for key, output in rows:
+                        outputs[key] = parse_value(output)
+                        self._remember(key, outputs[key])
+                        self.disk_hits += 1
+            # Each input that isn't known yet is only asked about once, even if it's in `inputs` several times.
+            missing = {key: input for key, input in zip(keys, inputs) if key not in outputs}
+            if missing:
+                answers = self.oracle.run_batch(list(missing.values()))
+                for key, output in zip(missing, answers):
+                    outputs[key] = output
+                    self._remember(key, output)
+                if self.path is not None:
+                    with self._database() as database:
+                        database.executemany(
+                            "INSERT OR REPLACE INTO answers VALUES (?, ?, ?)",
+                            [(self.key, key, format_value(outputs[key])) for key in missing],
+                        )
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            return [outputs[key] for key in keys]
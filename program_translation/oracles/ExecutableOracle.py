@@ -1,11 +1,12 @@
-import subprocess
+from ..process_oracle import ProcessOracle
 
-from ..validator import Oracle, OracleInput
 
+class ExecutableOracle(ProcessOracle):
+    """
+    Asks `Mystery.java`, which is kept running and answers queries over its standard input (see `process_oracle`).
+    """
 
-class ExecutableOracle(Oracle):
-    def run(self, input: OracleInput) -> float:
-        x: float = input["x"]
-        y: float = input["y"]
-        output = subprocess.check_output(f"java -cp program_translation/oracles Mystery {x} {y}", shell=True)
-        return float(output)
+    def __init__(self, workers: int = 1, timeout: float = 10.0):
+        super().__init__(
+            ["java", "-cp", "program_translation/oracles", "Mystery"], ["x", "y"], workers=workers, timeout=timeout
+        )
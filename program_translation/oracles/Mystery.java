@@ -1,12 +1,26 @@
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+
 class Mystery {
-  public static void main(String[] args) {
-    float x = Float.parseFloat(args[0]);
-    float y = Float.parseFloat(args[1]);
-    System.out.println(mystery(x, y));
+  public static void main(String[] args) throws IOException {
+    if (args.length == 2) {
+      float x = Float.parseFloat(args[0]);
+      float y = Float.parseFloat(args[1]);
+      System.out.println(mystery(x, y));
+      return;
+    }
+    // With no arguments, answer one "x y" query per line until stdin is closed.
+    BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+    String line;
+    while ((line = in.readLine()) != null) {
+      String[] parts = line.trim().split(" ");
+      System.out.println(mystery(Float.parseFloat(parts[0]), Float.parseFloat(parts[1])));
+      System.out.flush();
+    }
   }
 
   static float mystery(float x, float y) {
     return x + y - 4;
   }
 }
-
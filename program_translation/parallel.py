@@ -0,0 +1,190 @@
+"""
+Synthesis with a pool of worker processes. The main process enumerates programs and hands them out to the workers in
+batches, in enumeration order. Each worker validates its batch against the example bank it was sent, and sends back
+the examples it added to it along with the first program it accepted, if any.
+
+The result is the same every run for a given seed (of the `random` module), number of workers and batch size, no matter
+how the batches happen to be scheduled. The results of the batches are merged into the bank in enumeration order, and
+each batch is sent the bank as it was once every batch `2 * workers` before it had been merged, which is enough to
+keep every worker busy with one more batch queued up for it. A worker draws the inputs for a batch from a random state
+seeded with the synthesis' seed and the index of the batch's first program, rather than from its own. A program a
+worker accepts is checked again against the examples from every batch before it, as it would have been by sequential
+synthesis, and if one of those rules it out, the rest of its batch is validated instead. So the program found is the
+first one in enumeration order that passes both.
+"""
+import multiprocessing
+import random
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from . import intermediate_representation as ir
+from .enumerator import enumerate_programs
+from .frontier import Frontier
+from .instrumentation import Metrics
+from .validator import Oracle, OracleInput, Validator
+
+Example = Tuple[OracleInput, Union[bool, float]]
+# The enumeration index of an accepted program, the program, and the values of its constants.
+Winner = Tuple[int, ir.Expression, Dict[str, Union[bool, float]]]
+# What a worker sends back for a batch: see `_validate_batch`.
+BatchResult = Tuple[Optional[Winner], List[Example], Optional[Metrics]]
+
+# Each worker process has its own validator, and they all share the index of the first accepted program.
+_validator: Optional[Validator] = None
+_first_accepted: Any = None
+_collect_metrics = False
+
+
+def _initialize_worker(
+    oracle: Oracle,
+    input_numbers: List[str],
+    input_booleans: List[str],
+    successes_to_pass: int,
+    oracle_batch_size: int,
+    first_accepted: Any,
+    collect_metrics: bool,
+) -> None:
+    global _validator, _first_accepted, _collect_metrics
+    _validator = Validator(
+        oracle,
+        input_numbers=input_numbers,
+        input_booleans=input_booleans,
+        successes_to_pass=successes_to_pass,
+        batch_size=oracle_batch_size,
+    )
+    _first_accepted = first_accepted
+    _collect_metrics = collect_metrics
+
+
+def _validate_batch(
+    batch: List[Tuple[int, ir.Expression]], example_bank: List[Example], seed: int
+) -> BatchResult:
+    """
+    Returns the program accepted (if any), the examples added to the bank and, if metrics are being collected, the
+    metrics for this batch alone.
+    """
+    validator: Validator = _validator  # type: ignore
+    validator.example_bank = list(example_bank)
+    validator.metrics = Metrics() if _collect_metrics else None
+    validator.rng = random.Random(f"{seed}:{batch[0][0]}")
+    winner: Optional[Winner] = None
+    for index, program in batch:
+        if index > _first_accepted.value:
+            break
+        if validator.metrics is not None:
+            validator.metrics.count("candidates")
+        if validator.validate_program(program):
+            winner = (index, program, validator.constants())
+            break
+    return winner, validator.example_bank[len(example_bank) :], validator.metrics
+
+
+def synthesize_in_parallel(
+    oracle: Oracle,
+    input_booleans: List[str] = [],
+    constant_booleans: List[str] = [],
+    input_numbers: List[str] = [],
+    constant_numbers: List[str] = [],
+    successes_to_pass: int = 20,
+    maximum_depth: int = 6,
+    bottom_up: bool = False,
+    workers: int = 2,
+    batch_size: int = 32,
+    oracle_batch_size: int = 1,
+    canonical: bool = False,
+    metrics: Optional[Metrics] = None,
+    compact: bool = False,
+    frontier_size: int = 1_000_000,
+    spill_directory: Optional[str] = None,
+) -> Optional[Tuple[ir.Expression, Dict[str, Union[bool, float]], List[Example]]]:
+    """
+    Searches for a program like `synthesize` does, but with `workers` processes validating programs. Returns the
+    program found, the values of its constants and the example bank, or None if no program was found. `oracle` has to
+    be picklable. If `metrics` is given, the metrics from every worker are added to it. `compact`, `frontier_size` and
+    `spill_directory` are as for `synthesize`.
+
+    The program found only depends on the seed, `workers` and `batch_size` (see the module's docstring).
+    """
+    seed = random.getrandbits(64)
+    first_accepted = multiprocessing.Value("q", sys.maxsize)
+    example_bank: List[Example] = []
+    frontier = Frontier(frontier_size, spill_directory) if compact else None
+    programs = enumerate(
+        enumerate_programs(
+            ir.NumberExpression,
+            booleans=input_booleans + constant_booleans,
+            numbers=input_numbers + constant_numbers,
+            maximum_depth=maximum_depth,
+            bottom_up=bottom_up,
+            compact=compact,
+            inputs=input_booleans + input_numbers,
+            examples=example_bank,
+            frontier=frontier,
+            canonical=canonical,
+            metrics=metrics,
+        )
+    )
+    if metrics is not None:
+        programs = metrics.timed(programs, "enumeration")
+    # Checks the programs the workers accept against the examples the workers didn't have yet.
+    checker = Validator(oracle, input_numbers=input_numbers, input_booleans=input_booleans, metrics=metrics)
+    found: Optional[Tuple[ir.Expression, Dict[str, Union[bool, float]]]] = None
+    try:
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_initialize_worker,
+            initargs=(
+                oracle,
+                input_numbers,
+                input_booleans,
+                successes_to_pass,
+                oracle_batch_size,
+                first_accepted,
+                metrics is not None,
+            ),
+        ) as pool:
+            # The batches that have been sent out but not merged into the bank yet, in enumeration order.
+            queued: Deque[Tuple[List[Tuple[int, ir.Expression]], "Future[BatchResult]"]] = deque()
+            exhausted = False
+            while found is None:
+                while not exhausted and len(queued) < 2 * workers:
+                    batch = list(islice(programs, batch_size))
+                    if not batch:
+                        exhausted = True
+                        break
+                    # The bank is copied, since it's only pickled once the batch is on its way to a worker.
+                    queued.append((batch, pool.submit(_validate_batch, batch, list(example_bank), seed)))
+                if not queued:
+                    break
+                batch, future = queued.popleft()
+                winner, new_examples, batch_metrics = future.result()
+                example_bank.extend(new_examples)
+                if metrics is not None and batch_metrics is not None:
+                    metrics.merge(batch_metrics)
+                    metrics.gauge("example_bank_size", len(example_bank))
+                if winner is None:
+                    continue
+                index, program, _ = winner
+                checker.example_bank = example_bank
+                if checker.satisfies_examples(program):
+                    found = program, checker.constants()
+                    # The workers skip everything enumerated after it.
+                    with first_accepted.get_lock():
+                        first_accepted.value = index
+                    for _, future in queued:
+                        future.cancel()
+                else:
+                    rest = [(later, candidate) for later, candidate in batch if later > index]
+                    if rest:
+                        queued.appendleft((rest, pool.submit(_validate_batch, rest, list(example_bank), seed)))
+    finally:
+        checker.close()
+        if frontier is not None:
+            frontier.close()
+    if found is None:
+        return None
+    program, constants = found
+    return program, constants, example_bank
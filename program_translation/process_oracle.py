@@ -0,0 +1,179 @@
+"""
+Oracles backed by long-running programs. Rather than starting the program once per query, a pool of copies of it is
+started once, and queries are streamed to them over a line-delimited protocol:
+
+ - each query is one line on the program's standard input, with the values of the inputs separated by spaces, in the
+   order given by `arguments`. Numbers are written as Python floats (e.g. `-12.0`), and Booleans as `true` or `false`.
+ - the program answers each query, in order, with one line on its standard output holding the output, which is either a
+   number or `true`/`false`. It should flush its output after every answer.
+ - the program should exit when its standard input is closed.
+
+This uses `select` on pipes, so it only works on POSIX systems.
+"""
+import os
+import select
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .validator import Oracle, OracleInput
+
+
+# The most queries that are sent to a worker before reading its answers.
+_MAX_IN_FLIGHT = 256
+
+
+class WorkerDied(RuntimeError):
+    pass
+
+
+class _Worker:
+    """
+    One running copy of the oracle program.
+    """
+
+    def __init__(self, command: Sequence[str], cwd: Optional[str]):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=cwd, bufsize=0)
+        self.buffer = b""
+
+    def send(self, lines: List[str]) -> None:
+        try:
+            self.process.stdin.write("".join(line + "\n" for line in lines).encode())  # type: ignore
+        except BrokenPipeError:
+            raise WorkerDied(f"{self.process.args} exited with code {self.process.poll()}")
+
+    def receive(self, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        stdout = self.process.stdout.fileno()  # type: ignore
+        while b"\n" not in self.buffer:
+            remaining = deadline - time.monotonic()
+            ready, _, _ = select.select([stdout], [], [], max(remaining, 0))
+            if not ready:
+                raise TimeoutError(f"{self.process.args} took longer than {timeout}s to answer")
+            chunk = os.read(stdout, 65536)
+            if not chunk:
+                raise WorkerDied(f"{self.process.args} exited with code {self.process.wait()}")
+            self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line.decode()
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()  # type: ignore
+                self.process.wait(timeout=1)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()  # type: ignore
+
+
+def format_value(value: Union[bool, float]) -> str:
+    if type(value) is bool:
+        return "true" if value else "false"
+    return repr(float(value))
+
+
+def parse_value(text: str) -> Union[bool, float]:
+    text = text.strip()
+    if text == "true":
+        return True
+    elif text == "false":
+        return False
+    return float(text)
+
+
+class ProcessOracle(Oracle):
+    """
+    An oracle that streams its queries to a pool of `workers` copies of the program run by `command` (see the module
+    documentation for the protocol). The copies are started the first time the oracle is queried. A copy that takes
+    longer than `timeout` seconds to answer a query is killed and replaced, and the query fails with a TimeoutError. A
+    copy that crashes is replaced, and the queries it hadn't answered are retried up to `retries` times before failing
+    with a `WorkerDied` error.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        arguments: Sequence[str],
+        workers: int = 1,
+        timeout: float = 10.0,
+        retries: int = 1,
+        cwd: Optional[str] = None,
+    ):
+        if workers < 1:
+            raise ValueError(f"workers={workers} must be at least 1")
+        self.command = list(command)
+        self.arguments = list(arguments)
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.cwd = cwd
+        self._pool: List[_Worker] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Running processes can't be sent to another process, so a copy of the oracle starts its own.
+        state = self.__dict__.copy()
+        state["_pool"] = []
+        return state
+
+    def __enter__(self) -> "ProcessOracle":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for worker in self._pool:
+            worker.close()
+        self._pool = []
+
+    def _restart(self, i: int) -> None:
+        self._pool[i].process.kill()
+        self._pool[i].close()
+        self._pool[i] = _Worker(self.command, self.cwd)
+
+    def run(self, input: OracleInput) -> Union[bool, float]:
+        return self.run_batch([input])[0]
+
+    def run_batch(self, inputs: Sequence[OracleInput]) -> List[Union[bool, float]]:
+        if not self._pool:
+            self._pool = [_Worker(self.command, self.cwd) for _ in range(self.workers)]
+        lines = [" ".join(format_value(input[name]) for name in self.arguments) for input in inputs]
+        outputs: List[Optional[Union[bool, float]]] = [None] * len(lines)
+        attempts = [0] * len(lines)
+        # Deal the queries out to the workers, and send each worker a chunk of its queries before reading any answers,
+        # so that they all work at the same time. The chunks are limited so that neither side blocks on a full pipe.
+        assignments = [list(range(i, len(lines), len(self._pool))) for i in range(len(self._pool))]
+        while any(assignments):
+            in_flight = [assigned[:_MAX_IN_FLIGHT] for assigned in assignments]
+            for i, chunk in enumerate(in_flight):
+                if chunk:
+                    try:
+                        self._pool[i].send([lines[j] for j in chunk])
+                    except WorkerDied:
+                        # This is noticed (and handled) when reading its answers.
+                        pass
+            try:
+                for i, chunk in enumerate(in_flight):
+                    while chunk:
+                        j = chunk[0]
+                        try:
+                            outputs[j] = parse_value(self._pool[i].receive(self.timeout))
+                        except WorkerDied:
+                            self._restart(i)
+                            # The rest of this worker's queries are sent to its replacement on the next pass.
+                            chunk.clear()
+                            attempts[j] += 1
+                            if attempts[j] > self.retries:
+                                raise WorkerDied(f"{self.command} crashed on {lines[j]!r} {attempts[j]} times")
+                            break
+                        chunk.pop(0)
+                        assignments[i].remove(j)
+            except (TimeoutError, WorkerDied):
+                # Workers that still owe answers would give them in reply to the next queries, so they're replaced.
+                for i, chunk in enumerate(in_flight):
+                    if chunk:
+                        self._restart(i)
+                raise
+        return outputs  # type: ignore
@@ -0,0 +1,145 @@
+"""
+Logging the solver's queries as SMT-LIB 2 files, and replaying them without the oracle.
+
+A `QueryLog` writes each check that `Validator.satisfies_examples` makes (optionally only the slow ones) to a file of
+its own in a directory, so that the queries from a real run can be tuned offline, e.g. with a different strategy (see
+`strategies`). Each file can also be run with the `z3` command line tool. The answer the solver gave is recorded as the
+benchmark's `:status`, and the candidate program, the strategy that answered, the timeout and the time the check took
+are in comments at the top.
+
+Replay a directory of queries with `python -m program_translation.query_log DIRECTORY`, which prints how long each
+query takes now, slowest first, and whether the answer differs from the logged one.
+"""
+import argparse
+import glob
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import z3
+
+from . import intermediate_representation as ir
+from .strategies import STRATEGIES, make_solver
+
+
+class QueryLog:
+    def __init__(self, directory: str, minimum_seconds: float = 0.0):
+        """
+        Only checks that took at least `minimum_seconds` are written. Files already in `directory` are kept, and new
+        ones are numbered after them.
+        """
+        self.directory = directory
+        self.minimum_seconds = minimum_seconds
+        os.makedirs(directory, exist_ok=True)
+        self.queries = len(glob.glob(os.path.join(directory, "query_*.smt2")))
+
+    def record(
+        self,
+        assertions: Sequence[z3.BoolRef],
+        candidate: ir.Expression,
+        result: z3.CheckSatResult,
+        seconds: float,
+        strategy: str = "default",
+        timeout: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Writes a query, if it took long enough, and returns the path it was written to.
+        """
+        if seconds < self.minimum_seconds:
+            return None
+        solver = z3.Solver()
+        solver.add(*assertions)
+        path = os.path.join(self.directory, f"query_{self.queries:06}.smt2")
+        self.queries += 1
+        with open(path, "w") as f:
+            f.write(f"; candidate: {candidate}\n")
+            f.write(f"; strategy: {strategy}\n")
+            if timeout is not None:
+                f.write(f"; timeout: {timeout}\n")
+            f.write(f"; seconds: {seconds}\n")
+            f.write(f"(set-info :status {result})\n")
+            f.write(solver.sexpr())
+            f.write("(check-sat)\n")
+        return path
+
+
+class Replay(NamedTuple):
+    path: str
+    result: z3.CheckSatResult
+    seconds: float
+    # What was logged with the query, if anything.
+    logged_result: Optional[str]
+    logged_seconds: Optional[float]
+    strategy: str
+
+
+def _header(path: str) -> Dict[str, str]:
+    """
+    The comments at the top of a logged query, and its status.
+    """
+    header = {}
+    with open(path) as f:
+        for line in f:
+            if line.startswith("; ") and ": " in line[2:]:
+                key, value = line[2:].rstrip("\n").split(": ", 1)
+                header[key] = value
+            elif line.startswith("(set-info :status "):
+                header["status"] = line[len("(set-info :status ") :].rstrip(")\n")
+            else:
+                break
+    return header
+
+
+def replay(paths: Sequence[str], strategy: Optional[str] = None, timeout: Optional[int] = None) -> List[Replay]:
+    """
+    Checks each of the queries in `paths` again, with `strategy` if it's given and the strategy that answered it
+    originally otherwise, giving each check `timeout` milliseconds if it's given.
+    """
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(f"unknown solver strategy {strategy}")
+    replays = []
+    for path in paths:
+        header = _header(path)
+        used = strategy if strategy is not None else header.get("strategy", "default")
+        if used not in STRATEGIES:
+            used = "default"
+        solver = make_solver(used)
+        if timeout is not None:
+            solver.set("timeout", timeout)
+        solver.add(z3.parse_smt2_file(path))
+        start = time.perf_counter()
+        result = solver.check()
+        seconds = time.perf_counter() - start
+        logged_seconds = float(header["seconds"]) if "seconds" in header else None
+        replays.append(Replay(path, result, seconds, header.get("status"), logged_seconds, used))
+    return replays
+
+
+def query_paths(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "*.smt2")) + glob.glob(os.path.join(directory, "*.smt")))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="replay a directory of logged solver queries")
+    parser.add_argument("directory", help="directory of .smt2 files, e.g. written by --query-log", type=str)
+    parser.add_argument(
+        "--strategy",
+        help="strategy to check the queries with (the one that answered each of them by default)",
+        choices=sorted(STRATEGIES),
+        default=None,
+    )
+    parser.add_argument("--timeout", help="milliseconds to give each query", type=int, default=None)
+    parser.add_argument("-n", "--slowest", help="only show this many of the slowest queries", type=int, default=None)
+    args = parser.parse_args()
+
+    replays = replay(query_paths(args.directory), args.strategy, args.timeout)
+    replays.sort(key=lambda replayed: replayed.seconds, reverse=True)
+    for replayed in replays[: args.slowest]:
+        logged = "" if replayed.logged_seconds is None else f"  (logged {replayed.logged_seconds * 1000:10.2f} ms)"
+        changed = ""
+        if replayed.logged_result is not None and replayed.logged_result != str(replayed.result):
+            changed = f"  was {replayed.logged_result}"
+        line = f"{os.path.basename(replayed.path):24}{replayed.strategy:10}{replayed.seconds * 1000:10.2f} ms{logged}"
+        print(f"{line}  {replayed.result}{changed}")
+    total = sum(replayed.seconds for replayed in replays)
+    print(f"{len(replays)} queries in {total:.3f}s")
@@ -0,0 +1,130 @@
+"""
+A store of synthesis results, so that synthesizing a program for the same oracle with the same grammar again doesn't
+have to search from scratch. Results are kept in an SQLite database, under a key made from the oracle's fingerprint
+(see `oracle_cache.fingerprint`) and the parameters that decide which programs can be found.
+
+Programs are stored pickled, so the database should only ever be written by this module.
+"""
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from . import intermediate_representation as ir
+from .asynchronous import AsyncOracle, AsyncToSyncOracle
+from .compilation import compile_program
+from .oracle_cache import fingerprint
+from .validator import Oracle, OracleInput, fill_holes, get_new_inputs
+
+
+class SynthesisResult(NamedTuple):
+    program: ir.Expression
+    constants: Dict[str, Union[bool, float]]
+    example_bank: List[Tuple[OracleInput, Union[bool, float]]]
+
+
+def synthesis_key(
+    oracle: Union[Oracle, AsyncOracle],
+    input_booleans: Sequence[str],
+    constant_booleans: Sequence[str],
+    input_numbers: Sequence[str],
+    constant_numbers: Sequence[str],
+    maximum_depth: int,
+) -> str:
+    parameters = {
+        "oracle": fingerprint(oracle),
+        "input_booleans": list(input_booleans),
+        "constant_booleans": list(constant_booleans),
+        "input_numbers": list(input_numbers),
+        "constant_numbers": list(constant_numbers),
+        "maximum_depth": maximum_depth,
+    }
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+
+def revalidate(
+    oracle: Union[Oracle, AsyncOracle],
+    result: SynthesisResult,
+    input_booleans: Sequence[str],
+    input_numbers: Sequence[str],
+    samples: int = 5,
+) -> bool:
+    """
+    Checks that the program in `result` still gives the same outputs as `oracle` on `samples` new random inputs.
+    """
+    if isinstance(oracle, AsyncOracle):
+        oracle = AsyncToSyncOracle(oracle)
+    arguments = [*input_booleans, *input_numbers]
+    function = compile_program(fill_holes(result.program, result.constants), arguments)
+    inputs = [get_new_inputs(input_booleans, input_numbers) for _ in range(samples)]
+    for input, output in zip(inputs, oracle.run_batch(inputs)):
+        try:
+            if function(*[input[name] for name in arguments]) != output:
+                return False
+        except ZeroDivisionError:
+            return False
+    return True
+
+
+class ResultCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _database(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, program BLOB NOT NULL, constants TEXT NOT NULL, example_bank TEXT NOT NULL, "
+                "created REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str) -> Optional[SynthesisResult]:
+        row = self._database().execute(
+            "SELECT program, constants, example_bank FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        program, constants, example_bank = row
+        return SynthesisResult(
+            pickle.loads(program),
+            json.loads(constants),
+            [(inputs, output) for inputs, output in json.loads(example_bank)],
+        )
+
+    def put(self, key: str, result: SynthesisResult) -> None:
+        with self._database() as database:
+            database.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    pickle.dumps(result.program),
+                    json.dumps(result.constants),
+                    json.dumps([[dict(inputs), output] for inputs, output in result.example_bank]),
+                    time.time(),
+                ),
+            )
+
+    def discard(self, key: str) -> None:
+        with self._database() as database:
+            database.execute("DELETE FROM results WHERE key = ?", (key,))
@@ -0,0 +1,161 @@
+"""
+Choosing how Z3 checks a candidate's constraints, based on the theory they're in.
+
+Once an example's inputs are substituted into a candidate, its constraints only have the candidate's constants as
+unknowns, so which theory they fall in depends on how the constants appear in it: multiplying two terms that both depend
+on number constants (or dividing by one) makes them nonlinear, number constants alone make them linear, and with only
+Boolean constants they're propositional (the number parts are all constant).
+
+Each theory has a solver tuned for it. Nonlinear constraints, which are the ones that can take the solver a long time,
+also have a portfolio of strategies that can be raced against each other (see `Portfolio`); for the other theories,
+racing costs more than it could save. Racing only pays off with more than one core to race on, and for checks that take
+longer than starting the race does (tens of milliseconds).
+
+The inputs are integers, but the constants are real, so there's no integer theory here: restricting the constants to
+integers would lose programs like `(* x 2.5)`.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple
+
+import z3
+
+from . import intermediate_representation as ir
+
+LINEAR = "linear"
+NONLINEAR = "nonlinear"
+PROPOSITIONAL = "propositional"
+
+# The ways of making a solver for each strategy, in a given context.
+STRATEGIES: Dict[str, Callable[[z3.Context], z3.Solver]] = {
+    "default": lambda context: z3.Solver(ctx=context),
+    "qf_lra": lambda context: z3.SolverFor("QF_LRA", ctx=context),
+    "qf_nra": lambda context: z3.SolverFor("QF_NRA", ctx=context),
+    "nlsat": lambda context: z3.Tactic("qfnra-nlsat", ctx=context).solver(),
+    "qf_fd": lambda context: z3.SolverFor("QF_FD", ctx=context),
+}
+
+# The strategy used for each theory, and the strategies raced for the theories that have a portfolio.
+PREFERRED = {LINEAR: "qf_lra", NONLINEAR: "qf_nra", PROPOSITIONAL: "qf_fd"}
+PORTFOLIOS = {NONLINEAR: ("qf_nra", "nlsat", "default")}
+
+# Stands in for the degree of a term that divides by a constant, which is never linear.
+_UNBOUNDED = 2
+
+
+def constant_degree(expression: ir.Expression, inputs: Collection[str]) -> int:
+    """
+    The degree of `expression` as a polynomial in its number constants (its number holes that aren't `inputs`), capped
+    at 2.
+    """
+    expression_type = type(expression)
+    if expression_type is ir.NumberHole:
+        return 0 if expression._name in inputs else 1
+    elif not expression._children:
+        return 0
+    elif expression_type is ir.Mul:
+        return min(constant_degree(expression._0, inputs) + constant_degree(expression._1, inputs), _UNBOUNDED)
+    elif expression_type is ir.Div:
+        if constant_degree(expression._1, inputs) > 0:
+            return _UNBOUNDED
+        return constant_degree(expression._0, inputs)
+    return max(constant_degree(child, inputs) for child in expression._children)
+
+
+def theory(program: ir.Expression, inputs: Collection[str]) -> str:
+    """
+    The theory that the constraints for `program` fall in, once the values of `inputs` are substituted into it.
+    """
+    degree = constant_degree(program, inputs)
+    if degree > 1:
+        return NONLINEAR
+    elif degree == 1:
+        return LINEAR
+    return PROPOSITIONAL
+
+
+def make_solver(strategy: str, context: Optional[z3.Context] = None) -> z3.Solver:
+    return STRATEGIES[strategy](z3.main_ctx() if context is None else context)
+
+
+class Portfolio:
+    """
+    Races the strategies for a theory against each other, each on a thread and in a Z3 context of its own (Z3 releases
+    the GIL while it works, and contexts can be used from different threads at once). The first definite answer is
+    kept, and the other strategies are interrupted, but not waited for: their contexts are only used again once they've
+    stopped. The number of races each strategy has won for each theory is kept in `wins`.
+    """
+
+    def __init__(self):
+        self.wins: Dict[Tuple[str, str], int] = {}
+        # The contexts that aren't being used by a race, for each strategy.
+        self._idle: Dict[str, List[z3.Context]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def check(
+        self, assertions: Sequence[z3.BoolRef], candidate_theory: str, timeout: Optional[int] = None
+    ) -> Tuple[z3.CheckSatResult, Optional[z3.ModelRef], Optional[str]]:
+        """
+        Checks `assertions` (in the main context) with each strategy for `candidate_theory`, giving each `timeout`
+        milliseconds if it's given. Returns the answer, the model if there is one (in the main context), and the
+        strategy that won, which is None if none of them could decide.
+        """
+        strategies = PORTFOLIOS[candidate_theory]
+        if self._executor is None:
+            # Room for the strategies that are still stopping after the last race, as well as this one's.
+            workers = 2 * max(len(portfolio) for portfolio in PORTFOLIOS.values())
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+        races: Dict["Future[Tuple[z3.CheckSatResult, Optional[z3.ModelRef]]]", Tuple[str, z3.Context]] = {}
+        over = threading.Event()
+        for strategy in strategies:
+            idle = self._idle.setdefault(strategy, [])
+            context = idle.pop() if idle else z3.Context()
+            # Translating touches the main context, so it's done here rather than on the strategy's thread.
+            translated = [assertion.translate(context) for assertion in assertions]
+            race = self._executor.submit(_check, strategy, context, translated, timeout, over)
+            races[race] = (strategy, context)
+            race.add_done_callback(lambda _, idle=idle, context=context: idle.append(context))
+
+        winner: Optional[str] = None
+        result, model = z3.unknown, None
+        pending: Set["Future[Tuple[z3.CheckSatResult, Optional[z3.ModelRef]]]"] = set(races)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for race in done:
+                race_result, race_model = race.result()
+                if winner is None and race_result != z3.unknown:
+                    winner = races[race][0]
+                    # The winner's thread is done with its context, so the model can be moved out of it.
+                    result, model = race_result, race_model.translate(z3.main_ctx()) if race_model else None
+        if winner is not None:
+            over.set()
+            for race in pending:
+                races[race][1].interrupt()
+            self.wins[(candidate_theory, winner)] = self.wins.get((candidate_theory, winner), 0) + 1
+        return result, model, winner
+
+
+def _check(
+    strategy: str,
+    context: z3.Context,
+    assertions: List[z3.BoolRef],
+    timeout: Optional[int],
+    over: threading.Event,
+) -> Tuple[z3.CheckSatResult, Optional[z3.ModelRef]]:
+    try:
+        solver = make_solver(strategy, context)
+        if timeout is not None:
+            solver.set("timeout", timeout)
+        solver.add(*assertions)
+        if over.is_set():
+            return z3.unknown, None
+        result = solver.check()
+        return result, solver.model() if result == z3.sat else None
+    except z3.Z3Exception:
+        # E.g. a tactic that doesn't support something in the assertions.
+        return z3.unknown, None
@@ -1,69 +1,342 @@
 import argparse
+import asyncio
 import importlib
-import z3
-from typing import List, Optional
+import itertools
+import random
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 
 from . import intermediate_representation as ir
+from .asynchronous import AsyncOracle, AsyncToSyncOracle, AsyncValidator, SyncToAsyncOracle
+from .checkpoint import Checkpoint, Example
 from .enumerator import enumerate_programs
+from .frontier import Frontier
+from .instrumentation import Metrics
+from .oracle_cache import CachedOracle
+from .query_log import QueryLog
 from .translation import to_c, to_python, to_scheme
-from .validator import Oracle, Validator, fill_holes
+from .parallel import synthesize_in_parallel
+from .result_cache import ResultCache, SynthesisResult, revalidate, synthesis_key
+from .validator import BudgetExhausted, Oracle, SolverUnknown, Validator, fill_holes, z3_literal_to_python_literal
 
-
-def z3_literal_to_python_literal(z3lit):
-    if type(z3lit) is z3.z3.BoolRef:
-        return bool(z3lit)
-    elif type(z3lit) is z3.z3.RatNumRef:
-        return float(z3lit.as_decimal(prec=5))
+T = TypeVar("T")
 
 
 def synthesize(
-    oracle: Oracle,
+    oracle: Union[Oracle, AsyncOracle],
     input_booleans: List[str] = [],
     constant_booleans: List[str] = [],
     input_numbers: List[str] = [],
     constant_numbers: List[str] = [],
     successes_to_pass: int = 20,
     maximum_depth: int = 6,
-    target_lang: Optional[str] = None
+    target_lang: Optional[str] = None,
+    bottom_up: bool = False,
+    workers: int = 1,
+    oracle_batch_size: int = 1,
+    prefetch_examples: bool = False,
+    concurrent_queries: int = 0,
+    distinguishing: bool = False,
+    rivals: int = 8,
+    canonical: bool = False,
+    result_cache: Optional[ResultCache] = None,
+    revalidation_samples: int = 5,
+    checkpoint: Optional[str] = None,
+    resume: bool = False,
+    checkpoint_interval: float = 10.0,
+    metrics: Optional[Metrics] = None,
+    quiet: bool = False,
+    solver_timeout: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    retry_rounds: int = 2,
+    retry_factor: int = 4,
+    solver_strategy: str = "default",
+    query_log: Optional[QueryLog] = None,
+    compact: bool = False,
+    frontier_size: int = 1_000_000,
+    spill_directory: Optional[str] = None,
 ) -> Optional[ir.Expression]:
-    v = Validator(
-        oracle,
-        input_booleans=input_booleans,
-        input_numbers=input_numbers,
-        successes_to_pass=successes_to_pass,
-    )
-    for program in enumerate_programs(
-        ir.NumberExpression,
-        booleans=input_booleans + constant_booleans,
-        numbers=input_numbers + constant_numbers,
-        maximum_depth=maximum_depth,
+    """
+    If `concurrent_queries` is positive, up to that many queries to the oracle are kept in flight while programs are
+    being checked (see `AsyncValidator`). If `distinguishing` is True, the oracle is asked about inputs chosen to tell
+    each program apart from the next `rivals` programs (see `Validator.validate_program_distinguishing`). Neither
+    applies to parallel synthesis, and they can't be combined.
+
+    If `result_cache` has a program for the same oracle and grammar, it's returned without searching, as long as it
+    still agrees with the oracle on `revalidation_samples` new inputs. New results are added to it.
+
+    If `checkpoint` is given, the progress of the search is saved in that directory (at most every
+    `checkpoint_interval` seconds), and if `resume` is True, the search carries on from the progress saved there (see
+    `Checkpoint`). This only works for sequential searches that ask for examples synchronously.
+
+    If `metrics` is given, the time spent in each phase of the search and counts of what happened are added to it (see
+    `instrumentation`). If `quiet` is True, the programs that are rejected aren't printed one by one.
+
+    If `solver_timeout` is given, each of the solver's checks gets that many milliseconds. Programs that it can't decide
+    about in time are put aside, and once the enumeration is over they're checked again, for up to `retry_rounds`
+    rounds, with the timeout multiplied by `retry_factor` each round. If `time_budget` is given, the search stops after
+    that many seconds, and the program that satisfied the most examples so far (each checked on its own, see
+    `Validator.examples_satisfied_individually`) is returned, with its constants, even though it wasn't accepted.
+    Neither applies to parallel synthesis.
+
+    `solver_strategy` chooses how the solver checks each program (see `Validator`), and if `query_log` is given, the
+    solver's checks are written to it (see `query_log`). They don't apply to parallel synthesis either.
+
+    If `compact` is True, the programs waiting to be expanded are kept as byte strings (see `enumerate_programs`), at
+    most `frontier_size` of them in memory, and the rest in files in `spill_directory` (see `Frontier`).
+    """
+    if distinguishing and concurrent_queries > 0:
+        raise ValueError("distinguishing inputs can't be used with concurrent queries")
+    if checkpoint is not None and (workers > 1 or concurrent_queries > 0 or prefetch_examples):
+        raise ValueError("checkpoints can't be used with parallel synthesis, concurrent queries or prefetching")
+    if compact and bottom_up:
+        raise ValueError("the bottom-up enumerator does not support the compact encoding")
+    if workers > 1 and (
+        solver_timeout is not None or time_budget is not None or solver_strategy != "default" or query_log is not None
     ):
-        if v.validate_program(program):
-            print(f"accepting {program} with model {v.model}")
-            print(f"{len(v.example_bank)} constraints satisfied:")
-            for inputs, output in v.example_bank:
-                print(f"{inputs}\t->\t{output}")
-            constants = {}
-            for variable in v.model.decls():
-                constants[str(variable)] = z3_literal_to_python_literal(v.model.get_interp(variable))
-            program = fill_holes(program, constants)
-            if target_lang == "C":
-                print(to_c(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
-            elif target_lang == "Python":
-                print(to_python(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
-            elif target_lang == "Scheme":
-                print(to_scheme(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
-            return program
+        raise ValueError(
+            "solver timeouts, time budgets, solver strategies and query logs can't be used with parallel synthesis"
+        )
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    if isinstance(oracle, AsyncOracle) and (workers > 1 or concurrent_queries == 0):
+        oracle = AsyncToSyncOracle(oracle)
+    cached: Optional[SynthesisResult] = None
+    # Whether the program found was accepted, rather than being the best one found before the time budget ran out.
+    complete = True
+    if result_cache is not None:
+        key = synthesis_key(oracle, input_booleans, constant_booleans, input_numbers, constant_numbers, maximum_depth)
+        cached = result_cache.get(key)
+        if cached is not None and not revalidate(oracle, cached, input_booleans, input_numbers, revalidation_samples):
+            print(f"cached program {cached.program} failed revalidation, searching again")
+            result_cache.discard(key)
+            cached = None
+    if cached is not None:
+        program, constants, example_bank = cached
+        print(f"reusing {program} with constants {constants}")
+    elif workers > 1:
+        result = synthesize_in_parallel(
+            oracle,
+            input_booleans=input_booleans,
+            constant_booleans=constant_booleans,
+            input_numbers=input_numbers,
+            constant_numbers=constant_numbers,
+            successes_to_pass=successes_to_pass,
+            maximum_depth=maximum_depth,
+            bottom_up=bottom_up,
+            workers=workers,
+            oracle_batch_size=oracle_batch_size,
+            canonical=canonical,
+            metrics=metrics,
+            compact=compact,
+            frontier_size=frontier_size,
+            spill_directory=spill_directory,
+        )
+        if result is None:
+            return None
+        program, constants, example_bank = result
+        print(f"accepting {program} with constants {constants}")
+    else:
+        if concurrent_queries > 0:
+            # A synchronous oracle's queries run on threads that this adapter owns, so it's closed at the end.
+            adapter: Optional[SyncToAsyncOracle] = None
+            if isinstance(oracle, Oracle):
+                adapter = SyncToAsyncOracle(oracle, workers=concurrent_queries)
+            v = AsyncValidator(
+                oracle if adapter is None else adapter,
+                input_booleans=input_booleans,
+                input_numbers=input_numbers,
+                successes_to_pass=successes_to_pass,
+                concurrency=concurrent_queries,
+                metrics=metrics,
+                solver_timeout=solver_timeout,
+                deadline=deadline,
+                solver_strategy=solver_strategy,
+                query_log=query_log,
+            )
+            # The queries that are in flight belong to this loop, so every program is checked in it.
+            loop = asyncio.new_event_loop()
+
+            def validate_program(program: ir.Expression, rivals: Sequence[ir.Expression]) -> bool:
+                return loop.run_until_complete(v.validate_program_async(program))
+
+            def finish() -> None:
+                loop.run_until_complete(v.aclose())
+                loop.close()
+                if adapter is not None:
+                    adapter.close()
+
         else:
-            print(f"rejecting {program}")
-    return None
+            v = Validator(
+                oracle,  # type: ignore
+                input_booleans=input_booleans,
+                input_numbers=input_numbers,
+                successes_to_pass=successes_to_pass,
+                batch_size=oracle_batch_size,
+                prefetch=prefetch_examples,
+                distinguishing=distinguishing,
+                metrics=metrics,
+                solver_timeout=solver_timeout,
+                deadline=deadline,
+                solver_strategy=solver_strategy,
+                query_log=query_log,
+            )
+
+            def validate_program(program: ir.Expression, rivals: Sequence[ir.Expression]) -> bool:
+                return v.validate_program(program, rivals)
 
+            def finish() -> None:
+                v.close()
 
-def load_oracle(name: str) -> Oracle:
+        frontier = Frontier(frontier_size, spill_directory) if compact else None
+        programs = enumerate_programs(
+            ir.NumberExpression,
+            booleans=input_booleans + constant_booleans,
+            numbers=input_numbers + constant_numbers,
+            maximum_depth=maximum_depth,
+            bottom_up=bottom_up,
+            compact=compact,
+            inputs=input_booleans + input_numbers,
+            examples=v.example_bank,
+            frontier=frontier,
+            canonical=canonical,
+            metrics=metrics,
+        )
+        if metrics is not None:
+            programs = metrics.timed(programs, "enumeration")
+        progress: Optional[Checkpoint] = None
+        if checkpoint is not None:
+            parameters = {
+                "input_booleans": input_booleans,
+                "constant_booleans": constant_booleans,
+                "input_numbers": input_numbers,
+                "constant_numbers": constant_numbers,
+                "successes_to_pass": successes_to_pass,
+                "maximum_depth": maximum_depth,
+                "bottom_up": bottom_up,
+                "compact": compact,
+                "oracle_batch_size": oracle_batch_size,
+                "distinguishing": distinguishing,
+                "rivals": rivals,
+                "canonical": canonical,
+            }
+            progress = Checkpoint(checkpoint, parameters, resume=resume, interval=checkpoint_interval)
+            if progress.candidates:
+                print(f"resuming after {progress.candidates} rejected programs")
+        # The programs the solver couldn't decide about in time, which are checked again at the end.
+        undecided: List[ir.Expression] = []
+
+        def candidates() -> Iterator[Tuple[Optional[int], Tuple[ir.Expression, List[ir.Expression]]]]:
+            yield from enumerate(_lookahead(programs, rivals if distinguishing else 0))
+            for _ in range(retry_rounds):
+                if not undecided:
+                    return
+                v.solver_timeout *= retry_factor  # type: ignore
+                print(f"retrying {len(undecided)} undecided programs with a solver timeout of {v.solver_timeout}ms")
+                retrying = undecided[:]
+                undecided.clear()
+                for program in retrying:
+                    yield None, (program, [])
+
+        rejected = 0
+        # With a time budget, the program that satisfied the most examples so far (each checked on its own), the
+        # examples it satisfied, and with which constants.
+        best: Optional[Tuple[ir.Expression, List[Example], Dict[str, Union[bool, float]]]] = None
+        try:
+            for index, (program, upcoming) in candidates():
+                if progress is not None and index is not None:
+                    replayed = progress.replay(index)
+                    if replayed is not None:
+                        v.example_bank.extend(replayed)
+                        if progress.was_undecided(index):
+                            undecided.append(program)
+                        else:
+                            rejected += 1
+                        continue
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise BudgetExhausted()
+                examples_before = len(v.example_bank)
+                put_aside = False
+                try:
+                    accepted = validate_program(program, upcoming)
+                except SolverUnknown:
+                    undecided.append(program)
+                    accepted, put_aside = False, True
+                if progress is not None and index is not None:
+                    progress.record(index, v.example_bank[examples_before:], rejected=not accepted, undecided=put_aside)
+                if metrics is not None:
+                    metrics.count("candidates")
+                    metrics.gauge("example_bank_size", len(v.example_bank))
+                if accepted:
+                    constants, example_bank = v.constants(), v.example_bank
+                    print(f"accepting {program} with constants {constants}")
+                    break
+                if deadline is not None:
+                    satisfied, satisfying_constants = v.examples_satisfied_individually(program)
+                    if len(satisfied) > (0 if best is None else len(best[1])):
+                        best = (program, satisfied, satisfying_constants)
+                if put_aside:
+                    if not quiet:
+                        print(f"putting {program} aside")
+                else:
+                    rejected += 1
+                    if not quiet:
+                        print(f"rejecting {program}")
+            else:
+                if undecided:
+                    print(f"{len(undecided)} programs are still undecided")
+                return None
+        except BudgetExhausted:
+            if best is None:
+                print("out of time before any program satisfied an example")
+                return None
+            program, example_bank, constants = best
+            print(
+                f"out of time, the best program so far is {program}, "
+                f"which satisfies {len(example_bank)} of the {len(v.example_bank)} examples"
+            )
+            complete = False
+        finally:
+            # This counts the programs rejected before a checkpoint that was resumed from too.
+            if quiet:
+                print(f"rejected {rejected} programs")
+            finish()
+            if frontier is not None:
+                frontier.close()
+            if progress is not None:
+                progress.close()
+    if result_cache is not None and cached is None and complete:
+        result_cache.put(key, SynthesisResult(program, constants, example_bank))
+
+    print(f"{len(example_bank)} constraints satisfied:")
+    for inputs, output in example_bank:
+        print(f"{inputs}\t->\t{output}")
+    program = fill_holes(program, constants)
+    if target_lang == "C":
+        print(to_c(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
+    elif target_lang == "Python":
+        print(to_python(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
+    elif target_lang == "Scheme":
+        print(to_scheme(program, number_inputs=input_numbers, boolean_inputs=input_booleans))
+    return program
+
+
+def _lookahead(iterable: Iterable[T], count: int) -> Iterator[Tuple[T, List[T]]]:
+    """
+    Yields each item of `iterable` along with (up to) the `count` items after it.
+    """
+    iterator = iter(iterable)
+    window = list(itertools.islice(iterator, count + 1))
+    while window:
+        yield window[0], window[1:]
+        window.pop(0)
+        window.extend(itertools.islice(iterator, 1))
+
+
+def load_oracle(name: str) -> Union[Oracle, AsyncOracle]:
     env = importlib.import_module(f".oracles.{name}", "program_translation")
     for value in env.__dict__.values():
         try:
-            if issubclass(value, Oracle):
+            if issubclass(value, (Oracle, AsyncOracle)):
                 return value()
         except TypeError:
             pass
@@ -135,20 +408,235 @@ if __name__ == "__main__":  # pragma: no cover
         default=None,
         choices=["C", "Python", "Scheme"]
     )
+    parser.add_argument(
+        "--bottom-up",
+        help="enumerate programs bottom-up, skipping ones that behave the same as another on the examples so far",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="number of processes to validate programs in",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-k",
+        "--oracle-batch-size",
+        help="number of new examples to request from the oracle at a time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--prefetch-examples",
+        help="request the next batch of examples from the oracle while the current one is being checked",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--oracle-cache",
+        help="SQLite database to remember the oracle's answers in, so that later runs can reuse them",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--oracle-cache-size",
+        help="number of the oracle's answers to remember in memory (0 to not remember any)",
+        type=int,
+        default=65536,
+    )
+    parser.add_argument(
+        "--seed",
+        help="seed for the random inputs given to the oracle, so that reruns ask the same questions (and can reuse the "
+        "answers in --oracle-cache)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-q",
+        "--concurrent-queries",
+        help="number of queries to keep in flight to the oracle while programs are being checked",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--distinguishing",
+        help="ask the oracle about inputs that tell each program apart from its alternatives, rather than random ones",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--rivals",
+        help="number of upcoming programs to tell each program apart from with --distinguishing",
+        type=int,
+        default=8,
+    )
+    parser.add_argument(
+        "--canonical",
+        help="skip programs that are rearrangements of others, e.g. (+ y x) when (+ x y) has been tried",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--compact",
+        help="keep the programs waiting to be expanded as byte strings, which takes much less memory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--frontier-size",
+        help="number of programs waiting to be expanded to keep in memory with --compact, before spilling to disk",
+        type=int,
+        default=1_000_000,
+    )
+    parser.add_argument(
+        "--spill-dir",
+        help="where --compact spills programs waiting to be expanded (the temporary directory by default)",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--result-cache",
+        help="SQLite database of earlier results to reuse (after checking them on a few new inputs) and add to",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--revalidation-samples",
+        help="number of new inputs to check a result from --result-cache on",
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="directory to save the progress of the search in, so that it can be resumed",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        help="carry on from the progress saved in --checkpoint",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        help="how often to save progress to --checkpoint, in seconds",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--quiet",
+        help="don't print each rejected program, only how many there were",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        help="file to write a summary of where the time went, and counts of what happened, to as JSON",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        help="file to write the same summary as --metrics-json to in Prometheus's text format",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--solver-timeout",
+        help="milliseconds the solver gets for each check; programs it can't decide about are retried at the end",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--time-budget",
+        help="seconds to search for; when they run out, the program that satisfied the most examples is returned",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--retry-rounds",
+        help="number of times to retry the programs the solver couldn't decide about",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--retry-factor",
+        help="how much to multiply the solver timeout by in each round of retries",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--solver-strategy",
+        help="use Z3's default solver, the solver for the theory of each program's constraints, "
+        "or race several solvers for the hard theories",
+        choices=["default", "theory", "portfolio"],
+        default="default",
+    )
+    parser.add_argument(
+        "--query-log",
+        help="directory to write the solver's queries to as SMT-LIB 2, to replay with program_translation.query_log",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--query-log-threshold",
+        help="only log queries that took at least this many seconds",
+        type=float,
+        default=0.0,
+    )
     args = parser.parse_args()
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    if args.seed is not None:
+        random.seed(args.seed)
 
     target_type = (
         ir.BooleanExpression if args.type == "boolean" else ir.NumberExpression
     )
     oracle = load_oracle(args.oracle)
+    if args.oracle_cache is not None or args.oracle_cache_size > 0:
+        if isinstance(oracle, AsyncOracle):
+            oracle = AsyncToSyncOracle(oracle)
+        oracle = CachedOracle(oracle, maxsize=args.oracle_cache_size, path=args.oracle_cache)
+    metrics = Metrics() if args.metrics_json is not None or args.metrics_prometheus is not None else None
 
-    program = synthesize(
-        oracle,
-        args.input_booleans,
-        args.constant_booleans,
-        args.input_numbers,
-        args.constant_numbers,
-        args.successes_to_pass,
-        args.max_depth,
-        args.target
-    )
+    try:
+        program = synthesize(
+            oracle,
+            args.input_booleans,
+            args.constant_booleans,
+            args.input_numbers,
+            args.constant_numbers,
+            args.successes_to_pass,
+            args.max_depth,
+            args.target,
+            args.bottom_up,
+            args.workers,
+            args.oracle_batch_size,
+            args.prefetch_examples,
+            args.concurrent_queries,
+            args.distinguishing,
+            args.rivals,
+            args.canonical,
+            None if args.result_cache is None else ResultCache(args.result_cache),
+            args.revalidation_samples,
+            args.checkpoint,
+            args.resume,
+            args.checkpoint_interval,
+            metrics,
+            args.quiet,
+            args.solver_timeout,
+            args.time_budget,
+            args.retry_rounds,
+            args.retry_factor,
+            args.solver_strategy,
+            None if args.query_log is None else QueryLog(args.query_log, args.query_log_threshold),
+            args.compact,
+            args.frontier_size,
+            args.spill_dir,
+        )
+    finally:
+        # Also written if the run is interrupted, so that it's clear where it got to.
+        if metrics is not None and args.metrics_json is not None:
+            metrics.write_json(args.metrics_json)
+        if metrics is not None and args.metrics_prometheus is not None:
+            metrics.write_prometheus(args.metrics_prometheus)
+    # In parallel mode, each worker process has its own copy of the cache, and so its own counts.
+    if isinstance(oracle, CachedOracle) and args.workers == 1:
+        print(f"oracle cache: {oracle.hits} hits ({oracle.disk_hits} from disk), {oracle.misses} misses")
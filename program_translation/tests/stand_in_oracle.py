@@ -0,0 +1,14 @@
+"""
+A stand-in for `Mystery.java` that speaks the `process_oracle` protocol, for testing without Java. It crashes when x is
+13 and hangs when x is 17.
+"""
+import sys
+import time
+
+for line in sys.stdin:
+    x, y = map(float, line.split())
+    if x == 13:
+        sys.exit(1)
+    elif x == 17:
+        time.sleep(60)
+    print(x + y - 4, flush=True)
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from .. import intermediate_representation as ir
+from ..asynchronous import AsyncOracle, AsyncToSyncOracle, AsyncValidator, SyncToAsyncOracle
+from .test_validator import XPlus2Oracle
+
+
+class SlowXPlus2Oracle(AsyncOracle):
+    """
+    Takes a little while to answer, and keeps track of how many queries it was working on at once.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def run(self, input):
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        return input["x"] + 2
+
+
+def test_async_to_sync():
+    async_oracle = SlowXPlus2Oracle()
+    oracle = AsyncToSyncOracle(async_oracle, concurrency=3)
+    assert oracle.run({"x": 1.0}) == 3.0
+    assert oracle.run_batch([{"x": float(x)} for x in range(10)]) == [x + 2.0 for x in range(10)]
+    assert async_oracle.most_in_flight == 3
+
+
+def test_sync_to_async():
+    oracle = SyncToAsyncOracle(XPlus2Oracle(), workers=2)
+    assert asyncio.run(oracle.run_batch([{"x": 1.0}, {"x": 2.0}])) == [3.0, 4.0]
+    oracle.close()
+    with pytest.raises(ValueError):
+        SyncToAsyncOracle(XPlus2Oracle(), workers=0)
+
+
+def test_async_validation():
+    oracle = SlowXPlus2Oracle()
+
+    async def validate():
+        validator = AsyncValidator(oracle, input_numbers=["x"], successes_to_pass=10, concurrency=4)
+        try:
+            wrong = await validator.validate_program_async(ir.Mul(ir.NumberHole("x"), ir.NumberHole("c")))
+            right = await validator.validate_program_async(ir.Add(ir.NumberHole("x"), ir.NumberHole("c")))
+            return validator, wrong, right
+        finally:
+            await validator.aclose()
+
+    validator, wrong, right = asyncio.run(validate())
+    assert not wrong
+    assert right
+    assert validator.constants() == {"c": 2.0}
+    assert len(validator.example_bank) >= 11
+    assert oracle.most_in_flight == 4
+    assert all(inputs["x"] + 2 == output for inputs, output in validator.example_bank)
+
+
+class ImmediateXPlus2Oracle(AsyncOracle):
+    async def run(self, input):
+        return input["x"] + 2
+
+
+def test_async_validation_checks_every_answer():
+    async def validate():
+        # All the queries in flight can be answered at once, which is more than successes_to_pass.
+        validator = AsyncValidator(ImmediateXPlus2Oracle(), input_numbers=["x"], successes_to_pass=3, concurrency=8)
+        try:
+            wrong = await validator.validate_program_async(ir.Mul(ir.NumberHole("x"), ir.NumberHole("c")))
+            right = await validator.validate_program_async(ir.Add(ir.NumberHole("x"), ir.NumberHole("c")))
+            return validator, wrong, right
+        finally:
+            await validator.aclose()
+
+    validator, wrong, right = asyncio.run(validate())
+    assert not wrong
+    assert right
+    assert validator.satisfied_examples == len(validator.example_bank) >= 3
+
+
+def test_async_validator_works_synchronously():
+    validator = AsyncValidator(SlowXPlus2Oracle(), input_numbers=["x"], successes_to_pass=3)
+    assert validator.validate_program(ir.Add(ir.NumberHole("x"), ir.NumberLiteral(2)))
+    validator.close()
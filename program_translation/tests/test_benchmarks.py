@@ -0,0 +1,31 @@
+from ..benchmarks.suite import Measurement, compare, run_suite, to_json
+
+
+def test_compare():
+    baseline = to_json(
+        {
+            "faster": Measurement(100.0, "programs/s", True),
+            "slower": Measurement(100.0, "programs/s", True),
+            "shorter": Measurement(2.0, "s", False),
+            "longer": Measurement(2.0, "s", False),
+        }
+    )
+    measurements = {
+        "faster": Measurement(150.0, "programs/s", True),
+        "slower": Measurement(50.0, "programs/s", True),
+        "shorter": Measurement(2.1, "s", False),
+        "longer": Measurement(4.0, "s", False),
+        "new": Measurement(1.0, "s", False),
+    }
+    report, regressions = compare(measurements, baseline, tolerance=0.2)
+    assert regressions == ["slower", "longer"]
+    assert len(report) == 5
+    assert "improvement" in report[0]
+    assert "not in baseline" in report[4]
+
+
+def test_run_suite():
+    measurements = run_suite(["enumeration", "translation"], quick=True, repeat=1)
+    assert "enumeration/compact/depth_5" in measurements
+    assert "translation/Scheme" in measurements
+    assert all(measurement.value > 0 for measurement in measurements.values())
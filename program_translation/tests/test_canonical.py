@@ -0,0 +1,71 @@
+import itertools
+
+from .. import intermediate_representation as ir
+from ..canonical import canonicalize, is_canonical, key, locally_canonical
+from ..enumerator import canonicalization_report, enumerate_programs
+from ..ir_utilities import count_elements, evaluate
+from ..validator import fill_holes
+
+x, y = ir.NumberHole("x"), ir.NumberHole("y")
+P = ir.BooleanHole("P")
+ENUMERATION = dict(maximum_depth=6, numbers=["x", "y"], booleans=["P"])
+
+
+def test_rules():
+    assert is_canonical(ir.Add(x, y))
+    assert not is_canonical(ir.Add(y, x))
+    assert is_canonical(ir.Mul(x, x))
+    assert not is_canonical(ir.Not(ir.Not(P)))
+    assert not is_canonical(ir.Ite(P, ir.Add(x, y), ir.Add(x, y)))
+    assert not is_canonical(ir.Sub(ir.Add(x, y), ir.Add(x, y)))
+    assert is_canonical(ir.Sub(x, x))
+    assert not is_canonical(ir.Lt(x, ir.Add(y, x)))
+
+
+def test_partial_programs():
+    # These might turn out either way.
+    assert locally_canonical(ir.Add(y, ir.NumberExpression()))
+    assert locally_canonical(ir.Add(ir.Add(x, y), ir.Add(x, ir.NumberExpression())))
+    assert locally_canonical(ir.Ite(P, ir.NumberExpression(), ir.NumberExpression()))
+    # But these can't be canonical, whatever the non-terminals are replaced with.
+    assert not locally_canonical(ir.Add(y, ir.Add(ir.NumberExpression(), ir.NumberExpression())))
+    assert not locally_canonical(ir.Add(ir.Sub(x, y), ir.Add(ir.Add(ir.NumberExpression(), x), x)))
+    assert not locally_canonical(ir.Not(ir.Not(ir.BooleanExpression())))
+
+
+def test_canonicalize():
+    values = itertools.product([-2.0, 0.0, 3.0], [1.0, 5.0], [True, False])
+    environments = [{"x": a, "y": b, "P": p} for a, b, p in values]
+    canonical = set(enumerate_programs(ir.NumberExpression, canonical=True, **ENUMERATION))
+    for program in enumerate_programs(ir.NumberExpression, **ENUMERATION):
+        rewritten = canonicalize(program)
+        assert is_canonical(rewritten)
+        assert count_elements(rewritten) <= count_elements(program)
+        # Every program has an equivalent among the canonical ones.
+        assert rewritten in canonical
+        for environment in environments:
+            assert evaluate(fill_holes(rewritten, environment)) == evaluate(fill_holes(program, environment))
+        if is_canonical(program):
+            assert rewritten is program
+
+
+def test_key_orders_programs():
+    assert key(x) < key(y)
+    assert key(ir.Add(x, y)) < key(ir.Sub(x, y))
+    # Operations come before leaves.
+    assert key(ir.Add(y, y)) < key(x)
+
+
+def test_enumerators_agree():
+    objects = list(enumerate_programs(ir.NumberExpression, canonical=True, **ENUMERATION))
+    assert all(is_canonical(program) for program in objects)
+    compact = list(enumerate_programs(ir.NumberExpression, canonical=True, compact=True, **ENUMERATION))
+    assert set(compact) == set(objects)
+    bottom_up = list(enumerate_programs(ir.NumberExpression, canonical=True, bottom_up=True, **ENUMERATION))
+    assert set(bottom_up) == set(objects)
+
+
+def test_report():
+    report = canonicalization_report(ir.NumberExpression, maximum_depth=5, numbers=["x", "y"])
+    assert report[2] == (3, 12, 10, 2)
+    assert all(canonical <= total for _, total, canonical, _ in report)
@@ -0,0 +1,99 @@
+import json
+import os
+import random
+
+import pytest
+
+from ..checkpoint import Checkpoint
+from ..synthesizer import synthesize
+from ..validator import Oracle, OracleInput
+
+PARAMETERS = {"maximum_depth": 3}
+
+
+def test_record_and_replay(tmp_path):
+    directory = str(tmp_path)
+    random.seed(1)
+    with Checkpoint(directory, PARAMETERS) as checkpoint:
+        checkpoint.record(0, [({"x": 1.0}, 2.0)], rejected=True)
+        # Put aside undecided.
+        checkpoint.record(1, [], rejected=False, undecided=True)
+        checkpoint.save(2)
+        state = random.getstate()
+        random.random()
+        # Progress after the last save is lost, along with the examples that came with it.
+        checkpoint.record(2, [({"x": 3.0}, 4.0)], rejected=False, undecided=True)
+        checkpoint._unsaved = None
+
+    with Checkpoint(directory, PARAMETERS, resume=True) as checkpoint:
+        assert random.getstate() == state
+        assert checkpoint.candidates == 2
+        assert checkpoint.replay(0) == [({"x": 1.0}, 2.0)]
+        assert checkpoint.replay(1) == []
+        assert checkpoint.replay(2) is None
+        assert [checkpoint.was_undecided(index) for index in range(3)] == [False, True, False]
+    with open(os.path.join(directory, "examples.jsonl")) as f:
+        assert [json.loads(line)["candidate"] for line in f] == [0]
+
+
+def test_parameters_have_to_match(tmp_path):
+    Checkpoint(str(tmp_path), PARAMETERS).close()
+    with pytest.raises(ValueError):
+        Checkpoint(str(tmp_path), {"maximum_depth": 4}, resume=True)
+    # Without resuming, the old checkpoint is just replaced.
+    Checkpoint(str(tmp_path), {"maximum_depth": 4}).close()
+
+
+class Stopped(Exception):
+    pass
+
+
+class StoppingOracle(Oracle):
+    """
+    Gives x * x + 1, but stops the run after `limit` queries.
+    """
+
+    def __init__(self, limit: int = -1):
+        self.limit = limit
+
+    def run(self, input: OracleInput) -> float:
+        if self.limit == 0:
+            raise Stopped()
+        self.limit -= 1
+        return input["x"] * input["x"] + 1
+
+
+def test_resuming_gives_the_same_result(tmp_path, capsys):
+    grammar = dict(input_numbers=["x"], constant_numbers=["c"], maximum_depth=5, bottom_up=True, successes_to_pass=3)
+    random.seed(5)
+    expected = synthesize(StoppingOracle(), **grammar)
+    expected_output = capsys.readouterr().out
+
+    random.seed(5)
+    with pytest.raises(Stopped):
+        synthesize(StoppingOracle(limit=3), **grammar, checkpoint=str(tmp_path), checkpoint_interval=0)
+    first_part = capsys.readouterr().out
+    assert "rejecting" in first_part
+    random.seed(1234)
+    assert synthesize(StoppingOracle(), **grammar, checkpoint=str(tmp_path), resume=True) == expected
+    second_part = capsys.readouterr().out
+    assert "resuming after" in second_part
+    assert first_part.count("rejecting") + second_part.count("rejecting") == expected_output.count("rejecting")
+    assert second_part.split("constraints satisfied")[1] == expected_output.split("constraints satisfied")[1]
+
+
+def test_quiet_count_includes_the_resumed_programs(tmp_path, capsys):
+    grammar = dict(input_numbers=["x"], constant_numbers=["c"], maximum_depth=5, bottom_up=True, successes_to_pass=3)
+    random.seed(5)
+    synthesize(StoppingOracle(), **grammar, quiet=True)
+    expected_output = capsys.readouterr().out
+
+    random.seed(5)
+    with pytest.raises(Stopped):
+        synthesize(StoppingOracle(limit=3), **grammar, checkpoint=str(tmp_path), checkpoint_interval=0, quiet=True)
+    capsys.readouterr()
+    synthesize(StoppingOracle(), **grammar, checkpoint=str(tmp_path), resume=True, quiet=True)
+    resumed_output = capsys.readouterr().out
+    counts = [line for line in expected_output.splitlines() if line.startswith("rejected ")]
+    assert len(counts) == 1
+    assert [line for line in resumed_output.splitlines() if line.startswith("rejected ")] == counts
@@ -0,0 +1,35 @@
+import pytest
+
+from .. import intermediate_representation as ir
+from ..compilation import compile_program
+from ..ir_utilities import evaluate
+from ..validator import fill_holes
+
+x, y, p = ir.NumberHole("x"), ir.NumberHole("y"), ir.BooleanHole("P")
+
+
+@pytest.mark.parametrize(
+    "expr",
+    (
+        ir.Add(x, ir.Mul(y, ir.NumberLiteral(3))),
+        ir.Ite(ir.Lt(x, y), ir.Sub(y, x), ir.Div(x, y)),
+        ir.Ite(ir.Xor(p, ir.Lt(x, ir.NumberLiteral(0))), x, y),
+        ir.Impl(p, ir.Or(ir.Not(p), ir.And(p, ir.Lt(y, x)))),
+        ir.NumberLiteral(7),
+    ),
+)
+@pytest.mark.parametrize("inputs", ({"x": 1.0, "y": 2.0, "P": True}, {"x": -4.0, "y": 0.5, "P": False}))
+def test_compiled_programs_match_evaluate(expr, inputs):
+    function = compile_program(expr, ["x", "y", "P"])
+    assert function(inputs["x"], inputs["y"], inputs["P"]) == evaluate(fill_holes(expr, inputs))
+
+
+def test_compiled_programs_are_cached():
+    expr = ir.Add(x, y)
+    assert compile_program(expr, ["x", "y"]) is compile_program(ir.Add(x, y), ("x", "y"))
+    assert compile_program(expr, ["y", "x"])(1.0, 2.0) == 3.0
+
+
+def test_compiling_requires_every_hole():
+    with pytest.raises(ValueError):
+        compile_program(ir.Add(x, y), ["x"])
@@ -0,0 +1,45 @@
+import pytest
+
+from .. import encoding
+from .. import intermediate_representation as ir
+from ..enumerator import enumerate_programs
+from .test_ir_utilities import (
+    SAMPLE_ARITHMETIC_EXPRESSION,
+    SAMPLE_BOOLEAN_EXPRESSION,
+    SAMPLE_COND_EXPRESSION,
+    SAMPLE_HOLE_EXPRESSION,
+    SAMPLE_NONTERMINAL_EXPRESSION,
+)
+
+
+@pytest.mark.parametrize(
+    "expr",
+    (
+        SAMPLE_BOOLEAN_EXPRESSION,
+        SAMPLE_ARITHMETIC_EXPRESSION,
+        SAMPLE_COND_EXPRESSION,
+        SAMPLE_NONTERMINAL_EXPRESSION,
+        SAMPLE_HOLE_EXPRESSION,
+    ),
+)
+def test_round_trip(expr):
+    codec = encoding.ProgramCodec()
+    code = codec.encode(expr)
+    assert codec.decode(code) is expr
+
+
+def test_one_byte_per_node():
+    codec = encoding.ProgramCodec([ir.NumberHole("x")])
+    code = codec.encode(SAMPLE_NONTERMINAL_EXPRESSION)
+    assert len(code) == 5
+    assert encoding.count_nonterminals(code) == 2
+    assert encoding.find_nonterminal(code) == 1
+    assert encoding.find_nonterminal(codec.encode(ir.NumberHole("x"))) == -1
+
+
+def test_compact_enumeration_matches_object_enumeration():
+    kwargs = dict(maximum_depth=6, numbers=["x", "y"], booleans=["P"])
+    programs = list(enumerate_programs(ir.NumberExpression, **kwargs))
+    compact_programs = list(enumerate_programs(ir.NumberExpression, compact=True, **kwargs))
+    assert len(compact_programs) == len(programs)
+    assert set(compact_programs) == set(programs)
@@ -0,0 +1,105 @@
+import pytest
+
+from .. import intermediate_representation as ir
+from ..enumerator import HashFilteredPQ, PartialProgram, enumerate_programs, productions, replace_one_nonterminal
+from ..ir_utilities import evaluate
+from ..validator import fill_holes
+
+EXAMPLES = [({"x": 1.0, "y": 2.0}, 0.0), ({"x": 5.0, "y": -3.0}, 0.0)]
+
+
+def bottom_up(examples, **kwargs):
+    return enumerate_programs(
+        ir.NumberExpression, bottom_up=True, inputs=["x", "y"], examples=examples, **kwargs
+    )
+
+
+def test_bottom_up_skips_equivalent_programs():
+    programs = list(bottom_up(EXAMPLES, maximum_depth=3, numbers=["x", "y"]))
+    assert ir.Add(ir.NumberHole("x"), ir.NumberHole("y")) in programs
+    assert ir.Add(ir.NumberHole("y"), ir.NumberHole("x")) not in programs
+    assert len(set(programs)) == len(programs)
+
+
+def test_bottom_up_keeps_programs_with_constants():
+    programs = list(bottom_up(EXAMPLES, maximum_depth=3, numbers=["x", "c"]))
+    assert ir.Add(ir.NumberHole("x"), ir.NumberHole("c")) in programs
+    assert ir.Add(ir.NumberHole("c"), ir.NumberHole("x")) in programs
+
+
+def test_bottom_up_splits_classes_when_examples_are_added():
+    examples = []
+    programs = bottom_up(examples, maximum_depth=5, numbers=["x", "y"])
+    # With no examples every program is equivalent to the first one.
+    enumerated = [next(programs)]
+    examples.extend(EXAMPLES)
+    enumerated.extend(programs)
+    expected = list(bottom_up(EXAMPLES, maximum_depth=5, numbers=["x", "y"]))
+    assert len(enumerated) == len(set(enumerated)) == len(expected)
+
+
+def test_bottom_up_enumerates_the_same_space():
+    # Random-looking inputs make it very unlikely that two different programs agree by accident.
+    examples = [({"x": 3.7, "y": -11.3}, 0.0), ({"x": 101.9, "y": 7.1}, 0.0), ({"x": -2.3, "y": 0.6}, 0.0)]
+    outputs = set()
+    for program in enumerate_programs(ir.NumberExpression, maximum_depth=4, numbers=["x", "y"]):
+        outputs.add(tuple(evaluate(fill_holes(program, inputs)) for inputs, _ in examples))
+    assert len(list(bottom_up(examples, maximum_depth=4, numbers=["x", "y"]))) == len(outputs)
+
+
+class Colliding:
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 0
+
+
+def test_hash_filtered_pq_keeps_elements_with_the_same_hash():
+    queue = HashFilteredPQ()
+    a, b = Colliding("a"), Colliding("b")
+    queue.put(1, a)
+    queue.put(1, b)
+    queue.put(1, a)
+    assert [queue.get(), queue.get()] == [a, b]
+    assert queue.empty()
+
+
+def test_hash_filtered_pq_forgets_lower_priorities():
+    queue = HashFilteredPQ()
+    queue.put(1, "a")
+    queue.put(2, "b")
+    queue.put(2, "b")
+    assert queue.get() == "a"
+    assert set(queue.seen) == {1, 2}
+    assert queue.get() == "b"
+    assert set(queue.seen) == {2}
+    assert queue.duplicates == 1
+
+
+def test_partial_program_metadata_is_kept_up_to_date():
+    rules = {
+        nonterminal: [PartialProgram.of(rule) for rule in right_hand_sides]
+        for nonterminal, right_hand_sides in productions(numbers=["x"], booleans=["P"]).items()
+    }
+    frontier = [PartialProgram.of(ir.NumberExpression())]
+    for _ in range(500):
+        current = frontier.pop(0)
+        for derivative in current.expand(rules):
+            expected = PartialProgram.of(derivative.expression)
+            assert (derivative.size, derivative.nonterminals, derivative.path) == (
+                expected.size,
+                expected.nonterminals,
+                expected.path,
+            )
+            if derivative.nonterminals:
+                frontier.append(derivative)
+
+
+def test_replace_one_nonterminal():
+    expression = ir.Add(ir.NumberHole("x"), ir.NumberExpression())
+    derivatives = replace_one_nonterminal(expression, numbers=["y"])
+    assert ir.Add(ir.NumberHole("x"), ir.NumberHole("y")) in derivatives
+    assert all(derivative._0 is expression._0 for derivative in derivatives)
+    with pytest.raises(TypeError):
+        replace_one_nonterminal(ir.NumberHole("x"))
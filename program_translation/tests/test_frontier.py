@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from .. import intermediate_representation as ir
+from ..enumerator import enumerate_programs
+from ..frontier import Frontier
+
+
+def drain(frontier: Frontier):
+    entries = []
+    while not frontier.empty():
+        entries.append(frontier.get())
+    return entries
+
+
+def test_order_and_duplicates():
+    frontier = Frontier()
+    for priority, data in [(2, b"b"), (1, b"z"), (2, b"a"), (1, b"z"), (2, b"b")]:
+        frontier.put(priority, data)
+    assert drain(frontier) == [b"z", b"a", b"b"]
+    assert frontier.duplicates == 2
+
+
+def test_spilling(tmp_path):
+    frontier = Frontier(max_in_memory=4, directory=str(tmp_path))
+    entries = [(len(data), data) for data in [b"dd", b"a", b"ccc", b"b", b"dd", b"e", b"ab", b"a", b"fff", b"ab"]]
+    for priority, data in entries:
+        frontier.put(priority, data)
+    assert frontier.runs > 0
+    assert len(frontier.heap) <= 4
+    assert len(frontier) == len(entries)
+    assert os.listdir(str(tmp_path))
+    # Duplicates are dropped even when one copy was on disk and the other in memory.
+    assert drain(frontier) == [data for _, data in sorted(set(entries))]
+    assert frontier.duplicates == 3
+    assert frontier.spilled_bytes > 0
+    # The run files are removed once the frontier is empty.
+    assert not os.listdir(str(tmp_path))
+
+
+def test_monotone():
+    frontier = Frontier()
+    frontier.put(2, b"b")
+    frontier.get()
+    frontier.put(2, b"c")
+    with pytest.raises(ValueError):
+        frontier.put(2, b"a")
+
+
+def test_enumeration_with_spilling(tmp_path):
+    kwargs = dict(maximum_depth=6, numbers=["x", "y"], booleans=["P"])
+    programs = list(enumerate_programs(ir.NumberExpression, compact=True, **kwargs))
+    frontier = Frontier(max_in_memory=16, directory=str(tmp_path))
+    spilled_programs = list(enumerate_programs(ir.NumberExpression, compact=True, frontier=frontier, **kwargs))
+    assert spilled_programs == programs
+    assert frontier.stats()["spilled"] > 0
+    assert frontier.stats()["peak_in_memory"] == 16
+    with pytest.raises(ValueError):
+        list(enumerate_programs(ir.NumberExpression, frontier=frontier, **kwargs))
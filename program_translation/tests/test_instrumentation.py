@@ -0,0 +1,75 @@
+import json
+import random
+
+from ..instrumentation import Metrics
+from ..oracles.XPlusYMinus2 import XPlusYMinus2Oracle
+from ..synthesizer import synthesize
+
+
+def test_metrics():
+    metrics = Metrics()
+    with metrics.timer("solver"):
+        pass
+    metrics.add_time("solver", 1.0)
+    assert list(metrics.timed(range(3), "enumeration")) == [0, 1, 2]
+    metrics.count("candidates")
+    metrics.count("candidates", 2)
+    metrics.gauge("frontier_size", 5)
+    metrics.gauge("frontier_size", 3)
+
+    summary = metrics.summary()
+    assert summary["phases"]["solver"]["calls"] == 2
+    assert summary["phases"]["solver"]["seconds"] >= 1.0
+    # One more wait, for the end of the iteration.
+    assert summary["phases"]["enumeration"]["calls"] == 4
+    assert summary["counters"] == {"candidates": 3}
+    assert summary["gauges"] == {"frontier_size": {"last": 3, "peak": 5}}
+
+    other = Metrics()
+    other.add_time("solver", 2.0)
+    other.count("candidates")
+    other.gauge("frontier_size", 7)
+    other.gauge("frontier_size", 1)
+    metrics.merge(other)
+    assert metrics.calls["solver"] == 3
+    assert metrics.counters["candidates"] == 4
+    assert (metrics.gauges["frontier_size"], metrics.peaks["frontier_size"]) == (1, 7)
+
+
+def test_exports(tmp_path):
+    metrics = Metrics()
+    metrics.add_time("oracle", 0.5)
+    metrics.count("oracle_queries", 4)
+    metrics.gauge("example_bank_size", 4)
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+
+    with open(tmp_path / "metrics.json") as f:
+        assert json.load(f)["counters"] == {"oracle_queries": 4}
+    with open(tmp_path / "metrics.prom") as f:
+        lines = f.read().splitlines()
+    assert 'synthesis_phase_seconds_total{phase="oracle"} 0.5' in lines
+    assert "# TYPE synthesis_oracle_queries_total counter" in lines
+    assert "synthesis_oracle_queries_total 4" in lines
+    assert "synthesis_example_bank_size_peak 4" in lines
+
+
+def test_synthesis_metrics(capsys):
+    metrics = Metrics()
+    random.seed(0)
+    program = synthesize(
+        XPlusYMinus2Oracle(),
+        input_numbers=["x", "y"],
+        constant_numbers=["c"],
+        maximum_depth=5,
+        metrics=metrics,
+        quiet=True,
+    )
+    assert program is not None
+    output = capsys.readouterr().out
+    assert "rejecting" not in output
+    rejected = metrics.counters["candidates"] - 1
+    assert f"rejected {rejected} programs" in output
+    assert metrics.counters["concrete_rejections"] + metrics.counters["solver_rejections"] == rejected
+    assert metrics.counters["oracle_queries"] == metrics.gauges["example_bank_size"]
+    assert {"enumeration", "expansion", "hashing", "solver", "oracle"} <= set(metrics.times)
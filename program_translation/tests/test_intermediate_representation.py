@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 from .. import intermediate_representation as ir
@@ -49,3 +51,52 @@ def test_check_operand_type_rejects_correctly():
 
 def test_check_operand_type_accepts_correctly():
     ir.check_operand_type(ir.NumberLiteral(4.5), ir.NumberExpression)
+
+
+def test_structurally_equal_expressions_are_shared():
+    first = ir.Add(ir.NumberHole("x"), ir.Mul(ir.NumberLiteral(2), ir.NumberExpression()))
+    second = ir.Add(ir.NumberHole("x"), ir.Mul(ir.NumberLiteral(2.0), ir.NumberExpression()))
+    assert first is second
+    assert hash(first) == hash(second)
+    assert first._1 is second._1
+
+
+def test_interning_distinguishes_types():
+    assert ir.NumberHole("x") is not ir.BooleanHole("x")
+    assert ir.NumberLiteral(0.0) is not ir.NumberLiteral(-0.0)
+    with pytest.raises(TypeError):
+        ir.NumberLiteral(True)
+
+
+def test_expressions_are_immutable():
+    expr = ir.Not(ir.BooleanHole("P"))
+    with pytest.raises(AttributeError):
+        expr._0 = ir.BooleanLiteral(True)
+
+
+def test_pickling_preserves_sharing():
+    expr = ir.Lt(ir.NumberHole("x"), ir.NumberLiteral(3))
+    assert pickle.loads(pickle.dumps(expr)) is expr
+
+
+def _describe_hole(_, expr):
+    return expr._name
+
+
+def test_make_visitor_is_cached():
+    first = ir.make_visitor("Describer", {ir.NumberHole: _describe_hole})
+    second = ir.make_visitor("Describer", {ir.NumberHole: _describe_hole})
+    assert first is second
+
+
+def test_visitor_falls_back_to_default_action():
+    visitor = ir.make_visitor("Describer", {ir.NumberHole: _describe_hole}, default_action=lambda *_: "other")()
+    assert visitor.visit(ir.NumberHole("x")) == "x"
+    assert visitor.visit(ir.NumberLiteral(1)) == "other"
+    assert visitor.visit(ir.NumberLiteral(2)) == "other"
+
+
+def test_visitor_without_default_action_rejects_unknown_types():
+    visitor = ir.make_visitor("Describer", {ir.NumberHole: _describe_hole})()
+    with pytest.raises(NotImplementedError):
+        visitor.visit(ir.NumberLiteral(1))
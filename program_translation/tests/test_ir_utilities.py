@@ -44,5 +44,19 @@ def test_counting_nonterminals():
 )
 def test_deep_copying(expr):
     new_expr = iru.deep_copy(expr)
-    assert new_expr is not expr
+    assert new_expr is expr
     assert str(new_expr) == str(expr)
+
+
+def test_finding_holes():
+    assert iru.holes(SAMPLE_HOLE_EXPRESSION) == {ir.BooleanHole("P")}
+    assert iru.holes(SAMPLE_ARITHMETIC_EXPRESSION) == set()
+
+
+def test_partial_evaluation():
+    x, c = ir.NumberHole("x"), ir.NumberHole("c")
+    assert iru.partially_evaluate(ir.Add(x, ir.NumberLiteral(1)), {"x": 2.0}) == 3
+    assert iru.partially_evaluate(ir.Add(x, c), {"x": 2.0}) is None
+    assert iru.partially_evaluate(ir.Mul(c, ir.Sub(x, x)), {"x": 2.0}) == 0
+    assert iru.partially_evaluate(ir.Ite(ir.Lt(x, ir.NumberLiteral(0)), c, x), {"x": 2.0}) == 2
+    assert iru.partially_evaluate(ir.And(ir.Lt(c, x), ir.Lt(x, x)), {"x": 2.0}) is False
@@ -0,0 +1,113 @@
+import importlib.util
+import pickle
+import sys
+
+import pytest
+
+from ..oracle_cache import CachedOracle, canonical_input, fingerprint
+from ..process_oracle import ProcessOracle
+from ..validator import Oracle, OracleInput
+from .test_validator import XPlus2Oracle
+
+
+class CountingOracle(Oracle):
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, input: OracleInput) -> float:
+        self.calls += 1
+        return input["x"] + 2
+
+
+def test_canonical_input():
+    assert canonical_input({"x": 1, "P": True}) == canonical_input({"P": True, "x": 1.0}) == "P=true x=1.0"
+    assert canonical_input({"x": 1.0}) != canonical_input({"x": True})
+
+
+def test_fingerprint():
+    assert fingerprint(XPlus2Oracle()) == fingerprint(XPlus2Oracle())
+    assert fingerprint(XPlus2Oracle()) != fingerprint(CountingOracle())
+
+
+def test_fingerprint_changes_with_the_source(tmp_path, monkeypatch):
+    path = tmp_path / "edited_oracle.py"
+
+    def load_oracle(body: str) -> Oracle:
+        path.write_text(f"from program_translation.validator import Oracle\n\nclass EditedOracle(Oracle):\n{body}")
+        spec = importlib.util.spec_from_file_location("edited_oracle", path)
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, "edited_oracle", module)
+        spec.loader.exec_module(module)
+        return module.EditedOracle()
+
+    before = fingerprint(load_oracle("    def run(self, input):\n        return input['x']\n"))
+    after = fingerprint(load_oracle("    def run(self, input):\n        return input['x'] + 1\n"))
+    assert before.split(":")[0] == after.split(":")[0] == "edited_oracle.EditedOracle"
+    assert before != after
+
+
+def test_fingerprint_changes_with_the_files_a_process_runs(tmp_path):
+    (tmp_path / "classes").mkdir()
+    compiled = tmp_path / "classes" / "Mystery.class"
+    on_classpath = ProcessOracle(["java", "-cp", "classes", "Mystery"], ["x"], cwd=str(tmp_path))
+    by_name = ProcessOracle(["java", "Mystery"], ["x"], cwd=str(tmp_path / "classes"))
+    compiled.write_bytes(b"before")
+    before = fingerprint(on_classpath), fingerprint(by_name)
+    compiled.write_bytes(b"after")
+    after = fingerprint(on_classpath), fingerprint(by_name)
+    assert before[0] != after[0] and before[1] != after[1]
+    # The same command line run somewhere else is a different oracle.
+    assert fingerprint(ProcessOracle(["java", "Mystery"], ["x"], cwd=str(tmp_path))) != after[1]
+
+
+def test_memoizes():
+    inner = CountingOracle()
+    oracle = CachedOracle(inner)
+    assert oracle.run({"x": 1.0}) == 3.0
+    assert oracle.run({"x": 1}) == 3.0
+    assert oracle.run_batch([{"x": 2.0}, {"x": 1.0}, {"x": 2.0}]) == [4.0, 3.0, 4.0]
+    assert inner.calls == 2
+    assert (oracle.hits, oracle.misses) == (3, 2)
+    assert oracle.hit_rate == pytest.approx(0.6)
+
+
+def test_evicts_least_recently_used():
+    inner = CountingOracle()
+    oracle = CachedOracle(inner, maxsize=2)
+    for x in [1.0, 2.0, 1.0, 3.0]:
+        oracle.run({"x": x})
+    assert inner.calls == 3
+    # 2 was evicted to make room for 3, but 1 was used more recently so it's still there.
+    oracle.run({"x": 1.0})
+    assert inner.calls == 3
+    oracle.run({"x": 2.0})
+    assert inner.calls == 4
+
+
+def test_persists(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    first = CachedOracle(CountingOracle(), path=path)
+    assert first.run_batch([{"x": 1.0}, {"x": 2.0}]) == [3.0, 4.0]
+    first.close()
+
+    inner = CountingOracle()
+    second = CachedOracle(inner, path=path)
+    assert second.run_batch([{"x": 2.0}, {"x": 5.0}, {"x": 1.0}]) == [4.0, 7.0, 3.0]
+    assert inner.calls == 1
+    assert (second.hits, second.disk_hits, second.misses) == (2, 2, 1)
+    # Other oracles don't see these answers.
+    other = CachedOracle(CountingOracle(), path=path, key="something else")
+    other.run({"x": 1.0})
+    assert other.misses == 1
+    second.close()
+    other.close()
+
+
+def test_pickling(tmp_path):
+    oracle = CachedOracle(CountingOracle(), path=str(tmp_path / "answers.sqlite"))
+    oracle.run({"x": 1.0})
+    copy = pickle.loads(pickle.dumps(oracle))
+    assert copy.run({"x": 1.0}) == 3.0
+    assert copy.oracle.calls == 1
+    oracle.close()
+    copy.close()
@@ -0,0 +1,41 @@
+import random
+
+from .. import intermediate_representation as ir
+from ..ir_utilities import evaluate
+from ..parallel import synthesize_in_parallel
+from ..validator import fill_holes
+from .test_validator import XPlus2Oracle
+
+
+def test_parallel_synthesis():
+    result = synthesize_in_parallel(
+        XPlus2Oracle(), input_numbers=["x"], constant_numbers=["c"], maximum_depth=3, workers=2, batch_size=2
+    )
+    assert result is not None
+    program, constants, example_bank = result
+    # Both of these have three nodes, but (+ x c) is enumerated first.
+    assert program == ir.Add(ir.NumberHole("x"), ir.NumberHole("c"))
+    assert constants == {"c": 2.0}
+    assert all(evaluate(fill_holes(program, {**inputs, **constants})) == output for inputs, output in example_bank)
+
+
+def test_parallel_synthesis_is_deterministic():
+    results = []
+    for _ in range(2):
+        random.seed(0)
+        results.append(
+            synthesize_in_parallel(
+                XPlus2Oracle(),
+                input_numbers=["x"],
+                constant_numbers=["c"],
+                successes_to_pass=1,
+                maximum_depth=3,
+                workers=2,
+                batch_size=1,
+            )
+        )
+    assert results[0] == results[1]
+    # With a single example to pass, a worker accepts `c`, but the example from the batch before it rules it out.
+    program, constants, example_bank = results[0]
+    assert program == ir.Add(ir.NumberHole("x"), ir.NumberHole("c"))
+    assert all(evaluate(fill_holes(program, {**inputs, **constants})) == output for inputs, output in example_bank)
@@ -0,0 +1,63 @@
+import os
+import pickle
+import sys
+
+import pytest
+
+from ..process_oracle import ProcessOracle, WorkerDied, format_value, parse_value
+
+STAND_IN = [sys.executable, os.path.join(os.path.dirname(__file__), "stand_in_oracle.py")]
+
+
+def make_oracle(**kwargs) -> ProcessOracle:
+    return ProcessOracle(STAND_IN, ["x", "y"], **kwargs)
+
+
+def test_values_round_trip():
+    for value in [True, False, 0.0, -12.5, 1e-300, float("inf")]:
+        assert parse_value(format_value(value)) == value
+    assert format_value(3) == "3.0"
+
+
+def test_run():
+    with make_oracle() as oracle:
+        assert oracle.run({"x": 1.0, "y": 2.0}) == -1.0
+        assert oracle.run({"x": 5.0, "y": 0.5}) == 1.5
+        # The same process answered both queries.
+        assert len(oracle._pool) == 1
+
+
+def test_run_batch_keeps_order():
+    inputs = [{"x": float(x), "y": float(2 * x)} for x in range(-20, 10)]
+    for workers in [1, 3]:
+        with make_oracle(workers=workers) as oracle:
+            assert oracle.run_batch(inputs) == [x + y - 4 for x, y in (tuple(input.values()) for input in inputs)]
+            assert oracle.run_batch([]) == []
+
+
+def test_crashes_are_retried_then_reported():
+    with make_oracle(workers=2, retries=2) as oracle:
+        with pytest.raises(WorkerDied):
+            oracle.run_batch([{"x": 1.0, "y": 1.0}, {"x": 13.0, "y": 0.0}, {"x": 2.0, "y": 1.0}])
+        # The crashed worker was replaced, so the oracle still works.
+        assert oracle.run_batch([{"x": 1.0, "y": 1.0}, {"x": 2.0, "y": 1.0}]) == [-2.0, -1.0]
+
+
+def test_timeouts_replace_the_worker():
+    with make_oracle(timeout=0.5) as oracle:
+        with pytest.raises(TimeoutError):
+            oracle.run_batch([{"x": 17.0, "y": 0.0}, {"x": 1.0, "y": 1.0}])
+        # The answer to the second query above isn't mistaken for the answer to this one.
+        assert oracle.run({"x": 3.0, "y": 3.0}) == 2.0
+
+
+def test_pickling_drops_the_workers():
+    oracle = make_oracle()
+    try:
+        oracle.run({"x": 0.0, "y": 0.0})
+        copy = pickle.loads(pickle.dumps(oracle))
+        assert copy._pool == []
+        assert copy.run({"x": 0.0, "y": 4.0}) == 0.0
+        copy.close()
+    finally:
+        oracle.close()
@@ -0,0 +1,46 @@
+import os
+
+import z3
+
+from .. import intermediate_representation as ir
+from .. import validator as v
+from ..query_log import QueryLog, query_paths, replay
+
+
+def test_record_and_replay(tmp_path):
+    log = QueryLog(str(tmp_path))
+    c = z3.Real("c")
+    candidate = ir.Mul(ir.NumberHole("c"), ir.NumberHole("c"))
+    log.record([c * c == 2], candidate, z3.sat, 0.5, strategy="nlsat", timeout=100)
+    log.record([c * c == -1], candidate, z3.unsat, 0.25)
+    assert QueryLog(str(tmp_path), minimum_seconds=1.0).record([c == 1], candidate, z3.sat, 0.5) is None
+
+    paths = query_paths(str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ["query_000000.smt2", "query_000001.smt2"]
+    with open(paths[0]) as f:
+        assert f.readline() == "; candidate: (* c c)\n"
+    replays = replay(paths)
+    assert [replayed.result for replayed in replays] == [z3.sat, z3.unsat]
+    assert [replayed.logged_result for replayed in replays] == ["sat", "unsat"]
+    assert [replayed.logged_seconds for replayed in replays] == [0.5, 0.25]
+    assert [replayed.strategy for replayed in replays] == ["nlsat", "default"]
+    assert [replayed.strategy for replayed in replay(paths, strategy="qf_nra")] == ["qf_nra", "qf_nra"]
+
+    # New queries are numbered after the ones already there.
+    assert QueryLog(str(tmp_path)).record([c == 1], candidate, z3.sat, 0.5).endswith("query_000002.smt2")
+
+
+class XPlus2Oracle(v.Oracle):
+    def run(self, input: v.OracleInput) -> float:
+        return input["x"] + 2
+
+
+def test_validator_logs_queries(tmp_path):
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"], query_log=QueryLog(str(tmp_path)))
+    val.example_bank = [({"x": 4}, 6), ({"x": 1}, 3)]
+    program = ir.Add(ir.NumberHole("x"), ir.NumberHole("c"))
+    assert val.satisfies_examples(program)
+    assert not val.satisfies_examples(ir.Mul(ir.NumberHole("x"), ir.NumberHole("c")))
+    replays = replay(query_paths(str(tmp_path)))
+    assert [replayed.result for replayed in replays] == [z3.sat, z3.unsat]
+    assert all(str(replayed.result) == replayed.logged_result for replayed in replays)
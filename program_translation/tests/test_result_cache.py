@@ -0,0 +1,43 @@
+from .. import intermediate_representation as ir
+from ..result_cache import ResultCache, SynthesisResult, revalidate, synthesis_key
+from ..synthesizer import synthesize
+from .test_validator import Always4Oracle, XPlus2Oracle
+
+x, c = ir.NumberHole("x"), ir.NumberHole("c")
+GRAMMAR = dict(input_booleans=[], constant_booleans=[], input_numbers=["x"], constant_numbers=["c"], maximum_depth=3)
+
+
+def test_keys():
+    key = synthesis_key(XPlus2Oracle(), **GRAMMAR)
+    assert key == synthesis_key(XPlus2Oracle(), **GRAMMAR)
+    assert key != synthesis_key(Always4Oracle(), **GRAMMAR)
+    assert key != synthesis_key(XPlus2Oracle(), **{**GRAMMAR, "maximum_depth": 4})
+
+
+def test_round_trip(tmp_path):
+    result = SynthesisResult(ir.Add(x, c), {"c": 2.0}, [({"x": 1.0}, 3.0), ({"x": -4.0}, -2.0)])
+    with ResultCache(str(tmp_path / "results.sqlite")) as cache:
+        assert cache.get("key") is None
+        cache.put("key", result)
+    with ResultCache(str(tmp_path / "results.sqlite")) as cache:
+        assert cache.get("key") == result
+        assert (cache.hits, cache.misses) == (1, 0)
+        cache.discard("key")
+        assert cache.get("key") is None
+
+
+def test_revalidate():
+    assert revalidate(XPlus2Oracle(), SynthesisResult(ir.Add(x, c), {"c": 2.0}, []), [], ["x"])
+    assert not revalidate(XPlus2Oracle(), SynthesisResult(ir.Add(x, c), {"c": 3.0}, []), [], ["x"])
+
+
+def test_synthesis_reuses_results(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite"))
+    key = synthesis_key(XPlus2Oracle(), **GRAMMAR)
+    # A wrong result is thrown away, and replaced with the one found by searching.
+    cache.put(key, SynthesisResult(ir.Sub(x, c), {"c": 2.0}, []))
+    assert synthesize(XPlus2Oracle(), **GRAMMAR, result_cache=cache) == ir.Add(x, ir.NumberLiteral(2.0))
+    assert cache.get(key).program == ir.Add(x, c)
+    assert synthesize(XPlus2Oracle(), **GRAMMAR, result_cache=cache) == ir.Add(x, ir.NumberLiteral(2.0))
+    assert cache.hits == 3
+    cache.close()
@@ -0,0 +1,57 @@
+import z3
+
+from .. import intermediate_representation as ir
+from .. import strategies as s
+from .. import validator as v
+from ..enumerator import enumerate_programs
+
+
+def test_constant_degree():
+    x, c, d = ir.NumberHole("x"), ir.NumberHole("c"), ir.NumberHole("d")
+    assert s.constant_degree(ir.Mul(x, x), ["x"]) == 0
+    assert s.constant_degree(ir.Add(ir.Mul(x, c), d), ["x"]) == 1
+    assert s.constant_degree(ir.Mul(c, ir.Add(x, d)), ["x"]) == 2
+    assert s.constant_degree(ir.Div(c, x), ["x"]) == 1
+    assert s.constant_degree(ir.Div(x, c), ["x"]) == 2
+
+
+def test_theory():
+    x, c = ir.NumberHole("x"), ir.NumberHole("c")
+    assert s.theory(ir.Add(x, c), ["x"]) == s.LINEAR
+    assert s.theory(ir.Mul(c, c), ["x"]) == s.NONLINEAR
+    assert s.theory(ir.Ite(ir.BooleanHole("P"), x, ir.Mul(x, x)), ["x"]) == s.PROPOSITIONAL
+
+
+def test_portfolio():
+    c = z3.Real("c")
+    portfolio = s.Portfolio()
+    try:
+        result, model, winner = portfolio.check([c * c == 2, c > 0], s.NONLINEAR)
+        assert result == z3.sat
+        assert winner in s.PORTFOLIOS[s.NONLINEAR]
+        assert abs(float(model.eval(c).approx(6).as_fraction()) - 2**0.5) < 1e-4
+        assert portfolio.wins == {(s.NONLINEAR, winner): 1}
+        result, model, winner = portfolio.check([c * c == -1], s.NONLINEAR)
+        assert result == z3.unsat and model is None
+    finally:
+        portfolio.close()
+
+
+class SquarePlusOneOracle(v.Oracle):
+    def run(self, input: v.OracleInput) -> float:
+        return input["x"] * input["x"] + 1
+
+
+def test_strategies_agree():
+    programs = list(enumerate_programs(ir.NumberExpression, 5, ["x", "c"]))
+    examples = [({"x": x}, x * x + 1) for x in (3, -2, 5)]
+    results = {}
+    for strategy in ("default", "theory", "portfolio"):
+        val = v.Validator(SquarePlusOneOracle(), input_numbers=["x"], solver_strategy=strategy)
+        val.example_bank.extend(examples)
+        results[strategy] = [val.satisfies_examples(program) for program in programs]
+        if val.portfolio is not None:
+            val.portfolio.close()
+    assert any(results["default"])
+    assert results["theory"] == results["default"]
+    assert results["portfolio"] == results["default"]
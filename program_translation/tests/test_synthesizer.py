@@ -0,0 +1,78 @@
+import random
+import time
+
+from ..ir_utilities import holes
+from ..oracles.XPlusYMinus2 import XPlusYMinus2Oracle
+from ..synthesizer import synthesize
+from ..validator import Oracle, OracleInput, SolverUnknown, Validator
+from .test_asynchronous import SlowXPlus2Oracle
+
+GRAMMAR = dict(input_numbers=["x", "y"], constant_numbers=["c"], maximum_depth=5)
+
+
+class IdentityOracle(Oracle):
+    def run(self, input: OracleInput) -> float:
+        return input["x"]
+
+
+def test_target_without_constants(capsys):
+    random.seed(0)
+    program = synthesize(IdentityOracle(), input_numbers=["x"], maximum_depth=3)
+    assert str(program) == "x"
+    assert "accepting x with constants {}" in capsys.readouterr().out
+
+
+def test_asynchronous_oracle(capsys):
+    random.seed(0)
+    oracle = SlowXPlus2Oracle()
+    program = synthesize(oracle, input_numbers=["x"], constant_numbers=["c"], maximum_depth=3, concurrent_queries=4)
+    assert str(program) == "(+ x 2.0)"
+    assert "accepting (+ x c) with constants {'c': 2.0}" in capsys.readouterr().out
+
+
+def test_compact_frontier(tmp_path):
+    random.seed(0)
+    expected = synthesize(XPlusYMinus2Oracle(), **GRAMMAR)
+    random.seed(0)
+    program = synthesize(XPlusYMinus2Oracle(), **GRAMMAR, compact=True, frontier_size=8, spill_directory=str(tmp_path))
+    # Programs of the same size come out in a different order, so another one of them could be found.
+    assert program is not None and len(str(program)) == len(str(expected))
+    # The spilled runs are cleaned up.
+    assert list(tmp_path.iterdir()) == []
+
+
+class SlowOracle(XPlusYMinus2Oracle):
+    def run(self, input: OracleInput) -> float:
+        time.sleep(0.05)
+        return super().run(input)
+
+
+def test_time_budget_gives_the_best_program_so_far(capsys):
+    random.seed(0)
+    program = synthesize(SlowOracle(), **GRAMMAR, time_budget=0.3)
+    output = capsys.readouterr().out
+    assert "out of time" in output
+    # Its constants are filled in.
+    assert program is not None
+    assert {hole._name for hole in holes(program)} <= {"x", "y"}
+
+
+def test_undecided_programs_are_retried(monkeypatch, capsys):
+    random.seed(0)
+    expected = synthesize(XPlusYMinus2Oracle(), **GRAMMAR)
+
+    satisfies_examples = Validator.satisfies_examples
+
+    # The solver can't decide about anything that gets past the first few examples until its timeout goes up.
+    def undecided_at_first(self, program):
+        if self.solver_timeout == 10 and len(self.example_bank) > 3:
+            raise SolverUnknown(program)
+        return satisfies_examples(self, program)
+
+    monkeypatch.setattr(Validator, "satisfies_examples", undecided_at_first)
+    capsys.readouterr()
+    random.seed(0)
+    assert synthesize(XPlusYMinus2Oracle(), **GRAMMAR, solver_timeout=10) == expected
+    output = capsys.readouterr().out
+    assert "putting" in output
+    assert "with a solver timeout of 40ms" in output
@@ -1,3 +1,5 @@
+import random
+
 import pytest
 
 from .. import intermediate_representation as ir
@@ -51,3 +53,176 @@ def test_harder_validation():
     val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
     program = ir.Add(ir.NumberHole("x"), ir.NumberHole("y"))
     assert val.validate_program(program)
+
+
+def test_validation_checks_once_per_new_example():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"], successes_to_pass=5)
+    program = ir.Add(ir.NumberHole("x"), ir.NumberHole("y"))
+    assert val.validate_program(program)
+    # There's nothing to check before the first example is added.
+    assert val.solver_calls == 5
+    assert val.solver_time > 0
+    assert len(val.example_bank) == 5
+    assert val.satisfied_examples == 5
+
+
+def test_incremental_satisfaction_rejects_on_new_example():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": 4}, 6)]
+    program = ir.Mul(ir.NumberHole("x"), ir.NumberHole("y"))
+    assert val.satisfies_examples(program)
+    val.example_bank.append(({"x": 2}, 4))
+    assert not val.satisfies_examples(program)
+
+
+def test_programs_without_constants_are_decided_without_the_solver():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": 4}, 6), ({"x": 2}, 4)]
+    assert not val.satisfies_examples(ir.Add(ir.NumberHole("x"), ir.NumberHole("x")))
+    assert not val.satisfies_examples(ir.Mul(ir.NumberHole("x"), ir.NumberHole("x")))
+    assert val.solver_calls == 0
+
+
+def test_constants_that_do_not_matter_are_decided_without_the_solver():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": -1}, 1), ({"x": 5}, 7)]
+    x, c = ir.NumberHole("x"), ir.NumberHole("c")
+    program = ir.Ite(ir.Lt(x, ir.NumberLiteral(0)), ir.Add(x, c), x)
+    assert not val.satisfies_examples(program)
+    assert val.solver_calls == 0
+    assert val.concrete_rejections == 1
+
+
+class BatchCountingOracle(XPlus2Oracle):
+    def __init__(self):
+        self.batches = []
+
+    def run_batch(self, inputs):
+        self.batches.append(len(inputs))
+        return super().run_batch(inputs)
+
+
+@pytest.mark.parametrize("prefetch", (False, True))
+def test_batched_validation(prefetch):
+    oracle = BatchCountingOracle()
+    val = v.Validator(oracle, input_numbers=["x"], successes_to_pass=9, batch_size=5, prefetch=prefetch)
+    assert val.validate_program(ir.Add(ir.NumberHole("x"), ir.NumberHole("y")))
+    assert len(val.example_bank) == 10
+    assert val.oracle_calls == 2
+    assert oracle.batches[:2] == [5, 5]
+    # Every example that was fetched has been checked.
+    assert val.satisfied_examples == 10
+    val.close()
+
+
+@pytest.mark.parametrize("prefetch", (False, True))
+def test_the_last_batch_is_checked(prefetch):
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"], successes_to_pass=3, batch_size=8, prefetch=prefetch)
+    assert not val.validate_program(ir.Mul(ir.NumberHole("x"), ir.NumberHole("c")))
+    val.close()
+
+
+def test_prefetching_asks_about_the_same_inputs():
+    banks = []
+    for prefetch in (False, True):
+        random.seed(0)
+        oracle = BatchCountingOracle()
+        val = v.Validator(oracle, input_numbers=["x"], successes_to_pass=9, batch_size=5, prefetch=prefetch)
+        assert val.validate_program(ir.Add(ir.NumberHole("x"), ir.NumberHole("y")))
+        val.close()
+        banks.append(val.example_bank)
+        # The batch being prefetched when the program was accepted is cancelled, or dropped if it had already started.
+        assert len(oracle.batches) in ((2, 3) if prefetch else (2,))
+        assert val._executor is None and val._prefetched is None
+    assert banks[0] == banks[1]
+
+
+class ZeroIsSpecialOracle(v.Oracle):
+    def run(self, input: v.OracleInput) -> float:
+        return 45 if input["x"] == 0 else input["x"]
+
+
+def test_distinguishing_input():
+    val = v.Validator(ZeroIsSpecialOracle(), input_numbers=["x"])
+    x = ir.NumberHole("x")
+    zero = ir.NumberLiteral(0)
+    zero_is_special = ir.Ite(ir.Lt(x, zero), x, ir.Ite(ir.Lt(zero, x), x, ir.NumberLiteral(45)))
+    assert val.distinguishing_input(x, {}, zero_is_special) == {"x": 0.0}
+    assert val.distinguishing_input(x, {}, ir.Add(x, ir.NumberLiteral(0))) is None
+    # Once an example rules out the alternative, it isn't worth distinguishing from any more.
+    val.example_bank = [({"x": 0.0}, 45)]
+    assert val.distinguishing_input(zero_is_special, {}, x) is None
+
+
+def test_distinguishing_input_for_other_constants():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    program = ir.Mul(ir.NumberHole("x"), ir.NumberHole("c"))
+    val.example_bank = [({"x": 2.0}, 5.0)]
+    assert val.distinguishing_input(program, {"c": 2.5}, program) is None
+    # Before there are any examples, any other value of c gives a different program.
+    val.example_bank = []
+    assert val.distinguishing_input(program, {"c": 2.5}, program) is not None
+
+
+def test_distinguishing_validation_finds_edge_cases():
+    x = ir.NumberHole("x")
+    val = v.Validator(ZeroIsSpecialOracle(), input_numbers=["x"], distinguishing=True)
+    assert not val.validate_program(x, [ir.Ite(ir.Lt(ir.NumberLiteral(0), x), x, ir.Sub(x, ir.NumberLiteral(-45)))])
+    assert val.distinguishing_examples == 1
+    assert ({"x": 0.0}, 45) in val.example_bank
+
+
+def test_distinguishing_validation_needs_few_examples():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"], distinguishing=True, confirmations=2)
+    assert val.validate_program(ir.Add(ir.NumberHole("x"), ir.NumberHole("c")), [ir.NumberHole("x")])
+    assert val.constants() == {"c": 2.0}
+    assert val.oracle_calls < 5
+
+
+def test_undecided_checks(monkeypatch):
+    program = ir.Mul(ir.NumberHole("x"), ir.NumberHole("c"))
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": 2.0}, 4.0)]
+    monkeypatch.setattr(val._solver, "check", lambda: v.z3.unknown)
+    # Without a timeout, a program the solver can't decide about is rejected.
+    assert not val.satisfies_examples(program)
+    val.solver_timeout = 10
+    with pytest.raises(v.SolverUnknown):
+        val.satisfies_examples(program)
+    assert val.unknown_results == 2
+
+
+def test_satisfied_examples():
+    program = ir.Mul(ir.NumberHole("x"), ir.NumberHole("c"))
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": 2.0}, 4.0)]
+    assert val.satisfies_examples(program)
+    val.example_bank.append(({"x": 4.0}, 6.0))
+    assert not val.satisfies_examples(program)
+    assert val.satisfied_examples == 1
+    assert val.satisfying_constants() == {"c": 2.0}
+
+
+def test_examples_satisfied_individually():
+    x, c = ir.NumberHole("x"), ir.NumberHole("c")
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"])
+    val.example_bank = [({"x": 1.0}, 3.0), ({"x": -3.0}, -1.0), ({"x": 4.0}, 6.0)]
+    assert not val.satisfies_examples(x)
+    assert val.examples_satisfied_individually(x) == ([], {})
+    # It's the first example that's wrong, but the others are right.
+    assert val.examples_satisfied_individually(ir.Add(x, ir.NumberLiteral(2))) == (val.example_bank, {})
+    program = ir.Add(x, c)
+    val.example_bank = [({"x": 1.0}, 3.0)]
+    assert val.satisfies_examples(program)
+    val.example_bank += [({"x": 2.0}, 5.0), ({"x": 4.0}, 6.0)]
+    assert not val.satisfies_examples(program)
+    satisfied, constants = val.examples_satisfied_individually(program)
+    assert satisfied == [({"x": 1.0}, 3.0), ({"x": 4.0}, 6.0)]
+    assert constants == {"c": 2.0}
+
+
+def test_deadline():
+    val = v.Validator(XPlus2Oracle(), input_numbers=["x"], deadline=v.time.monotonic() - 1)
+    val.example_bank = [({"x": 2.0}, 4.0)]
+    with pytest.raises(v.BudgetExhausted):
+        val.satisfies_examples(ir.Mul(ir.NumberHole("x"), ir.NumberHole("c")))
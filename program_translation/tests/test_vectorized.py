@@ -0,0 +1,42 @@
+import pytest
+
+from .. import intermediate_representation as ir
+from ..ir_utilities import evaluate
+from ..validator import fill_holes
+
+np = pytest.importorskip("numpy")
+vectorized = pytest.importorskip("program_translation.vectorized")
+
+x, y, p = ir.NumberHole("x"), ir.NumberHole("y"), ir.BooleanHole("P")
+EXAMPLES = [
+    ({"x": 1.0, "y": 2.0, "P": True}, 0.0),
+    ({"x": -4.0, "y": 0.5, "P": False}, 0.0),
+    ({"x": 3.0, "y": 3.0, "P": True}, 0.0),
+]
+
+
+@pytest.mark.parametrize(
+    "expr",
+    (
+        ir.Add(x, ir.Mul(y, ir.NumberLiteral(3))),
+        ir.Ite(ir.Lt(x, y), ir.Sub(y, x), x),
+        ir.Ite(ir.Xor(p, ir.Lt(x, ir.NumberLiteral(0))), x, y),
+        ir.Impl(p, ir.Or(ir.Not(p), ir.And(p, ir.Lt(y, x)))),
+        ir.NumberLiteral(7),
+    ),
+)
+def test_batch_evaluation_matches_evaluate(expr):
+    columns, _ = vectorized.example_matrix(EXAMPLES, numbers=["x", "y"], booleans=["P"])
+    expected = [evaluate(fill_holes(expr, inputs)) for inputs, _ in EXAMPLES]
+    assert list(vectorized.evaluate_batch(expr, columns)) == expected
+
+
+def test_division_by_zero_follows_ieee():
+    columns = {"x": np.array([1.0, -1.0, 0.0]), "y": np.zeros(3)}
+    result = vectorized.evaluate_batch(ir.Div(x, y), columns)
+    assert result[0] == np.inf and result[1] == -np.inf and np.isnan(result[2])
+
+
+def test_matches():
+    columns, outputs = vectorized.example_matrix([({"x": 1.0}, 2.0), ({"x": 2.0}, 5.0)], numbers=["x"])
+    assert list(vectorized.matches(ir.Add(x, ir.NumberLiteral(1)), columns, outputs)) == [True, False]
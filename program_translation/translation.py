@@ -3,31 +3,34 @@ from typing import List
 from . import intermediate_representation as ir
 
 
+_C_TRANSLATOR = ir.make_visitor(
+    "CTranslator",
+    {
+        ir.BooleanLiteral: lambda _, expr: "true" if expr._value else "false",
+        ir.BooleanHole: lambda _, expr: expr._name,
+        ir.NumberLiteral: lambda _, expr: f"{expr._value}",
+        ir.NumberHole: lambda _, expr: expr._name,
+        ir.Not: lambda self, expr: f"(!{self.visit(expr._0)})",
+        ir.And: lambda self, expr: f"({self.visit(expr._0)} && {self.visit(expr._1)})",
+        ir.Or: lambda self, expr: f"({self.visit(expr._0)} || {self.visit(expr._1)})",
+        ir.Xor: lambda self, expr: f"({self.visit(expr._0)} == {self.visit(expr._1)})",
+        ir.Impl: lambda self, expr: f"!({self.visit(expr._0)} || {self.visit(expr._1)})",
+        ir.Add: lambda self, expr: f"({self.visit(expr._0)} + {self.visit(expr._1)})",
+        ir.Sub: lambda self, expr: f"({self.visit(expr._0)} - {self.visit(expr._1)})",
+        ir.Mul: lambda self, expr: f"({self.visit(expr._0)} * {self.visit(expr._1)})",
+        ir.Div: lambda self, expr: f"({self.visit(expr._0)} / {self.visit(expr._1)})",
+        ir.Ite: lambda self, expr: f"({self.visit(expr._0)} ? {self.visit(expr._1)} : {self.visit(expr._2)})",
+        ir.Lt: lambda self, expr: f"({self.visit(expr._0)} < {self.visit(expr._1)})",
+    },
+)()
+
+
 def to_c(
     program: ir.Expression,
     number_inputs: List[str] = [],
     boolean_inputs: List[str] = [],
 ) -> str:
-    expr: str = ir.make_visitor(
-        "CTranslator",
-        {
-            ir.BooleanLiteral: lambda _, expr: "true" if expr._value else "false",
-            ir.BooleanHole: lambda _, expr: expr._name,
-            ir.NumberLiteral: lambda _, expr: f"{expr._value}",
-            ir.NumberHole: lambda _, expr: expr._name,
-            ir.Not: lambda self, expr: f"(!{self.visit(expr._0)})",
-            ir.And: lambda self, expr: f"({self.visit(expr._0)} && {self.visit(expr._1)})",
-            ir.Or: lambda self, expr: f"({self.visit(expr._0)} || {self.visit(expr._1)})",
-            ir.Xor: lambda self, expr: f"({self.visit(expr._0)} == {self.visit(expr._1)})",
-            ir.Impl: lambda self, expr: f"!({self.visit(expr._0)} || {self.visit(expr._1)})",
-            ir.Add: lambda self, expr: f"({self.visit(expr._0)} + {self.visit(expr._1)})",
-            ir.Sub: lambda self, expr: f"({self.visit(expr._0)} - {self.visit(expr._1)})",
-            ir.Mul: lambda self, expr: f"({self.visit(expr._0)} * {self.visit(expr._1)})",
-            ir.Div: lambda self, expr: f"({self.visit(expr._0)} / {self.visit(expr._1)})",
-            ir.Ite: lambda self, expr: f"({self.visit(expr._0)} ? {self.visit(expr._1)} : {self.visit(expr._2)})",
-            ir.Lt: lambda self, expr: f"({self.visit(expr._0)} < {self.visit(expr._1)})",
-        },
-    )().visit(program)
+    expr: str = _C_TRANSLATOR.visit(program)
 
     if issubclass(type(program), ir.BooleanExpression):
         out_type = "bool"
@@ -49,31 +52,34 @@ def to_c(
 """
 
 
+_PYTHON_TRANSLATOR = ir.make_visitor(
+    "PythonTranslator",
+    {
+        ir.BooleanLiteral: lambda _, expr: "True" if expr._value else "False",
+        ir.BooleanHole: lambda _, expr: expr._name,
+        ir.NumberLiteral: lambda _, expr: f"{expr._value}",
+        ir.NumberHole: lambda _, expr: expr._name,
+        ir.Not: lambda self, expr: f"(not {self.visit(expr._0)})",
+        ir.And: lambda self, expr: f"({self.visit(expr._0)} and {self.visit(expr._1)})",
+        ir.Or: lambda self, expr: f"({self.visit(expr._0)} or {self.visit(expr._1)})",
+        ir.Xor: lambda self, expr: f"({self.visit(expr._0)} == {self.visit(expr._1)})",
+        ir.Impl: lambda self, expr: f"(not {self.visit(expr._0)} or {self.visit(expr._1)})",
+        ir.Add: lambda self, expr: f"({self.visit(expr._0)} + {self.visit(expr._1)})",
+        ir.Sub: lambda self, expr: f"({self.visit(expr._0)} - {self.visit(expr._1)})",
+        ir.Mul: lambda self, expr: f"({self.visit(expr._0)} * {self.visit(expr._1)})",
+        ir.Div: lambda self, expr: f"({self.visit(expr._0)} / {self.visit(expr._1)})",
+        ir.Ite: lambda self, expr: f"({self.visit(expr._1)} if {self.visit(expr._0)} else {self.visit(expr._2)})",
+        ir.Lt: lambda self, expr: f"({self.visit(expr._0)} < {self.visit(expr._1)})",
+    },
+)()
+
+
 def to_python(
     program: ir.Expression,
     number_inputs: List[str] = [],
     boolean_inputs: List[str] = [],
 ) -> str:
-    expr: str = ir.make_visitor(
-        "CTranslator",
-        {
-            ir.BooleanLiteral: lambda _, expr: "True" if expr._value else "False",
-            ir.BooleanHole: lambda _, expr: expr._name,
-            ir.NumberLiteral: lambda _, expr: f"{expr._value}",
-            ir.NumberHole: lambda _, expr: expr._name,
-            ir.Not: lambda self, expr: f"(not {self.visit(expr._0)})",
-            ir.And: lambda self, expr: f"({self.visit(expr._0)} and {self.visit(expr._1)})",
-            ir.Or: lambda self, expr: f"({self.visit(expr._0)} or {self.visit(expr._1)})",
-            ir.Xor: lambda self, expr: f"({self.visit(expr._0)} == {self.visit(expr._1)})",
-            ir.Impl: lambda self, expr: f"(not {self.visit(expr._0)} or {self.visit(expr._1)})",
-            ir.Add: lambda self, expr: f"({self.visit(expr._0)} + {self.visit(expr._1)})",
-            ir.Sub: lambda self, expr: f"({self.visit(expr._0)} - {self.visit(expr._1)})",
-            ir.Mul: lambda self, expr: f"({self.visit(expr._0)} * {self.visit(expr._1)})",
-            ir.Div: lambda self, expr: f"({self.visit(expr._0)} / {self.visit(expr._1)})",
-            ir.Ite: lambda self, expr: f"({self.visit(expr._1)} if {self.visit(expr._0)} else {self.visit(expr._2)})",
-            ir.Lt: lambda self, expr: f"({self.visit(expr._0)} < {self.visit(expr._1)})",
-        },
-    )().visit(program)
+    expr: str = _PYTHON_TRANSLATOR.visit(program)
 
     if issubclass(type(program), ir.BooleanExpression):
         out_type = "bool"
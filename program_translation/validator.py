@@ -1,26 +1,35 @@
 import abc
 import random
-from itertools import count
-from typing import Dict, Iterable, List, Mapping, Tuple, Union
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
 import z3
 
 from . import intermediate_representation as ir
 from . import ir_utilities as iru
+from .compilation import CompiledProgram, compile_program
+from .instrumentation import Metrics
+from .query_log import QueryLog
+from .strategies import PORTFOLIOS, PREFERRED, Portfolio, make_solver, theory
 
 OracleInput = Mapping[str, Union[bool, float]]
 
 
 def get_new_inputs(
-    booleans: Iterable[str], numbers: Iterable[str], num_lo=-1e7, num_hi=1e7
+    booleans: Iterable[str], numbers: Iterable[str], num_lo=-1e7, num_hi=1e7, rng: Optional[random.Random] = None
 ) -> OracleInput:
+    """
+    Random inputs, drawn from `rng` if it's given and from the `random` module's global state otherwise.
+    """
     if num_lo >= num_hi:
         raise ValueError(f"num_low={num_lo} must be less than num_hi={num_hi}")
+    generator = random if rng is None else rng
     inputs: Dict[str, Union[bool, float]] = {}
     for boolean in booleans:
-        inputs[boolean] = random.choice([True, False])
+        inputs[boolean] = generator.choice([True, False])
     for number in numbers:
-        inputs[number] = float(random.randint(num_lo, num_hi))
+        inputs[number] = float(generator.randint(num_lo, num_hi))
     return inputs
 
 
@@ -29,28 +38,31 @@ class Oracle(abc.ABC):
     def run(self, input: OracleInput) -> Union[bool, float]:
         pass
 
+    def run_batch(self, inputs: Sequence[OracleInput]) -> List[Union[bool, float]]:
+        """
+        Runs the oracle on each of `inputs`. Oracles that can answer several queries at once more cheaply than one at a
+        time (e.g. because each call has to talk to another process) should override this.
+        """
+        return [self.run(input) for input in inputs]
+
 
 def fill_hole(
     program: ir.Expression, name: str, value: Union[bool, float]
 ) -> ir.Expression:
-    def do_filling(expression: ir.Expression):
-        for i in count(start=0):
-            try:
-                child = expression.__dict__[f"_{i}"]
-                if type(child) is ir.BooleanHole:
-                    if child._name == name:
-                        expression.__dict__[f"_{i}"] = ir.BooleanLiteral(value)
-                elif type(child) is ir.NumberHole:
-                    if child._name == name:
-                        expression.__dict__[f"_{i}"] = ir.NumberLiteral(value)
-                else:
-                    do_filling(child)
-            except (AttributeError, KeyError):
-                break
-        return expression
+    def do_filling(expression: ir.Expression) -> ir.Expression:
+        expression_type = type(expression)
+        if expression_type is ir.BooleanHole:
+            return ir.BooleanLiteral(value) if expression._name == name else expression  # type: ignore
+        elif expression_type is ir.NumberHole:
+            return ir.NumberLiteral(value) if expression._name == name else expression  # type: ignore
+        elif not expression._children:
+            return expression
+        children = tuple(do_filling(child) for child in expression._children)
+        if all(new is old for new, old in zip(children, expression._children)):
+            return expression
+        return expression_type(*children)
 
-    copy = iru.deep_copy(program)
-    return do_filling(copy)
+    return do_filling(program)
 
 
 def fill_holes(program: ir.Expression, inputs: OracleInput) -> ir.Expression:
@@ -59,32 +71,50 @@ def fill_holes(program: ir.Expression, inputs: OracleInput) -> ir.Expression:
     return program
 
 
+_TO_Z3 = ir.make_visitor(
+    "ToZ3",
+    {
+        ir.BooleanHole: lambda _, expr: z3.Bool(expr._name),
+        ir.BooleanLiteral: lambda _, expr: expr._value,
+        ir.NumberHole: lambda _, expr: z3.Real(expr._name),
+        ir.NumberLiteral: lambda _, expr: expr._value,
+        ir.Not: lambda self, expr: z3.Not(self.visit(expr._0)),
+        ir.And: lambda self, expr: z3.And(self.visit(expr._0), self.visit(expr._1)),
+        ir.Or: lambda self, expr: z3.Or(self.visit(expr._0), self.visit(expr._1)),
+        ir.Xor: lambda self, expr: z3.Xor(self.visit(expr._0), self.visit(expr._1)),
+        ir.Impl: lambda self, expr: z3.Implies(self.visit(expr._0), self.visit(expr._1)),
+        ir.Add: lambda self, expr: self.visit(expr._0) + self.visit(expr._1),
+        ir.Sub: lambda self, expr: self.visit(expr._0) - self.visit(expr._1),
+        ir.Mul: lambda self, expr: self.visit(expr._0) * self.visit(expr._1),
+        ir.Div: lambda self, expr: self.visit(expr._0) / self.visit(expr._1),
+        ir.Ite: lambda self, expr: z3.If(self.visit(expr._0), self.visit(expr._1), self.visit(expr._2)),
+        ir.Lt: lambda self, expr: self.visit(expr._0) < self.visit(expr._1),
+    },
+)()
+
+
 def to_z3(expression: ir.Expression) -> z3.ExprRef:
-    v = ir.make_visitor(
-        "ToZ3",
-        {
-            ir.BooleanHole: lambda _, expr: z3.Bool(expr._name),
-            ir.BooleanLiteral: lambda _, expr: expr._value,
-            ir.NumberHole: lambda _, expr: z3.Real(expr._name),
-            ir.NumberLiteral: lambda _, expr: expr._value,
-            ir.Not: lambda self, expr: z3.Not(self.visit(expr._0)),
-            ir.And: lambda self, expr: z3.And(self.visit(expr._0), self.visit(expr._1)),
-            ir.Or: lambda self, expr: z3.Or(self.visit(expr._0), self.visit(expr._1)),
-            ir.Xor: lambda self, expr: z3.Xor(self.visit(expr._0), self.visit(expr._1)),
-            ir.Impl: lambda self, expr: z3.Implies(
-                self.visit(expr._0), self.visit(expr._1)
-            ),
-            ir.Add: lambda self, expr: self.visit(expr._0) + self.visit(expr._1),
-            ir.Sub: lambda self, expr: self.visit(expr._0) - self.visit(expr._1),
-            ir.Mul: lambda self, expr: self.visit(expr._0) * self.visit(expr._1),
-            ir.Div: lambda self, expr: self.visit(expr._0) / self.visit(expr._1),
-            ir.Ite: lambda self, expr: z3.If(
-                self.visit(expr._0), self.visit(expr._1), self.visit(expr._2)
-            ),
-            ir.Lt: lambda self, expr: self.visit(expr._0) < self.visit(expr._1),
-        },
-    )()
-    return v.visit(expression)
+    return _TO_Z3.visit(expression)
+
+
+def z3_literal_to_python_literal(z3lit):
+    if type(z3lit) is z3.z3.BoolRef:
+        return bool(z3lit)
+    elif type(z3lit) is z3.z3.RatNumRef:
+        return float(z3lit.as_decimal(prec=5))
+
+
+class SolverUnknown(Exception):
+    """
+    Raised when the solver couldn't decide whether a program satisfies the examples within the validator's
+    `solver_timeout`.
+    """
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised when the validator's `deadline` has passed.
+    """
 
 
 class Validator:
@@ -94,41 +124,512 @@ class Validator:
         input_numbers: List[str] = [],
         input_booleans: List[str] = [],
         successes_to_pass: int = 20,
+        batch_size: int = 1,
+        prefetch: bool = False,
+        distinguishing: bool = False,
+        confirmations: int = 2,
+        distinguishing_timeout: int = 1000,
+        metrics: Optional[Metrics] = None,
+        solver_timeout: Optional[int] = None,
+        deadline: Optional[float] = None,
+        solver_strategy: str = "default",
+        query_log: Optional[QueryLog] = None,
+        rng: Optional[random.Random] = None,
     ):
+        """
+        New examples are requested from the oracle `batch_size` at a time. If `prefetch` is True, the next batch is
+        requested in the background as soon as the last one has arrived, so that the oracle can work on it while the
+        solver is busy.
+
+        If `distinguishing` is True, programs are validated counterexample-guided style instead (see
+        `validate_program_distinguishing`). Then `confirmations` is the number of random examples a program needs to
+        pass once no input can be found to tell it apart from the alternatives, and `distinguishing_timeout` is how
+        long (in milliseconds) the solver gets to look for each distinguishing input.
+
+        If `metrics` is given, the time spent checking examples, translating them to Z3, in the solver and waiting for
+        the oracle is added to it, along with counts of rejections and queries (see `instrumentation`).
+
+        If `solver_timeout` is given, each check the solver makes for `satisfies_examples` gets that many milliseconds,
+        and `SolverUnknown` is raised if it can't decide in time. If `deadline` (a time from `time.monotonic`) is
+        given, no check runs past it, and `BudgetExhausted` is raised once it has passed.
+
+        `solver_strategy` is how the solver checks candidates (see `strategies`): "default" uses Z3's default solver for
+        everything, "theory" uses the solver tuned for the theory each candidate's constraints are in, and "portfolio"
+        does the same, except that it races several strategies for the theories that have a portfolio.
+
+        If `query_log` is given, the solver's checks for `satisfies_examples` are written to it as SMT-LIB 2.
+
+        If `rng` is given, new inputs are drawn from it rather than from the `random` module's global state.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size={batch_size} must be at least 1")
+        if solver_strategy not in ("default", "theory", "portfolio"):
+            raise ValueError(f"unknown solver strategy {solver_strategy}")
         self.oracle = oracle
         self.input_numbers = input_numbers
         self.input_booleans = input_booleans
         self.successes_to_pass = successes_to_pass
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.distinguishing = distinguishing
+        self.confirmations = confirmations
+        self.distinguishing_timeout = distinguishing_timeout
+        self.metrics = metrics
+        self.solver_timeout = solver_timeout
+        self.deadline = deadline
+        self.solver_strategy = solver_strategy
+        self.query_log = query_log
+        self.rng = rng
         self.example_bank: List[Tuple[OracleInput, Union[bool, float]]] = []
         self.constraints = []
+        # The solver's model from the last time a program satisfied the examples with the solver's help. It's None if
+        # no program has needed the solver yet.
+        self.model: Optional[z3.ModelRef] = None
+
+        # The number of batches of inputs that have been sent to the oracle.
+        self.oracle_calls = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # The inputs in the batch that's being asked about in the background, and the oracle's answers along with how
+        # long it took to give them.
+        self._prefetched: Optional[Tuple[List[OracleInput], "Future[Tuple[List[Union[bool, float]], float]]"]] = None
+
+        # The number of times the solver has been asked to check constraints, and how long that took in total.
+        self.solver_calls = 0
+        self.solver_time = 0.0
+        # The number of times a program was rejected by evaluating it on an example, without using the solver.
+        self.concrete_rejections = 0
+        # The number of examples whose inputs were chosen to tell the candidate apart from an alternative.
+        self.distinguishing_examples = 0
+        # The number of times the solver couldn't decide whether a program satisfies the examples.
+        self.unknown_results = 0
+
+        # A solver is kept for the program that was checked last, so that when the same program is checked again after
+        # more examples have been added to the bank, only the constraints for the new examples need to be added. The
+        # solver itself is shared between candidates: each one's constraints are pushed in a scope of their own, which is
+        # much cheaper than making a new solver.
+        self._candidate: Optional[ir.Expression] = None
+        self._candidate_z3: Optional[Union[z3.ExprRef, bool, float]] = None
+        self._candidate_variables: List[Tuple[str, Callable[[Union[bool, float]], z3.ExprRef], z3.ExprRef]] = []
+        self._candidate_holes: List[Union[ir.BooleanHole, ir.NumberHole]] = []
+        self._candidate_is_ground = False
+        self._candidate_function: Optional[CompiledProgram] = None
+        self._solver = z3.Solver()
+        self._solver.push()
+        # With the "theory" strategy, a solver like that is kept for each theory.
+        self._solvers: Dict[str, z3.Solver] = {}
+        self._candidate_theory: Optional[str] = None
+        self.portfolio: Optional[Portfolio] = Portfolio() if solver_strategy == "portfolio" else None
+        self._solved_examples = 0
+        self._solver_constraints = 0
+        # How many of the examples at the start of the bank the current candidate was last found to satisfy, and the
+        # model it satisfied them with (if it took the solver).
+        self.satisfied_examples = 0
+        self._satisfying_model: Optional[z3.ModelRef] = None
+
+    def start_candidate(self, program: ir.Expression) -> None:
+        self._candidate = program
+        self._candidate_holes = sorted(iru.holes(program), key=lambda hole: hole._name)
+        inputs = set(self.input_numbers).union(self.input_booleans)
+        self._candidate_is_ground = all(hole._name in inputs for hole in self._candidate_holes)
+        # A program that only has holes for inputs can be run directly, so it's compiled to make that fast.
+        self._candidate_function = (
+            compile_program(program, [hole._name for hole in self._candidate_holes])
+            if self._candidate_is_ground
+            else None
+        )
+        # This is only translated when an example actually needs Z3 (see `candidate_z3`).
+        self._candidate_z3 = None
+        if self.solver_strategy != "default":
+            self._candidate_theory = theory(program, inputs)
+            self._solver = self._theory_solver(self._candidate_theory)
+        self._solver.pop()
+        self._solver.push()
+        self._solved_examples = 0
+        self._solver_constraints = 0
+        self.satisfied_examples = 0
+        self._satisfying_model = None
+
+    def _theory_solver(self, candidate_theory: str) -> z3.Solver:
+        solver = self._solvers.get(candidate_theory)
+        if solver is None:
+            solver = self._solvers[candidate_theory] = make_solver(PREFERRED[candidate_theory])
+            solver.push()
+        return solver
+
+    def candidate_z3(self) -> Union[z3.ExprRef, bool, float]:
+        """
+        Translates the current candidate to Z3 once, leaving its holes as Z3 variables. The constraint for each example
+        is then made by substituting the example's inputs into that term, rather than by translating the program again.
+        """
+        if self._candidate_z3 is None:
+            program: ir.Expression = self._candidate  # type: ignore
+            self._candidate_z3 = to_z3(program)
+            self._candidate_variables = [
+                (hole._name, z3.BoolVal if type(hole) is ir.BooleanHole else z3.RealVal, to_z3(hole))
+                for hole in self._candidate_holes
+            ]
+        return self._candidate_z3
+
+    def concrete_check(self, inputs: OracleInput, output: Union[bool, float]) -> Optional[bool]:
+        """
+        Evaluates the current candidate on `inputs`. If its output doesn't depend on the values of the constants (e.g.
+        it has no constants at all), returns whether it matches `output`. Otherwise returns None.
+        """
+        if self._candidate_function is not None:
+            try:
+                value = self._candidate_function(*[inputs[hole._name] for hole in self._candidate_holes])
+            except ZeroDivisionError:
+                # Z3 treats division by zero differently, so leave this to it.
+                return None
+        else:
+            value = iru.partially_evaluate(self._candidate, inputs)  # type: ignore
+        return None if value is None else value == output
+
+    def example_constraint(self, inputs: OracleInput, output: Union[bool, float]) -> Union[z3.BoolRef, bool]:
+        concrete = self.concrete_check(inputs, output)
+        if concrete is not None:
+            return concrete
+        return self.z3_constraint(inputs, output)
+
+    def z3_constraint(self, inputs: OracleInput, output: Union[bool, float]) -> Union[z3.BoolRef, bool]:
+        term = self.candidate_z3()
+        if not z3.is_expr(term):
+            return term == output
+        substitutions = [
+            (variable, to_value(inputs[name]))
+            for name, to_value, variable in self._candidate_variables
+            if name in inputs
+        ]
+        constraint = z3.substitute(term, *substitutions) == output
+        # Once the inputs are substituted into a program that only has holes for inputs, Z3 can decide the constraint by
+        # simplifying it, without the solver.
+        if self._candidate_is_ground:
+            constraint = z3.simplify(constraint)
+            if z3.is_true(constraint):
+                return True
+            elif z3.is_false(constraint):
+                return False
+        return constraint
 
     def satisfies_examples(self, program: ir.Expression) -> bool:
-        constraints = []
-        for inputs, output in self.example_bank:
-            filled_program = fill_holes(iru.deep_copy(program), inputs)
-            filled_program = to_z3(filled_program)
-            constraint = filled_program == output
+        if program is not self._candidate:
+            self.start_candidate(program)
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        new_examples = self.example_bank[self._solved_examples :]
+        # Cheap rejection first: if evaluating the program rules out any of the new examples, there's no need to build
+        # Z3 constraints for the rest of them.
+        concrete_checks = []
+        for inputs, output in new_examples:
+            concrete = self.concrete_check(inputs, output)
+            if concrete is False:
+                self.concrete_rejections += 1
+                if metrics is not None:
+                    metrics.add_time("concrete_check", time.perf_counter() - start)
+                    metrics.count("concrete_rejections")
+                return False
+            concrete_checks.append(concrete)
+        if metrics is not None:
+            checked = time.perf_counter()
+            metrics.add_time("concrete_check", checked - start)
+        for (inputs, output), concrete in zip(new_examples, concrete_checks):
+            constraint = self.z3_constraint(inputs, output) if concrete is None else concrete
             if constraint is False:
+                self.concrete_rejections += 1
+                if metrics is not None:
+                    metrics.add_time("z3_translation", time.perf_counter() - checked)
+                    metrics.count("concrete_rejections")
                 return False
-            elif constraint is True:
-                continue
-            else:
-                constraints.append(filled_program == output)
-        # print(constraints)
-        if constraints == []:
+            elif constraint is not True:
+                self._solver.add(constraint)
+                self._solver_constraints += 1
+            self._solved_examples += 1
+        if metrics is not None:
+            metrics.add_time("z3_translation", time.perf_counter() - checked)
+        if self._solver_constraints == 0:
+            self.satisfied_examples = self._solved_examples
             return True
-        s = z3.Solver()
-        result = s.check(*constraints)
+        timeout = None
+        if self.solver_timeout is not None or self.deadline is not None:
+            timeout = self._check_timeout()
+            self._solver.set("timeout", timeout)
+        start = time.perf_counter()
+        racing = self.portfolio is not None and self._candidate_theory in PORTFOLIOS
+        if racing:
+            result, model, winner = self.portfolio.check(self._solver.assertions(), self._candidate_theory, timeout)
+            if metrics is not None and winner is not None:
+                metrics.count(f"portfolio_wins_{self._candidate_theory}_{winner}")
+        else:
+            result = self._solver.check()
+        elapsed = time.perf_counter() - start
+        if self.query_log is not None:
+            if racing:
+                strategy = winner if winner is not None else PORTFOLIOS[self._candidate_theory][0]
+            else:
+                strategy = "default" if self._candidate_theory is None else PREFERRED[self._candidate_theory]
+            self.query_log.record(self._solver.assertions(), program, result, elapsed, strategy, timeout)
+        self.solver_time += elapsed
+        self.solver_calls += 1
+        if metrics is not None:
+            metrics.add_time("solver", elapsed)
+            if self._candidate_theory is not None:
+                metrics.count(f"{self._candidate_theory}_checks")
         if result == z3.sat:
-            self.model = s.model()
+            self.model = model if racing else self._solver.model()
+            self.satisfied_examples = self._solved_examples
+            self._satisfying_model = self.model
             return True
+        elif result == z3.unknown:
+            self.unknown_results += 1
+            if metrics is not None:
+                metrics.count("solver_unknowns")
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise BudgetExhausted()
+            if self.solver_timeout is not None:
+                raise SolverUnknown(program)
+        if metrics is not None:
+            metrics.count("solver_rejections")
+        return False
+
+    def _check_timeout(self) -> int:
+        """
+        How long the solver's next check can take, in milliseconds.
+        """
+        timeout = self.solver_timeout
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise BudgetExhausted()
+            timeout = min(timeout, int(remaining * 1000)) if timeout is not None else int(remaining * 1000)
+        # A timeout of 0 means that there isn't one.
+        return max(timeout, 1)  # type: ignore
+
+    def constants(self) -> Dict[str, Union[bool, float]]:
+        """
+        The values of the constants in the model found the last time a program satisfied the examples.
+        """
+        if self._solver_constraints == 0:
+            return {}
+        return _model_constants(self.model)
+
+    def satisfying_constants(self) -> Dict[str, Union[bool, float]]:
+        """
+        The values of the constants that the current candidate satisfied the first `satisfied_examples` examples with.
+        """
+        if self._satisfying_model is None:
+            return {}
+        return _model_constants(self._satisfying_model)
+
+    def examples_satisfied_individually(
+        self, program: ir.Expression
+    ) -> Tuple[List[Tuple[OracleInput, Union[bool, float]]], Dict[str, Union[bool, float]]]:
+        """
+        The examples in the bank that `program` gets right when each of them is checked on its own, and the values of
+        its constants that it gets them right with. If `program` is the current candidate, those are the constants it
+        satisfied the first `satisfied_examples` examples with; otherwise no constants are known. Examples whose outputs
+        depend on constants that aren't known don't count.
+
+        Unlike `satisfies_examples`, this doesn't stop at the first example that's wrong, so it can rank programs that
+        were rejected. It evaluates the program on the whole bank, without the solver.
+        """
+        constants = self.satisfying_constants() if program is self._candidate else {}
+        filled = fill_holes(program, constants)
+        names = [hole._name for hole in iru.holes(filled)]
+        inputs = set(self.input_numbers).union(self.input_booleans)
+        function = compile_program(filled, names) if inputs.issuperset(names) else None
+        satisfied = []
+        for example in self.example_bank:
+            example_inputs, output = example
+            try:
+                if function is not None:
+                    value = function(*[example_inputs[name] for name in names])
+                else:
+                    value = iru.partially_evaluate(filled, example_inputs)
+            except ZeroDivisionError:
+                continue
+            if value is not None and value == output:
+                satisfied.append(example)
+        return satisfied, constants
+
+    def _new_inputs(self) -> List[OracleInput]:
+        return [get_new_inputs(self.input_booleans, self.input_numbers, rng=self.rng) for _ in range(self.batch_size)]
+
+    def _ask_oracle(self, inputs: List[OracleInput]) -> Tuple[List[Union[bool, float]], float]:
+        # This runs on the prefetching thread, so it mustn't touch the random state or the metrics.
+        start = time.perf_counter()
+        outputs = self.oracle.run_batch(inputs)
+        return outputs, time.perf_counter() - start
+
+    def _examples(
+        self, inputs: List[OracleInput], outputs: List[Union[bool, float]], seconds: float
+    ) -> List[Tuple[OracleInput, Union[bool, float]]]:
+        if self.metrics is not None:
+            self.metrics.add_time("oracle", seconds)
+            self.metrics.count("oracle_queries", len(inputs))
+        return list(zip(inputs, outputs))
+
+    def query_oracle(self) -> List[Tuple[OracleInput, Union[bool, float]]]:
+        inputs = self._new_inputs()
+        return self._examples(inputs, *self._ask_oracle(inputs))
+
+    def fetch_examples(self) -> int:
+        """
+        Adds a batch of new examples to the bank, and returns how many there were.
+        """
+        if self._prefetched is not None:
+            inputs, answers = self._prefetched
+            examples = self._examples(inputs, *answers.result())
+            self._prefetched = None
         else:
-            return False
+            examples = self.query_oracle()
+        self.oracle_calls += 1
+        self.example_bank.extend(examples)
+        if self.prefetch:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            # The inputs are drawn here rather than on the prefetching thread, so that they're the same ones that
+            # would have been drawn without prefetching.
+            inputs = self._new_inputs()
+            self._prefetched = (inputs, self._executor.submit(self._ask_oracle, inputs))
+        return len(examples)
 
-    def validate_program(self, program: ir.Expression) -> bool:
-        for _ in range(self.successes_to_pass + 1):
+    def close(self) -> None:
+        """
+        Stops asking for examples in the background, and shuts down the threads the validator started. If a batch is
+        already being asked about, this waits for the oracle to finish with it, and its answers are dropped.
+        """
+        if self._prefetched is not None:
+            self._prefetched[1].cancel()
+            self._prefetched = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self.portfolio is not None:
+            self.portfolio.close()
+
+    def validate_program(self, program: ir.Expression, rivals: Sequence[ir.Expression] = ()) -> bool:
+        if self.distinguishing:
+            return self.validate_program_distinguishing(program, rivals)
+        # The bank is checked first, so that a program it already rules out doesn't cost any oracle calls.
+        if not self.satisfies_examples(program):
+            return False
+        checked = 0
+        while checked < self.successes_to_pass:
+            fetched = self.fetch_examples()
             if not self.satisfies_examples(program):
                 return False
-            inputs = get_new_inputs(self.input_booleans, self.input_numbers)
-            self.example_bank.append((inputs, self.oracle.run(inputs)))
+            checked += fetched
         return True
+
+    def distinguishing_input(
+        self,
+        program: ir.Expression,
+        constants: Mapping[str, Union[bool, float, z3.ExprRef]],
+        alternative: ir.Expression,
+    ) -> Optional[OracleInput]:
+        """
+        Looks for inputs on which `program`, with its constants set to `constants`, gives a different output than
+        `alternative` does with some values for its constants that satisfy all of the examples. (The constants of the
+        two programs are separate, even if they have the same names.) Numbers are restricted to integers in the range
+        `get_new_inputs` draws from. Returns None if there are no such inputs, or if none were found in time.
+        """
+        inputs = set(self.input_numbers).union(self.input_booleans)
+        # The inputs are searched for as integers.
+        searched = {name: z3.Int(f"{name}!input") for name in self.input_numbers}
+
+        def term(expression: ir.Expression, tag: str, values: Mapping[str, Union[bool, float, z3.ExprRef]]):
+            translated = to_z3(expression)
+            if not z3.is_expr(translated):
+                return translated
+            substitutions = []
+            for hole in iru.holes(expression):
+                variable = to_z3(hole)
+                if hole._name in values:
+                    value = values[hole._name]
+                    if not z3.is_expr(value):
+                        value = z3.BoolVal(value) if type(hole) is ir.BooleanHole else z3.RealVal(value)
+                    substitutions.append((variable, value))
+                elif hole._name not in inputs:
+                    fresh = z3.Bool if type(hole) is ir.BooleanHole else z3.Real
+                    substitutions.append((variable, fresh(f"{hole._name}!{tag}")))
+            return z3.substitute(translated, *substitutions) if substitutions else translated
+
+        solver = z3.Solver()
+        solver.set("timeout", self.distinguishing_timeout)
+        for example_inputs, output in self.example_bank:
+            solver.add(term(alternative, "alternative", example_inputs) == output)
+        unknowns = {
+            **{name: z3.ToReal(variable) for name, variable in searched.items()},
+            **{name: z3.Bool(f"{name}!input") for name in self.input_booleans},
+        }
+        solver.add(term(program, "candidate", {**constants, **unknowns}) != term(alternative, "alternative", unknowns))
+        for variable in searched.values():
+            solver.add(variable >= -10**7, variable <= 10**7)
+        start = time.perf_counter()
+        result = solver.check()
+        elapsed = time.perf_counter() - start
+        self.solver_time += elapsed
+        self.solver_calls += 1
+        if self.metrics is not None:
+            self.metrics.add_time("solver", elapsed)
+        if result != z3.sat:
+            return None
+        model = solver.model()
+        found: Dict[str, Union[bool, float]] = {}
+        for name, variable in searched.items():
+            found[name] = float(model.eval(variable, model_completion=True).as_long())
+        for name in self.input_booleans:
+            found[name] = z3.is_true(model.eval(z3.Bool(f"{name}!input"), model_completion=True))
+        return found
+
+    def validate_program_distinguishing(self, program: ir.Expression, rivals: Sequence[ir.Expression] = ()) -> bool:
+        """
+        Validates `program` by asking the oracle about inputs that tell it apart from the alternatives: the same program
+        with other values for its constants, and each of `rivals` (e.g. the programs that would be tried after this
+        one). An alternative that can't be told apart from `program` any more is dropped. Once none are left, the
+        program needs to pass `confirmations` random examples, in case the right program is none of them. As with
+        `validate_program`, a program that passes `successes_to_pass` examples is accepted anyway.
+        """
+        inputs = set(self.input_numbers).union(self.input_booleans)
+        has_constants = any(hole._name not in inputs for hole in iru.holes(program))
+        alternatives = ([program] if has_constants else []) + [rival for rival in rivals if rival is not program]
+        confirmations = 0
+        for _ in range(self.successes_to_pass):
+            if not self.satisfies_examples(program):
+                return False
+            new_input = None
+            # The exact values from the model, rather than the rounded ones from `constants`.
+            constants = (
+                {
+                    hole._name: self.model.eval(to_z3(hole), model_completion=True)
+                    for hole in self._candidate_holes
+                    if hole._name not in inputs
+                }
+                if self._solver_constraints
+                else {}
+            )
+            while alternatives and new_input is None:
+                new_input = self.distinguishing_input(program, constants, alternatives[0])
+                if new_input is None:
+                    alternatives.pop(0)
+            if new_input is not None:
+                self.distinguishing_examples += 1
+            elif confirmations < self.confirmations:
+                confirmations += 1
+                new_input = get_new_inputs(self.input_booleans, self.input_numbers, rng=self.rng)
+            else:
+                return True
+            self.oracle_calls += 1
+            if self.metrics is None:
+                output = self.oracle.run(new_input)
+            else:
+                with self.metrics.timer("oracle"):
+                    output = self.oracle.run(new_input)
+                self.metrics.count("oracle_queries")
+            self.example_bank.append((new_input, output))
+        return self.satisfies_examples(program)
+
+
+def _model_constants(model: z3.ModelRef) -> Dict[str, Union[bool, float]]:
+    return {str(variable): z3_literal_to_python_literal(model.get_interp(variable)) for variable in model.decls()}
@@ -0,0 +1,79 @@
+"""
+Evaluates IR programs on many inputs at once with NumPy. This needs NumPy to be installed, which the rest of the package
+doesn't, so it's only imported by code that asks for it.
+
+Inputs are given as columns: one array per input name, with one entry per example. Number columns are float64 and
+Boolean columns are bool. Division follows IEEE semantics (dividing by zero gives an infinity or NaN rather than an
+error).
+"""
+from typing import Any, Dict, Iterable, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from . import intermediate_representation as ir
+from .validator import OracleInput
+
+Columns = Mapping[str, np.ndarray]
+
+
+def _divide(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.true_divide(a, b)
+
+
+_BATCH_EVALUATOR = ir.make_visitor(
+    "BatchEvaluate",
+    {
+        ir.BooleanLiteral: lambda _, expr: np.bool_(expr._value),
+        ir.NumberLiteral: lambda _, expr: np.float64(expr._value),
+        ir.BooleanHole: lambda self, expr: self.columns[expr._name],
+        ir.NumberHole: lambda self, expr: self.columns[expr._name],
+        ir.Not: lambda self, expr: np.logical_not(self.visit(expr._0)),
+        ir.And: lambda self, expr: np.logical_and(self.visit(expr._0), self.visit(expr._1)),
+        ir.Or: lambda self, expr: np.logical_or(self.visit(expr._0), self.visit(expr._1)),
+        ir.Xor: lambda self, expr: np.logical_xor(self.visit(expr._0), self.visit(expr._1)),
+        ir.Impl: lambda self, expr: np.logical_or(np.logical_not(self.visit(expr._0)), self.visit(expr._1)),
+        ir.Add: lambda self, expr: np.add(self.visit(expr._0), self.visit(expr._1)),
+        ir.Sub: lambda self, expr: np.subtract(self.visit(expr._0), self.visit(expr._1)),
+        ir.Mul: lambda self, expr: np.multiply(self.visit(expr._0), self.visit(expr._1)),
+        ir.Div: lambda self, expr: _divide(self.visit(expr._0), self.visit(expr._1)),
+        ir.Ite: lambda self, expr: np.where(self.visit(expr._0), self.visit(expr._1), self.visit(expr._2)),
+        ir.Lt: lambda self, expr: np.less(self.visit(expr._0), self.visit(expr._1)),
+    },
+)
+
+
+def evaluate_batch(expression: ir.Expression, columns: Columns, length: int = -1) -> np.ndarray:
+    """
+    Evaluates `expression` on every row of `columns` at once. The holes of `expression` have to be columns. The result
+    has one entry per row, even when the expression doesn't use any of the columns; `length` gives the number of rows
+    when there are no columns at all.
+    """
+    if length < 0:
+        length = len(next(iter(columns.values()))) if columns else 1
+    evaluator = _BATCH_EVALUATOR()
+    evaluator.columns = columns  # type: ignore
+    return np.broadcast_to(evaluator.visit(expression), (length,))
+
+
+def example_matrix(
+    examples: Sequence[Tuple[OracleInput, Any]], numbers: Iterable[str] = (), booleans: Iterable[str] = ()
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Converts an example bank (e.g. `Validator.example_bank`) into columns of inputs and an array of outputs.
+    """
+    columns: Dict[str, np.ndarray] = {}
+    for name in numbers:
+        columns[name] = np.fromiter((inputs[name] for inputs, _ in examples), dtype=np.float64, count=len(examples))
+    for name in booleans:
+        columns[name] = np.fromiter((inputs[name] for inputs, _ in examples), dtype=np.bool_, count=len(examples))
+    outputs = np.array([output for _, output in examples])
+    return columns, outputs
+
+
+def matches(expression: ir.Expression, columns: Columns, outputs: np.ndarray) -> np.ndarray:
+    """
+    Returns a Boolean array saying which rows `expression` gets the right output for.
+    """
+    result: Union[np.ndarray, Any] = evaluate_batch(expression, columns, len(outputs))
+    return result == outputs